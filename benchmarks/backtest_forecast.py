@@ -0,0 +1,76 @@
+"""Backtest das sugestões de quantidades das guias (ForecastService).
+
+Ajusta o modelo em todo o histórico exceto os últimos dias e compara a procura
+prevista com a vendida nesses dias, contra uma referência ingénua (média de cada
+série). Reporta MAE, WAPE, viés, sobras/faltas das quantidades sugeridas e o
+tempo de ajuste.
+
+Por omissão usa um histórico sintético com sazonalidade semanal; com --boss-id
+usa as guias fechadas desse patrão na base de dados de DATABASE_URL.
+
+Uso: python benchmarks/backtest_forecast.py [--boss-id N] [--items N] [--holdout DIAS] [--alpha A]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from src.services.forecast_service import ForecastService, SMOOTHING_ALPHA
+
+
+def build_history(items_count, products=40, sellers=30):
+    """Uma guia por vendedor e dia com todos os produtos; a procura tem tendência e sazonalidade semanal"""
+    rng = np.random.default_rng(7)
+    days = max(items_count // (products * sellers), 14)
+    seller_id, product_id, day_offset = (grid.ravel() for grid in np.meshgrid(
+        np.arange(1, sellers + 1), np.arange(1, products + 1), np.arange(days), indexing="ij"
+    ))
+    day = np.datetime64("2024-01-01") + day_offset.astype("timedelta64[D]")
+
+    base = rng.uniform(5, 40, (sellers + 1, products + 1))
+    weekly = np.array([1.0, 0.9, 0.95, 1.0, 1.2, 1.5, 0.7])
+    weekday = (day.astype(np.int64) + 3) % 7
+    expected = base[seller_id, product_id] * weekly[weekday] * (1 + 0.3 * day_offset / days)
+    demand = rng.poisson(expected)
+    # O vendedor leva um pouco mais do que a procura esperada; quando a procura a excede, esgota
+    taken = np.ceil(expected * rng.uniform(1.0, 1.4, expected.size))
+    return {
+        "product_id": product_id,
+        "seller_id": seller_id,
+        "day": day,
+        "taken": taken,
+        "remaining": np.maximum(taken - demand, 0),
+        "price": np.full(day.size, 1.0)
+    }
+
+
+def load_history(boss_id):
+    from src.main import app
+    from src.services.analytics_service import AnalyticsService
+    with app.app_context():
+        return AnalyticsService.load_guide_history(boss_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--boss-id", type=int, default=None)
+    parser.add_argument("--items", type=int, default=500_000)
+    parser.add_argument("--holdout", type=int, default=28)
+    parser.add_argument("--alpha", type=float, default=SMOOTHING_ALPHA)
+    args = parser.parse_args()
+
+    history = load_history(args.boss_id) if args.boss_id is not None else build_history(args.items)
+    if history["taken"].size == 0:
+        print("Sem guias fechadas no histórico")
+        return
+
+    result = ForecastService.backtest(history, holdout_days=args.holdout, alpha=args.alpha)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
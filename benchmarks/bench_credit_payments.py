@@ -0,0 +1,119 @@
+"""Dispara pagamentos em paralelo contra um único crédito e verifica o saldo final.
+
+Compara o pagamento atómico (CreditService.pay_credit, um UPDATE condicional)
+com a antiga leitura-modificação-escrita em Python, que perde atualizações
+quando dois pagamentos leem o mesmo amount_paid.
+
+Usa a base de dados de DATABASE_URL (por omissão, um ficheiro SQLite
+temporário); em PostgreSQL a diferença entre os dois modos é a mais visível.
+
+Uso: python benchmarks/bench_credit_payments.py [threads] [pagamentos_por_thread]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_credit_payments.db"))
+
+from src.main import app
+from src.models import db, Boss, Seller, Customer, Sale, Credit, CreditPayment
+from src.services.credit_service import CreditService
+
+PAYMENT_AMOUNT = Decimal("1.00")
+
+
+def create_credit(amount):
+    boss = Boss(name="Bench", email=f"bench-{time.time_ns()}@example.com")
+    boss.set_password("bench")
+    db.session.add(boss)
+    db.session.flush()
+    seller = Seller(name="Bench", boss_id=boss.id)
+    customer = Customer(name="Bench", boss_id=boss.id)
+    db.session.add_all([seller, customer])
+    db.session.flush()
+    sale = Sale(seller_id=seller.id, customer_id=customer.id, payment_type="credit", total_amount=amount)
+    db.session.add(sale)
+    db.session.flush()
+    credit = Credit(sale_id=sale.id, customer_id=customer.id, amount=amount, amount_paid=0)
+    db.session.add(credit)
+    db.session.commit()
+    return credit.id
+
+
+def pay_atomic(credit_id):
+    credit = db.session.get(Credit, credit_id)
+    CreditService.pay_credit(credit, PAYMENT_AMOUNT, None, None)
+
+
+def pay_read_modify_write(credit_id):
+    # Réplica do comportamento anterior: lê, soma em Python e escreve o valor absoluto
+    credit = db.session.get(Credit, credit_id)
+    amount = min(PAYMENT_AMOUNT, credit.amount - credit.amount_paid)
+    if amount <= 0:
+        db.session.rollback()
+        return
+    db.session.add(CreditPayment(credit_id=credit.id, amount=amount, payment_date=None))
+    credit.amount_paid += amount
+    if credit.amount_paid >= credit.amount:
+        credit.is_paid = True
+        credit.amount_paid = credit.amount
+    db.session.commit()
+
+
+def run(mode, pay, threads, payments_per_thread):
+    with app.app_context():
+        total = PAYMENT_AMOUNT * threads * payments_per_thread
+        # O crédito cobre 3/4 dos pagamentos, para exercitar também o limite do valor em dívida
+        credit_id = create_credit(total * 3 / 4)
+
+    errors = []
+
+    def worker():
+        with app.app_context():
+            for _ in range(payments_per_thread):
+                try:
+                    pay(credit_id)
+                except Exception as e:
+                    db.session.rollback()
+                    errors.append(e)
+            db.session.remove()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        credit = db.session.get(Credit, credit_id)
+        paid_by_payments = db.session.scalar(
+            db.select(db.func.coalesce(db.func.sum(CreditPayment.amount), 0)).filter(CreditPayment.credit_id == credit_id)
+        )
+        consistent = Decimal(str(paid_by_payments)) == Decimal(str(credit.amount_paid)) and credit.amount_paid <= credit.amount
+        attempts = threads * payments_per_thread
+        print(f"{mode:<20} {attempts / elapsed:>10.1f} pag/s  amount={float(credit.amount):>9.2f}  "
+              f"amount_paid={float(credit.amount_paid):>9.2f}  soma_pagamentos={float(paid_by_payments):>9.2f}  "
+              f"erros={len(errors):<4} {'OK' if consistent else 'INCONSISTENTE'}")
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    payments_per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    with app.app_context():
+        db.create_all()
+
+    print(f"{app.config['SQLALCHEMY_DATABASE_URI'].split(':')[0]}: {threads} threads x {payments_per_thread} pagamentos")
+    run("atómico", pay_atomic, threads, payments_per_thread)
+    run("leitura+escrita", pay_read_modify_write, threads, payments_per_thread)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Mede o débito (linhas/s) e o pico de memória (RSS) das exportações em streaming.
+
+Cria um histórico de vendas sintético (por omissão, 500 mil itens) e exporta-o
+em CSV, Parquet e Arrow com ExportService, comparando com a resposta atual de
+GET /api/sales (objetos ORM + to_dict() + um único array JSON). Cada modo corre
+num processo próprio, para que o pico de RSS de um não contamine o dos outros.
+
+Usa a base de dados de DATABASE_URL (por omissão, um ficheiro SQLite
+temporário); em PostgreSQL o cursor é mesmo do lado do servidor.
+
+Uso: python benchmarks/bench_exports.py [numero_de_itens]
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_exports.db"))
+
+ITEMS_PER_SALE = 5
+MODES = ("csv", "parquet", "arrow", "json")
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def seed(items_count):
+    from sqlalchemy import insert
+    from src.main import app
+    from src.models import db, Boss, Seller, Customer, Product, Sale, SaleItem
+
+    with app.app_context():
+        db.create_all()
+        boss = Boss(name="Bench", email=f"bench-{time.time_ns()}@example.com")
+        boss.set_password("bench")
+        db.session.add(boss)
+        db.session.flush()
+        sellers = [Seller(name=f"Vendedor {index}", boss_id=boss.id) for index in range(10)]
+        customers = [Customer(name=f"Cliente {index}", boss_id=boss.id) for index in range(200)]
+        products = [Product(name=f"Produto {index}", price=1 + index / 4, boss_id=boss.id) for index in range(20)]
+        db.session.add_all(sellers + customers + products)
+        db.session.flush()
+
+        sales_count = items_count // ITEMS_PER_SALE
+        first_day = date.today() - timedelta(days=365)
+        for start in range(0, sales_count, 10_000):
+            chunk = range(start, min(start + 10_000, sales_count))
+            sale_ids = db.session.scalars(insert(Sale).returning(Sale.id, sort_by_parameter_order=True), [{
+                "seller_id": sellers[index % len(sellers)].id,
+                "customer_id": customers[index % len(customers)].id,
+                "payment_type": "credit" if index % 3 == 0 else "cash",
+                "sale_date": first_day + timedelta(days=index % 365),
+                "total_amount": sum(product.price for product in products[:ITEMS_PER_SALE])
+            } for index in chunk]).all()
+            db.session.execute(insert(SaleItem), [{
+                "sale_id": sale_id,
+                "product_id": product.id,
+                "quantity": 1,
+                "unit_price": product.price,
+                "subtotal": product.price
+            } for sale_id in sale_ids for product in products[:ITEMS_PER_SALE]])
+        db.session.commit()
+        return boss.id
+
+
+def run_mode(mode, boss_id):
+    """Corre um modo e devolve as métricas (chamado no processo filho)"""
+    from src.main import app
+    from src.models import Sale, Seller
+    from src.services.export_service import ExportService
+    from src.services.query_profiles import sale_profile
+    from src.utils.export_format import iter_export
+
+    with app.app_context():
+        rss_before = peak_rss_mb()
+        started = time.perf_counter()
+        if mode == "json":
+            sales = Sale.query.join(Seller).filter(Seller.boss_id == boss_id).options(*sale_profile()).all()
+            body = json.dumps([sale.to_dict() for sale in sales]).encode("utf-8")
+            rows, size = sum(len(sale.sale_items) for sale in sales), len(body)
+        else:
+            columns, query = ExportService.build_query("sales", boss_id)
+            rows, size = 0, 0
+            batches = ExportService.iter_batches(query)
+
+            def counted():
+                nonlocal rows
+                for batch in batches:
+                    rows += len(batch)
+                    yield batch
+
+            for chunk in iter_export(mode, columns, counted()):
+                size += len(chunk)
+        seconds = time.perf_counter() - started
+
+    return {"rows": rows, "seconds": seconds, "bytes": size, "rss_before_mb": rss_before, "peak_rss_mb": peak_rss_mb()}
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        print(json.dumps(run_mode(sys.argv[2], int(sys.argv[3]))))
+        return
+
+    items_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    boss_id = seed(items_count)
+
+    print(f"{items_count} itens de venda ({os.environ['DATABASE_URL'].split(':')[0]})")
+    print(f"{'modo':<10}{'linhas/s':>12}{'tempo':>10}{'tamanho':>12}{'RSS pico':>12}{'RSS extra':>12}")
+    for mode in MODES:
+        output = subprocess.run([sys.executable, __file__, "--child", mode, str(boss_id)],
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:<10}{result['rows'] / result['seconds']:>12,.0f}{result['seconds']:>9.2f}s"
+              f"{result['bytes'] / 2 ** 20:>10.1f}MB{result['peak_rss_mb']:>10.0f}MB"
+              f"{result['peak_rss_mb'] - result['rss_before_mb']:>10.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
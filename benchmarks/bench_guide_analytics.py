@@ -0,0 +1,75 @@
+"""Mede a análise vetorizada de desperdício sobre um histórico sintético de itens de guias.
+
+Gera N itens (por omissão, um milhão) com a forma devolvida por
+AnalyticsService.load_guide_history e compara AnalyticsService.compute_guide_analytics
+com o cálculo equivalente objeto a objeto em Python (como GuideItem.get_waste_percentage).
+
+Uso: python benchmarks/bench_guide_analytics.py [numero_de_itens]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from src.services.analytics_service import AnalyticsService
+
+
+def build_history(items_count, products=60, sellers=40, days=365):
+    rng = np.random.default_rng(42)
+    taken = rng.integers(5, 80, items_count).astype(np.float64)
+    return {
+        "product_id": rng.integers(1, products + 1, items_count),
+        "seller_id": rng.integers(1, sellers + 1, items_count),
+        "day": np.datetime64("2024-01-01") + rng.integers(0, days, items_count).astype("timedelta64[D]"),
+        "taken": taken,
+        "remaining": np.floor(taken * rng.beta(2, 8, items_count)),
+        "price": rng.choice(np.array([0.2, 0.35, 0.5, 1.2, 2.5, 4.0]), items_count)
+    }
+
+
+def python_baseline(history):
+    """Agregação por produto e por vendedor item a item, sem NumPy"""
+    rows = zip(history["product_id"].tolist(), history["seller_id"].tolist(), history["taken"].tolist(),
+               history["remaining"].tolist(), history["price"].tolist())
+    products, sellers = {}, {}
+    for product_id, seller_id, taken, remaining, price in rows:
+        for totals, key in ((products, product_id), (sellers, seller_id)):
+            entry = totals.setdefault(key, [0.0, 0.0, 0.0])
+            entry[0] += taken
+            entry[1] += remaining
+            entry[2] += remaining * price
+    rank = lambda totals: sorted(totals, key=lambda key: totals[key][1] / totals[key][0], reverse=True)
+    return rank(products), rank(sellers)
+
+
+def timed(function, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    items_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    history = build_history(items_count)
+
+    report, vectorised = timed(AnalyticsService.compute_guide_analytics, history)
+    (products, sellers), baseline = timed(python_baseline, history, repeat=1)
+
+    assert [row["id"] for row in report["products"]] == products, "rankings de produtos diferentes"
+    assert [row["id"] for row in report["sellers"]] == sellers, "rankings de vendedores diferentes"
+
+    print(f"{items_count} itens de guias, {len(report['daily'])} dias")
+    print(f"{'numpy (completo)':<22}{vectorised * 1000:>10.1f} ms")
+    print(f"{'python (só rankings)':<22}{baseline * 1000:>10.1f} ms")
+    print(f"desperdício total: {report['totals']['waste_percentage']}%  taxa de venda: {report['totals']['sell_through']}%")
+
+
+if __name__ == "__main__":
+    main()
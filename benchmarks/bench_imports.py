@@ -0,0 +1,79 @@
+"""Mede a importação em massa de produtos e clientes a partir de CSV.
+
+Gera um CSV sintético (por omissão, 100 mil linhas de cada) e importa-o com
+ImportService.import_csv, comparando com a criação linha a linha de
+ProductService.create_product / CustomerService.create_customer (uma transação
+por linha, como nos pedidos individuais), medida numa amostra e extrapolada.
+
+Usa a base de dados de DATABASE_URL (por omissão, um ficheiro SQLite
+temporário); em PostgreSQL a importação usa COPY.
+
+Uso: python benchmarks/bench_imports.py [linhas] [linhas_da_amostra_linha_a_linha]
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_imports.db"))
+
+from src.main import app
+from src.models import db, Boss
+from src.services.customer_service import CustomerService
+from src.services.import_service import ImportService
+from src.services.product_service import ProductService
+
+
+def build_csv(dataset, rows):
+    if dataset == "products":
+        lines = ["name,price,is_active"] + [f"Produto {index},{1 + index % 400 / 100:.2f},{'sim' if index % 10 else 'nao'}" for index in range(rows)]
+    else:
+        lines = ["name,address,phone"] + [f"Cliente {index},\"Rua {index % 300}, {index}\",9{index:08d}" for index in range(rows)]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def create_boss():
+    boss = Boss(name="Bench", email=f"bench-{time.time_ns()}@example.com")
+    boss.set_password("bench")
+    db.session.add(boss)
+    db.session.commit()
+    return boss.id
+
+
+def one_by_one(dataset, boss_id, rows):
+    for index in range(rows):
+        if dataset == "products":
+            ProductService.create_product(boss_id, f"Produto {index}", 1.5)
+        else:
+            CustomerService.create_customer(boss_id, f"Cliente {index}", f"Rua {index}", f"9{index:08d}")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    sample = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+
+    with app.app_context():
+        db.create_all()
+        print(f"{rows} linhas por conjunto ({db.engine.dialect.name})")
+        print(f"{'conjunto':<12}{'import CSV':>12}{'linhas/s':>12}{'linha a linha (est.)':>24}")
+        for dataset in ("products", "customers"):
+            data = build_csv(dataset, rows)
+            boss_id = create_boss()
+            started = time.perf_counter()
+            report, error = ImportService.import_csv(dataset, boss_id, io.BytesIO(data))
+            elapsed = time.perf_counter() - started
+            assert error is None and report["imported"] == rows, (error, report and report["errors"][:3])
+
+            boss_id = create_boss()
+            started = time.perf_counter()
+            one_by_one(dataset, boss_id, sample)
+            estimated = (time.perf_counter() - started) / sample * rows
+
+            print(f"{dataset:<12}{elapsed:>11.2f}s{rows / elapsed:>12,.0f}{estimated:>23.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Compara o tamanho e o tempo de codificação dos formatos do download de sincronização.
+
+Gera um payload sintético com a forma de SyncService.get_download_data e mede
+cada formato negociável (JSON, colunas em JSON, MessagePack), com e sem gzip.
+
+Uso: python benchmarks/bench_sync_format.py [numero_de_vendas]
+"""
+import gzip
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.sync_format import encode_payload, msgpack
+
+
+def build_payload(sales_count):
+    random.seed(42)
+    now = datetime(2024, 1, 1)
+    stamp = lambda offset: (now + timedelta(minutes=offset)).isoformat()
+    
+    products = [{
+        'id': i, 'boss_id': 1, 'name': f'Produto {i}', 'price': round(random.uniform(0.5, 15), 2),
+        'is_active': True, 'created_at': stamp(i), 'updated_at': stamp(i)
+    } for i in range(1, 41)]
+    customers = [{
+        'id': i, 'boss_id': 1, 'name': f'Cliente {i}', 'address': f'Rua {i}, {i * 3}',
+        'phone': f'91{i:07d}', 'created_at': stamp(i), 'updated_at': stamp(i)
+    } for i in range(1, 201)]
+    
+    sales, credits = [], []
+    for i in range(1, sales_count + 1):
+        items = []
+        for j in range(random.randint(1, 5)):
+            product = random.choice(products)
+            quantity = random.randint(1, 12)
+            items.append({
+                'id': i * 10 + j, 'sale_id': i, 'product_id': product['id'], 'quantity': quantity,
+                'unit_price': product['price'], 'subtotal': round(quantity * product['price'], 2),
+                'product_name': product['name']
+            })
+        customer = random.choice(customers)
+        total = round(sum(item['subtotal'] for item in items), 2)
+        payment_type = 'credit' if i % 4 == 0 else 'cash'
+        sales.append({
+            'id': i, 'seller_id': 1, 'customer_id': customer['id'], 'guide_id': None,
+            'total_amount': total, 'payment_type': payment_type, 'sale_date': stamp(i)[:10],
+            'created_at': stamp(i), 'local_id': f'sale_{i}', 'sync_status': 'SYNCED',
+            'last_modified': stamp(i), 'items': items, 'customer_name': customer['name']
+        })
+        if payment_type == 'credit':
+            credits.append({
+                'id': i, 'sale_id': i, 'customer_id': customer['id'], 'amount': total, 'amount_paid': 0.0,
+                'amount_remaining': total, 'is_paid': False, 'due_date': None, 'created_at': stamp(i),
+                'local_id': f'sale_{i}', 'sync_status': 'SYNCED', 'last_modified': stamp(i),
+                'customer_name': customer['name'], 'payments': []
+            })
+    
+    return {
+        'products': products, 'customers': customers, 'sales': sales, 'credits': credits, 'guides': [],
+        'cursor': stamp(0), 'is_delta': False
+    }
+
+
+def measure(data, fmt, compress, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body, _ = encode_payload(data, fmt)
+        if compress:
+            body = gzip.compress(body, compresslevel=6)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(body), best
+
+
+def main():
+    sales_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    data = build_payload(sales_count)
+    
+    formats = ['json', 'columnar']
+    if msgpack is not None:
+        formats.append('msgpack')
+    
+    baseline, _ = measure(data, 'json', False, repeat=1)
+    print(f'{sales_count} vendas')
+    print(f'{"formato":<20}{"bytes":>12}{"vs json":>10}{"tempo (ms)":>12}')
+    for fmt in formats:
+        for compress in (False, True):
+            size, elapsed = measure(data, fmt, compress)
+            label = fmt + ('+gzip' if compress else '')
+            print(f'{label:<20}{size:>12}{size / baseline:>10.1%}{elapsed * 1000:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
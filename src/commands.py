@@ -0,0 +1,53 @@
+import json
+import click
+from flask.cli import AppGroup
+from src.services.customer_service import CustomerService
+from src.services.analytics_service import AnalyticsService
+from src.services.forecast_service import ForecastService
+from src.services.guide_service import GuideService
+from src.services.report_service import ReportService
+
+# Comandos de manutenção: flask --app src.main maintenance <comando>
+maintenance_cli = AppGroup("maintenance", help="Verificação e reconstrução de dados derivados.")
+
+
+@maintenance_cli.command("check-guide-totals")
+@click.option("--repair", is_flag=True, help="Reconstrói os totais das guias inconsistentes.")
+def check_guide_totals(repair):
+    """Verifica os totais das guias contra os respetivos itens"""
+    mismatches = GuideService.check_guide_totals(repair=repair)
+    for mismatch in mismatches:
+        click.echo(json.dumps(mismatch))
+    click.echo(f"{len(mismatches)} guide(s) with inconsistent totals" + (" repaired" if repair and mismatches else ""))
+
+
+@maintenance_cli.command("rebuild-guide-counters")
+def rebuild_guide_counters():
+    """Reconstrói as quantidades vendidas registadas nos itens das guias"""
+    fixed = GuideService.rebuild_sold_counters()
+    click.echo(f"{fixed} guide item(s) updated")
+
+
+@maintenance_cli.command("rebuild-customer-balances")
+def rebuild_customer_balances():
+    """Recalcula o saldo em dívida dos clientes a partir dos créditos"""
+    updated = CustomerService.rebuild_balances()
+    click.echo(f"{updated} customer(s) updated")
+
+
+@maintenance_cli.command("rebuild-sales-rollup")
+@click.option("--boss-id", type=int, default=None, help="Reconstrói apenas as linhas deste patrão.")
+def rebuild_sales_rollup(boss_id):
+    """Reconstrói o agregado diário de vendas a partir das vendas"""
+    created = ReportService.rebuild_sales_rollup(boss_id)
+    click.echo(f"{created} rollup row(s) rebuilt")
+
+
+@maintenance_cli.command("precompute-suggestions")
+@click.option("--boss-id", type=int, default=None, help="Recalcula apenas as sugestões deste patrão.")
+def precompute_suggestions(boss_id):
+    """Recalcula as sugestões de quantidades das guias (correr todas as noites, ex.: via cron)"""
+    if not AnalyticsService.available():
+        raise click.ClickException("Guide suggestions require NumPy, which is not installed")
+    saved = ForecastService.precompute_suggestions(boss_id)
+    click.echo(f"{saved} suggestion(s) saved")
@@ -12,6 +12,8 @@ from .sale import Sale, SaleItem
 from .credit import Credit, CreditPayment
 from .sync import SyncQueue, SyncLog
 from .guide import SalesGuide, GuideItem
+from .report import DailySalesRollup
+from .forecast import GuideSuggestion
 
 # Exportar todos os modelos
 __all__ = [
@@ -27,6 +29,8 @@ __all__ = [
     'SyncQueue',
     'SyncLog',
     'SalesGuide',
-    'GuideItem'
+    'GuideItem',
+    'DailySalesRollup',
+    'GuideSuggestion'
 ]
 
@@ -9,6 +9,8 @@ class Boss(db.Model):
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(100), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
+    catalog_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # Incrementada a cada alteração de produtos/clientes
+    production_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # Incrementada a cada alteração de guias, vendedores ou sugestões
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
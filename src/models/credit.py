@@ -4,6 +4,16 @@ from . import db
 
 class Credit(db.Model):
     __tablename__ = 'credit'
+    __table_args__ = (
+        # Suporta o download incremental (delta sync) e o join com a venda
+        db.Index('ix_credit_last_modified', 'last_modified'),
+        db.Index('ix_credit_sale_id', 'sale_id'),
+        # Paginação por cursor (created_at, id) e filtro por due_date
+        db.Index('ix_credit_created_at_id', 'created_at', 'id'),
+        db.Index('ix_credit_due_date_id', 'due_date', 'id'),
+        # Relatório de antiguidade da dívida: créditos por pagar de cada cliente, por vencimento
+        db.Index('ix_credit_customer_paid_due_date', 'customer_id', 'is_paid', 'due_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     sale_id = db.Column(db.Integer, db.ForeignKey('sale.id'), nullable=False)
@@ -69,9 +79,14 @@ class Credit(db.Model):
 
 class CreditPayment(db.Model):
     __tablename__ = 'credit_payment'
+    __table_args__ = (
+        # Garante que um reenvio do dispositivo não duplica o pagamento
+        db.Index('uq_credit_payment_seller_local_id', 'seller_id', 'local_id', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     credit_id = db.Column(db.Integer, db.ForeignKey('credit.id'), nullable=False)
+    seller_id = db.Column(db.Integer, db.ForeignKey('seller.id'), nullable=True)  # Null quando registado pelo patrão
     amount = db.Column(db.Numeric(10, 2), nullable=False)
     payment_date = db.Column(db.Date, nullable=False, default=date.today)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -86,6 +101,7 @@ class CreditPayment(db.Model):
         return {
             'id': self.id,
             'credit_id': self.credit_id,
+            'seller_id': self.seller_id,
             'amount': float(self.amount),
             'payment_date': self.payment_date.isoformat() if self.payment_date else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
@@ -4,12 +4,20 @@ from . import db
 
 class Customer(db.Model):
     __tablename__ = 'customer'
+    __table_args__ = (
+        # Suporta o download incremental (delta sync) por patrão
+        db.Index('ix_customer_boss_updated_at', 'boss_id', 'updated_at'),
+        # Listagem de clientes ordenada/filtrada pelo saldo em dívida
+        db.Index('ix_customer_boss_outstanding_balance', 'boss_id', 'outstanding_balance'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     boss_id = db.Column(db.Integer, db.ForeignKey('boss.id'), nullable=False)
     name = db.Column(db.String(100), nullable=False)
     address = db.Column(db.Text, nullable=True)
     phone = db.Column(db.String(20), nullable=True)
+    # Soma do valor em dívida dos créditos por pagar; mantido pelas vendas e pagamentos (ver CustomerService.adjust_balances)
+    outstanding_balance = db.Column(db.Numeric(10, 2), nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -17,9 +25,13 @@ class Customer(db.Model):
     sales = db.relationship('Sale', backref='customer', lazy=True)
     credits = db.relationship('Credit', backref='customer', lazy=True)
     
-    def to_dict(self):
-        """Converte o objeto para dicionário"""
-        return {
+    def to_dict(self, include_balance=False):
+        """Converte o objeto para dicionário.
+
+        O saldo só é incluído a pedido: o snapshot do catálogo e o download de
+        sincronização usam o dicionário sem saldo, que não muda a cada venda.
+        """
+        data = {
             'id': self.id,
             'boss_id': self.boss_id,
             'name': self.name,
@@ -28,6 +40,9 @@ class Customer(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        if include_balance:
+            data['outstanding_balance'] = float(self.outstanding_balance or 0)
+        return data
     
     def get_total_credit(self):
         """Calcula o total de crédito pendente do cliente"""
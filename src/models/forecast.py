@@ -0,0 +1,41 @@
+from datetime import datetime
+from . import db
+
+
+class GuideSuggestion(db.Model):
+    """Quantidade sugerida para a guia de um vendedor, por produto e dia da semana (pré-calculada)"""
+    __tablename__ = 'guide_suggestion'
+    __table_args__ = (
+        # Leitura das sugestões de um vendedor para um dia da semana com uma procura no índice
+        db.Index('uq_guide_suggestion_seller_weekday_product', 'seller_id', 'weekday', 'product_id', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    seller_id = db.Column(db.Integer, db.ForeignKey('seller.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    weekday = db.Column(db.SmallInteger, nullable=False)  # 0 = segunda-feira, como date.weekday()
+    expected_demand = db.Column(db.Numeric(10, 2), nullable=False)
+    demand_error = db.Column(db.Numeric(10, 2), nullable=False, default=0)  # Erro absoluto médio (suavizado)
+    suggested_quantity = db.Column(db.Integer, nullable=False)
+    observations = db.Column(db.Integer, nullable=False, default=0)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relacionamentos
+    product = db.relationship('Product')
+    
+    def to_dict(self):
+        """Converte o objeto para dicionário"""
+        return {
+            'seller_id': self.seller_id,
+            'product_id': self.product_id,
+            'product_name': self.product.name if self.product else None,
+            'weekday': self.weekday,
+            'expected_demand': float(self.expected_demand),
+            'demand_error': float(self.demand_error),
+            'suggested_quantity': self.suggested_quantity,
+            'observations': self.observations,
+            'computed_at': self.computed_at.isoformat() if self.computed_at else None
+        }
+    
+    def __repr__(self):
+        return f'<GuideSuggestion seller={self.seller_id} product={self.product_id} weekday={self.weekday}>'
@@ -4,6 +4,15 @@ from . import db
 
 class SalesGuide(db.Model):
     __tablename__ = 'sales_guide'
+    __table_args__ = (
+        # Suporta o download incremental (delta sync) por vendedor
+        db.Index('ix_sales_guide_seller_last_modified', 'seller_id', 'last_modified'),
+        # Garante que um reenvio do dispositivo não duplica a guia
+        db.Index('uq_sales_guide_seller_local_id', 'seller_id', 'local_id', unique=True),
+        # Paginação por cursor (guide_date, id), por vendedor e por patrão
+        db.Index('ix_sales_guide_seller_date_id', 'seller_id', 'guide_date', 'id'),
+        db.Index('ix_sales_guide_date_id', 'guide_date', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     seller_id = db.Column(db.Integer, db.ForeignKey('seller.id'), nullable=False)
@@ -96,6 +105,9 @@ class GuideItem(db.Model):
     total_sold_value = db.Column(db.Numeric(10, 2), default=0)
     total_remaining_value = db.Column(db.Numeric(10, 2), default=0)
     
+    # Quantidade já registada em vendas associadas à guia (mantida pelas vendas, não recalculada)
+    quantity_sold_registered = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     def to_dict(self):
         """Converte o objeto para dicionário"""
         quantity_sold = self.get_quantity_sold()
@@ -106,6 +118,8 @@ class GuideItem(db.Model):
             'quantity_taken': self.quantity_taken,
             'quantity_remaining': self.quantity_remaining,
             'quantity_sold': quantity_sold,
+            'quantity_sold_registered': self.quantity_sold_registered or 0,
+            'quantity_available': self.quantity_taken - (self.quantity_sold_registered or 0),
             'unit_price': float(self.unit_price),
             'total_taken_value': float(self.total_taken_value),
             'total_sold_value': float(self.total_sold_value),
@@ -145,6 +159,12 @@ class GuideItem(db.Model):
             return 0
         return (self.quantity_remaining / self.quantity_taken * 100) if self.quantity_remaining else 0
     
+    def get_unregistered_quantity(self):
+        """Quantidade vendida segundo as sobras mas sem venda registada"""
+        if self.quantity_remaining is None:
+            return None
+        return self.get_quantity_sold() - (self.quantity_sold_registered or 0)
+    
     def __repr__(self):
         return f'<GuideItem {self.id} - {self.quantity_taken}x {self.product.name if self.product else "Unknown"}>'
 
@@ -4,6 +4,10 @@ from . import db
 
 class Product(db.Model):
     __tablename__ = 'product'
+    __table_args__ = (
+        # Suporta o download incremental (delta sync) por patrão
+        db.Index('ix_product_boss_updated_at', 'boss_id', 'updated_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     boss_id = db.Column(db.Integer, db.ForeignKey('boss.id'), nullable=False)
@@ -15,6 +19,7 @@ class Product(db.Model):
     
     # Relacionamentos
     sale_items = db.relationship('SaleItem', backref='product', lazy=True)
+    guide_items = db.relationship('GuideItem', backref='product', lazy=True)
     
     def to_dict(self):
         """Converte o objeto para dicionário"""
@@ -0,0 +1,43 @@
+from datetime import datetime
+from . import db
+
+
+class DailySalesRollup(db.Model):
+    """Totais diários de vendas por (patrão, vendedor, produto, dia), mantidos a cada escrita de vendas"""
+    __tablename__ = 'daily_sales_rollup'
+    __table_args__ = (
+        # Chave do agregado: cada venda soma (ou subtrai) na linha do seu dia
+        db.Index('uq_daily_sales_rollup_key', 'boss_id', 'seller_id', 'product_id', 'day', unique=True),
+        # Relatórios por patrão e intervalo de datas
+        db.Index('ix_daily_sales_rollup_boss_day', 'boss_id', 'day'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    boss_id = db.Column(db.Integer, db.ForeignKey('boss.id'), nullable=False)
+    seller_id = db.Column(db.Integer, db.ForeignKey('seller.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    cash_revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    credit_revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    sales_count = db.Column(db.Integer, nullable=False, default=0)  # Vendas que incluem o produto (somado entre produtos, conta uma vez por produto)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        """Converte o objeto para dicionário"""
+        return {
+            'id': self.id,
+            'boss_id': self.boss_id,
+            'seller_id': self.seller_id,
+            'product_id': self.product_id,
+            'day': self.day.isoformat() if self.day else None,
+            'quantity': self.quantity,
+            'revenue': float(self.revenue),
+            'cash_revenue': float(self.cash_revenue),
+            'credit_revenue': float(self.credit_revenue),
+            'sales_count': self.sales_count
+        }
+    
+    def __repr__(self):
+        return f'<DailySalesRollup {self.day} seller={self.seller_id} product={self.product_id}>'
@@ -4,6 +4,17 @@ from . import db
 
 class Sale(db.Model):
     __tablename__ = 'sale'
+    __table_args__ = (
+        # Suporta o download incremental (delta sync) por vendedor
+        db.Index('ix_sale_seller_last_modified', 'seller_id', 'last_modified'),
+        # Garante que um reenvio do dispositivo não duplica a venda
+        db.Index('uq_sale_seller_local_id', 'seller_id', 'local_id', unique=True),
+        # Paginação por cursor (sale_date, id), por vendedor e por patrão
+        db.Index('ix_sale_seller_date_id', 'seller_id', 'sale_date', 'id'),
+        db.Index('ix_sale_date_id', 'sale_date', 'id'),
+        # Agregação das vendas por guia na reconciliação
+        db.Index('ix_sale_guide_id', 'guide_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     seller_id = db.Column(db.Integer, db.ForeignKey('seller.id'), nullable=False)
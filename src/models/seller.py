@@ -15,6 +15,7 @@ class Seller(db.Model):
     
     # Relacionamentos
     sales = db.relationship('Sale', backref='seller', lazy=True)
+    sales_guides = db.relationship('SalesGuide', backref='seller', lazy=True)
     sync_queue = db.relationship('SyncQueue', backref='seller', lazy=True, cascade='all, delete-orphan')
     sync_logs = db.relationship('SyncLog', backref='seller', lazy=True, cascade='all, delete-orphan')
     
@@ -1,18 +1,26 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from . import db
 
 
 class SyncQueue(db.Model):
     __tablename__ = 'sync_queue'
+    __table_args__ = (
+        # Suporta a reclamação de operações pendentes pelos workers
+        db.Index('ix_sync_queue_status_next_attempt', 'status', 'next_attempt_at'),
+        # Suporta a deteção de reenvios e o endpoint de estado
+        db.Index('ix_sync_queue_seller_local_id', 'seller_id', 'local_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     seller_id = db.Column(db.Integer, db.ForeignKey('seller.id'), nullable=False)
     operation_type = db.Column(db.Enum('CREATE_SALE', 'UPDATE_SALE', 'CREATE_CREDIT_PAYMENT', 'CREATE_GUIDE', 'UPDATE_GUIDE', 'CLOSE_GUIDE', name='operation_type'), nullable=False)
     data = db.Column(db.JSON, nullable=False)
     local_id = db.Column(db.String(255), nullable=True)
-    status = db.Column(db.Enum('PENDING', 'PROCESSING', 'COMPLETED', 'FAILED', name='sync_status'), default='PENDING')
+    status = db.Column(db.Enum('PENDING', 'PROCESSING', 'COMPLETED', 'FAILED', name='sync_queue_status'), default='PENDING')
     attempts = db.Column(db.Integer, default=0)
     last_attempt = db.Column(db.DateTime, nullable=True)
+    next_attempt_at = db.Column(db.DateTime, nullable=True)  # Null = pode ser processada de imediato
+    server_id = db.Column(db.Integer, nullable=True)  # ID do registo criado quando concluída
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     error_message = db.Column(db.Text, nullable=True)
     
@@ -27,6 +35,8 @@ class SyncQueue(db.Model):
             'status': self.status,
             'attempts': self.attempts,
             'last_attempt': self.last_attempt.isoformat() if self.last_attempt else None,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'server_id': self.server_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'error_message': self.error_message
         }
@@ -37,15 +47,32 @@ class SyncQueue(db.Model):
         self.attempts += 1
         self.last_attempt = datetime.utcnow()
     
-    def mark_completed(self):
+    def mark_completed(self, server_id=None):
         """Marca a operação como concluída"""
         self.status = 'COMPLETED'
+        self.server_id = server_id
         self.error_message = None
+        self.next_attempt_at = None
     
     def mark_failed(self, error_message):
         """Marca a operação como falhada"""
         self.status = 'FAILED'
         self.error_message = error_message
+        self.next_attempt_at = None
+    
+    def requeue(self, data):
+        """Volta a pôr na fila uma operação FAILED reenviada pelo dispositivo"""
+        self.status = 'PENDING'
+        self.data = data
+        self.attempts = 0
+        self.error_message = None
+        self.next_attempt_at = None
+    
+    def schedule_retry(self, error_message, delay_seconds):
+        """Devolve a operação à fila para nova tentativa após o atraso indicado"""
+        self.status = 'PENDING'
+        self.error_message = error_message
+        self.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay_seconds)
     
     def __repr__(self):
         return f'<SyncQueue {self.id} - {self.operation_type} ({self.status})>'
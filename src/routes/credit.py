@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.models import db, Credit, CreditPayment, Customer, Seller
 from src.services.credit_service import CreditService
+from src.utils.pagination import parse_page_args, set_next_cursor
 from datetime import date
 
 credit_bp = Blueprint("credit", __name__)
@@ -11,9 +12,32 @@ credit_bp = Blueprint("credit", __name__)
 def get_credits():
     current_user = get_jwt_identity()
     
-    credits = CreditService.get_credits(current_user["role"], current_user["id"], current_user.get("boss_id"))
+    # Paginação opcional por cursor (?limit=&cursor=) e filtro por datas (?from=&to=)
+    try:
+        page = parse_page_args(request.args)
+        credits = CreditService.get_credits(current_user["role"], current_user["id"], current_user.get("boss_id"), **page)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
     
-    return jsonify([credit.to_dict() for credit in credits]), 200
+    response = jsonify([credit.to_dict() for credit in credits])
+    return set_next_cursor(response, credits, page["limit"], "created_at"), 200
+
+@credit_bp.route("/credits/aging", methods=["GET"])
+@jwt_required()
+def get_credit_aging():
+    current_user = get_jwt_identity()
+    
+    # ?as_of= (por omissão, hoje): data de referência para a idade de cada crédito
+    try:
+        as_of = date.fromisoformat(request.args["as_of"]) if request.args.get("as_of") else None
+    except ValueError:
+        return jsonify({"message": "Invalid date format for as_of"}), 400
+    
+    report = CreditService.get_aging_report(current_user["role"], current_user["id"], as_of)
+    if report is None:
+        return jsonify({"message": "Unauthorized"}), 403
+    
+    return jsonify(report), 200
 
 @credit_bp.route("/credits/<int:credit_id>", methods=["GET"])
 @jwt_required()
@@ -37,9 +61,7 @@ def pay_credit(credit_id):
     if not credit:
         return jsonify({"message": "Credit not found"}), 404
     
-    if credit.is_paid:
-        return jsonify({"message": "Credit already fully paid"}), 400
-    
+    # O crédito já pago é rejeitado pelo serviço, depois de procurar um reenvio do mesmo local_id
     data = request.get_json()
     amount = data.get("amount")
     payment_date_str = data.get("payment_date")
@@ -48,7 +70,8 @@ def pay_credit(credit_id):
     if not amount:
         return jsonify({"message": "Missing payment amount"}), 400
     
-    new_payment, error = CreditService.pay_credit(credit, amount, payment_date_str, local_id)
+    seller_id = current_user["id"] if current_user["role"] == "seller" else None
+    new_payment, error = CreditService.pay_credit(credit, amount, payment_date_str, local_id, seller_id)
     
     if error:
         return jsonify({"message": error}), 400
@@ -2,6 +2,13 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.models import db, Customer, Boss, Seller
 from src.services.customer_service import CustomerService
+from src.services.credit_service import CreditService
+from src.services.catalog_cache import CatalogCache
+from src.services.import_service import ImportService
+from src.utils.csv_format import uploaded_csv
+from src.utils.pagination import parse_page_args, encode_cursor
+from bisect import bisect_right
+from decimal import Decimal, InvalidOperation
 
 customer_bp = Blueprint("customer", __name__)
 
@@ -29,19 +36,74 @@ def create_customer():
     
     return jsonify({"message": "Customer created successfully", "customer": new_customer.to_dict()}), 201
 
+@customer_bp.route("/customers/import", methods=["POST"])
+@jwt_required()
+def import_customers():
+    current_user = get_jwt_identity()
+    if current_user["role"] != "boss":
+        return jsonify({"message": "Unauthorized"}), 403
+    
+    # CSV com a coluna name e (opcionais) address e phone
+    stream = uploaded_csv(request)
+    if stream is None:
+        return jsonify({"message": "Missing CSV file"}), 400
+    
+    report, error = ImportService.import_csv("customers", current_user["id"], stream)
+    if error:
+        return jsonify({"message": error}), 400
+    if report["errors_count"]:
+        return jsonify(dict(report, message="Invalid rows in CSV file; nothing was imported")), 400
+    
+    return jsonify(dict(report, message="Customers imported successfully")), 201
+
 @customer_bp.route("/customers", methods=["GET"])
 @jwt_required()
 def get_customers():
     current_user = get_jwt_identity()
     
     if current_user["role"] == "boss":
-        customers = CustomerService.get_customers_by_boss(current_user["id"])
+        boss_id = current_user["id"]
     elif current_user["role"] == "seller":
-        customers = CustomerService.get_customers_by_boss(current_user["boss_id"])
+        boss_id = current_user["boss_id"]
     else:
         return jsonify({"message": "Unauthorized"}), 403
     
-    return jsonify([customer.to_dict() for customer in customers]), 200
+    # Ordenação/filtro pelo saldo (?sort=-balance&min_balance=&max_balance=&limit=): lido da base de dados,
+    # porque o saldo muda a cada venda a crédito e pagamento e não faz parte do snapshot
+    if any(request.args.get(arg) for arg in ("sort", "min_balance", "max_balance")):
+        try:
+            min_balance = Decimal(request.args["min_balance"]) if request.args.get("min_balance") else None
+            max_balance = Decimal(request.args["max_balance"]) if request.args.get("max_balance") else None
+        except InvalidOperation:
+            return jsonify({"message": "Invalid min_balance/max_balance format"}), 400
+        try:
+            page = parse_page_args(request.args)
+            customers = CustomerService.get_customers_by_balance(
+                boss_id, request.args.get("sort", "-balance"), min_balance, max_balance, page["limit"]
+            )
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+        return jsonify([customer.to_dict(include_balance=True) for customer in customers]), 200
+    
+    catalog = CatalogCache.get(boss_id)
+    
+    # Sem paginação: servido a partir do snapshot do catálogo (304 se o cliente já tem a versão atual)
+    if not request.args.get("limit") and not request.args.get("cursor"):
+        return catalog.make_response(request, "customers")
+    
+    # Paginação por cursor sobre o snapshot, ordenado por id
+    try:
+        page = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    
+    customers = catalog.records["customers"]
+    start = bisect_right(customers, page["after"][1], key=lambda customer: customer["id"]) if page["after"] else 0
+    end = start + page["limit"] if page["limit"] else len(customers)
+    response = jsonify(customers[start:end])
+    if end < len(customers):
+        response.headers["X-Next-Cursor"] = encode_cursor(None, customers[end - 1]["id"])
+    return response, 200
 
 @customer_bp.route("/customers/<int:customer_id>", methods=["GET"])
 @jwt_required()
@@ -58,7 +120,38 @@ def get_customer(customer_id):
     if not customer:
         return jsonify({"message": "Customer not found"}), 404
     
-    return jsonify(customer.to_dict()), 200
+    return jsonify(customer.to_dict(include_balance=True)), 200
+
+@customer_bp.route("/customers/<int:customer_id>/payments", methods=["POST"])
+@jwt_required()
+def pay_customer_credits(customer_id):
+    current_user = get_jwt_identity()
+    
+    if current_user["role"] == "boss":
+        customer = CustomerService.get_customer_by_id(customer_id, current_user["id"])
+    elif current_user["role"] == "seller":
+        customer = CustomerService.get_customer_by_id(customer_id, current_user["boss_id"])
+    else:
+        return jsonify({"message": "Unauthorized"}), 403
+    
+    if not customer:
+        return jsonify({"message": "Customer not found"}), 404
+    
+    data = request.get_json()
+    amount = data.get("amount")
+    payment_date_str = data.get("payment_date")
+    local_id = data.get("local_id")
+    
+    if not amount:
+        return jsonify({"message": "Missing payment amount"}), 400
+    
+    seller_id = current_user["id"] if current_user["role"] == "seller" else None
+    result, error = CreditService.pay_customer_credits(customer.id, amount, payment_date_str, local_id, seller_id)
+    
+    if error:
+        return jsonify({"message": error}), 400
+    
+    return jsonify(dict(result, message="Payment recorded successfully")), 200
 
 @customer_bp.route("/customers/<int:customer_id>", methods=["PUT"])
 @jwt_required()
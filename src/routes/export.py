@@ -0,0 +1,48 @@
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from src.services.export_service import ExportService, EXPORT_DATASETS
+from src.utils.export_format import EXPORT_FORMATS, available_formats, iter_export
+from src.utils.pagination import parse_page_args
+
+export_bp = Blueprint("export", __name__)
+
+@export_bp.route("/exports/<dataset>", methods=["GET"])
+@jwt_required()
+def export_dataset(dataset):
+    current_user = get_jwt_identity()
+
+    if current_user["role"] == "boss":
+        boss_id = current_user["id"]
+        seller_id = request.args.get("seller_id")
+    elif current_user["role"] == "seller":
+        boss_id = current_user["boss_id"]
+        seller_id = current_user["id"]
+    else:
+        return jsonify({"message": "Unauthorized"}), 403
+
+    if dataset not in EXPORT_DATASETS:
+        return jsonify({"message": f"dataset must be one of: {', '.join(EXPORT_DATASETS)}"}), 404
+
+    # ?format=csv|parquet|arrow (por omissão, csv), ?from=&to= e ?seller_id= para o patrão
+    fmt = request.args.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"message": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    if fmt not in available_formats():
+        return jsonify({"message": f"The {fmt} format requires pyarrow, which is not installed"}), 501
+    try:
+        page = parse_page_args(request.args)
+        seller_id = int(seller_id) if seller_id else None
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    columns, query = ExportService.build_query(dataset, boss_id, seller_id, page["date_from"], page["date_to"])
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    period = "_".join(day.isoformat() for day in (page["date_from"], page["date_to"]) if day)
+    filename = f"{dataset}_{period}.{extension}" if period else f"{dataset}.{extension}"
+
+    body = iter_export(fmt, columns, ExportService.iter_batches(query))
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -2,7 +2,11 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.models import db, SalesGuide, GuideItem, Product, Seller
 from src.services.guide_service import GuideService
-from datetime import date
+from src.services.forecast_service import ForecastService
+from src.services.analytics_service import AnalyticsService
+from src.utils.pagination import parse_page_args, set_next_cursor
+from src.utils.csv_format import wants_csv, make_csv_response
+from datetime import date, timedelta
 
 guide_bp = Blueprint("guide", __name__)
 
@@ -37,9 +41,72 @@ def create_guide():
 def get_guides():
     current_user = get_jwt_identity()
     
-    guides = GuideService.get_guides(current_user["role"], current_user["id"], current_user.get("boss_id"))
+    # Paginação opcional por cursor (?limit=&cursor=) e filtro por datas (?from=&to=)
+    try:
+        page = parse_page_args(request.args)
+        guides = GuideService.get_guides(current_user["role"], current_user["id"], current_user.get("boss_id"), **page)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
     
-    return jsonify([guide.to_dict() for guide in guides]), 200
+    response = jsonify([guide.to_dict() for guide in guides])
+    return set_next_cursor(response, guides, page["limit"], "guide_date"), 200
+
+@guide_bp.route("/guides/suggestions", methods=["GET"])
+@jwt_required()
+def get_guide_suggestions():
+    current_user = get_jwt_identity()
+    
+    if current_user["role"] == "seller":
+        seller_id = current_user["id"]
+        boss_id = current_user["boss_id"]
+    elif current_user["role"] == "boss":
+        boss_id = current_user["id"]
+        try:
+            seller_id = int(request.args["seller_id"])
+        except (KeyError, ValueError):
+            return jsonify({"message": "Missing or invalid seller_id"}), 400
+    else:
+        return jsonify({"message": "Unauthorized"}), 403
+    
+    if not AnalyticsService.available():
+        return jsonify({"message": "Guide suggestions require NumPy, which is not installed"}), 501
+    
+    # ?date= (por omissão, amanhã): as sugestões são do dia da semana dessa data
+    try:
+        target_date = date.fromisoformat(request.args["date"]) if request.args.get("date") else date.today() + timedelta(days=1)
+    except ValueError:
+        return jsonify({"message": "Invalid date format for date"}), 400
+    
+    suggestions = ForecastService.get_suggestions(seller_id, boss_id, target_date)
+    return jsonify({
+        "date": target_date.isoformat(),
+        "weekday": target_date.weekday(),
+        "items": [suggestion.to_dict() for suggestion in suggestions]
+    }), 200
+
+@guide_bp.route("/guides/reconciliation", methods=["GET"])
+@jwt_required()
+def get_reconciliation():
+    current_user = get_jwt_identity()
+    
+    # ?from=&to= (por omissão, hoje), ?seller_id= para o patrão e ?format=csv
+    try:
+        page = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    try:
+        seller_id = int(request.args["seller_id"]) if request.args.get("seller_id") else None
+    except ValueError:
+        return jsonify({"message": "Invalid seller_id format"}), 400
+    
+    rows, totals = GuideService.get_reconciliation(current_user["role"], current_user["id"], page["date_from"], page["date_to"], seller_id)
+    
+    if wants_csv(request):
+        columns = ["guide_id", "guide_date", "seller_id", "seller_name", "status", "sales_count",
+                   "expected_sales_value", "total_sales_registered", "difference", "difference_percentage"]
+        return make_csv_response(rows, columns, "reconciliation.csv"), 200
+    
+    return jsonify({"guides": rows, "totals": totals}), 200
 
 @guide_bp.route("/guides/<int:guide_id>", methods=["GET"])
 @jwt_required()
@@ -55,12 +122,11 @@ def get_guide(guide_id):
 
 @guide_bp.route("/guides/<int:guide_id>/close", methods=["PUT"])
 @jwt_required()
-def close_guide():
+def close_guide(guide_id):
     current_user = get_jwt_identity()
     if current_user["role"] != "seller":
         return jsonify({"message": "Unauthorized"}), 403
     
-    guide_id = request.view_args["guide_id"]
     guide = GuideService.get_guide_by_id(guide_id, current_user["role"], current_user["id"], current_user.get("boss_id"))
     
     if not guide:
@@ -2,6 +2,9 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.models import db, Product, Boss
 from src.services.product_service import ProductService
+from src.services.catalog_cache import CatalogCache
+from src.services.import_service import ImportService
+from src.utils.csv_format import uploaded_csv
 
 product_bp = Blueprint("product", __name__)
 
@@ -30,19 +33,38 @@ def create_product():
     
     return jsonify({"message": "Product created successfully", "product": new_product.to_dict()}), 201
 
+@product_bp.route("/products/import", methods=["POST"])
+@jwt_required()
+def import_products():
+    current_user = get_jwt_identity()
+    if current_user["role"] != "boss":
+        return jsonify({"message": "Unauthorized"}), 403
+    
+    # CSV com as colunas name, price e (opcional) is_active
+    stream = uploaded_csv(request)
+    if stream is None:
+        return jsonify({"message": "Missing CSV file"}), 400
+    
+    report, error = ImportService.import_csv("products", current_user["id"], stream)
+    if error:
+        return jsonify({"message": error}), 400
+    if report["errors_count"]:
+        return jsonify(dict(report, message="Invalid rows in CSV file; nothing was imported")), 400
+    
+    return jsonify(dict(report, message="Products imported successfully")), 201
+
 @product_bp.route("/products", methods=["GET"])
 @jwt_required()
 def get_products():
     current_user = get_jwt_identity()
     
+    # Servido a partir do snapshot do catálogo (304 se o cliente já tem a versão atual)
     if current_user["role"] == "boss":
-        products = ProductService.get_products_by_boss(current_user["id"])
+        return CatalogCache.get(current_user["id"]).make_response(request, "products")
     elif current_user["role"] == "seller":
-        products = ProductService.get_products_by_boss(current_user["boss_id"], is_active=True)
+        return CatalogCache.get(current_user["boss_id"]).make_response(request, "active_products")
     else:
         return jsonify({"message": "Unauthorized"}), 403
-    
-    return jsonify([product.to_dict() for product in products]), 200
 
 @product_bp.route("/products/<int:product_id>", methods=["GET"])
 @jwt_required()
@@ -0,0 +1,100 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from src.services.report_service import ReportService, MAX_PRODUCTION_DAYS
+from src.services.analytics_service import AnalyticsService, ROLLING_WINDOW_DAYS
+from src.utils.pagination import parse_page_args
+from src.utils.csv_format import wants_csv, make_csv_response
+from datetime import date, timedelta
+
+report_bp = Blueprint("report", __name__)
+
+@report_bp.route("/reports/sales", methods=["GET"])
+@jwt_required()
+def get_sales_report():
+    current_user = get_jwt_identity()
+    
+    if current_user["role"] == "boss":
+        boss_id = current_user["id"]
+        seller_id = request.args.get("seller_id")
+    elif current_user["role"] == "seller":
+        boss_id = current_user["boss_id"]
+        seller_id = current_user["id"]
+    else:
+        return jsonify({"message": "Unauthorized"}), 403
+    
+    # ?from=&to=, ?group_by=day,seller,product (por omissão, day) e ?format=csv
+    try:
+        page = parse_page_args(request.args)
+        seller_id = int(seller_id) if seller_id else None
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    group_by = tuple(dimension.strip() for dimension in request.args.get("group_by", "day").split(",") if dimension.strip())
+    
+    try:
+        rows = ReportService.get_sales_report(boss_id, seller_id, page["date_from"], page["date_to"], group_by)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    
+    if wants_csv(request):
+        columns = list(rows[0].keys()) if rows else list(group_by)
+        return make_csv_response(rows, columns, "sales_report.csv"), 200
+    
+    return jsonify(rows), 200
+
+@report_bp.route("/reports/waste", methods=["GET"])
+@jwt_required()
+def get_waste_report():
+    current_user = get_jwt_identity()
+    
+    if current_user["role"] == "boss":
+        boss_id = current_user["id"]
+        seller_id = request.args.get("seller_id")
+    elif current_user["role"] == "seller":
+        boss_id = current_user["boss_id"]
+        seller_id = current_user["id"]
+    else:
+        return jsonify({"message": "Unauthorized"}), 403
+    
+    if not AnalyticsService.available():
+        return jsonify({"message": "Waste analytics require NumPy, which is not installed"}), 501
+    
+    # ?from=&to= e ?window= (dias da média móvel)
+    try:
+        page = parse_page_args(request.args)
+        seller_id = int(seller_id) if seller_id else None
+        window = int(request.args.get("window", ROLLING_WINDOW_DAYS))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    if window <= 0:
+        return jsonify({"message": "window must be positive"}), 400
+    
+    report = AnalyticsService.get_waste_report(boss_id, page["date_from"], page["date_to"], seller_id, window)
+    return jsonify(report), 200
+
+@report_bp.route("/reports/production", methods=["GET"])
+@jwt_required()
+def get_production_sheet():
+    current_user = get_jwt_identity()
+    if current_user["role"] != "boss":
+        return jsonify({"message": "Unauthorized"}), 403
+    
+    # ?from=&to= (por omissão, amanhã) e ?format=csv
+    try:
+        page = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    date_from = page["date_from"] or page["date_to"] or date.today() + timedelta(days=1)
+    date_to = page["date_to"] or date_from
+    if date_to < date_from:
+        return jsonify({"message": "to must not be before from"}), 400
+    if (date_to - date_from).days >= MAX_PRODUCTION_DAYS:
+        return jsonify({"message": f"The production sheet covers at most {MAX_PRODUCTION_DAYS} days"}), 400
+    
+    sheet = ReportService.get_production_sheet(current_user["id"], date_from, date_to)
+    
+    if wants_csv(request):
+        columns = ["date", "product_id", "product_name", "quantity_taken", "sellers_count",
+                   "suggested_quantity", "suggested_sellers_count", "production_quantity"]
+        return make_csv_response(sheet["rows"], columns, "production.csv"), 200
+    
+    return jsonify(sheet), 200
@@ -1,7 +1,8 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.models import db, Sale, SaleItem, Product, Customer, Seller, Credit, SalesGuide
-from src.services.sale_service import SaleService
+from src.services.sale_service import SaleService, MAX_BATCH_SALES
+from src.utils.pagination import parse_page_args, set_next_cursor
 from datetime import date
 
 sale_bp = Blueprint("sale", __name__)
@@ -24,11 +25,9 @@ def create_sale():
     local_id = data.get("local_id")
     guide_id = data.get("guide_id")
     
-    if not all([payment_type, items_data]):
-        return jsonify({"message": "Missing payment type or items data"}), 400
-    
-    if payment_type not in ["cash", "credit"]:
-        return jsonify({"message": "Invalid payment type"}), 400
+    error = SaleService.check_sale_data(payment_type, items_data)
+    if error:
+        return jsonify({"message": error}), 400
     
     new_sale, error = SaleService.create_sale(seller_id, customer_id, payment_type, sale_date_str, items_data, local_id, guide_id, boss_id)
     
@@ -37,14 +36,44 @@ def create_sale():
     
     return jsonify({"message": "Sale created successfully", "sale": new_sale.to_dict()}), 201
 
+@sale_bp.route("/sales/batch", methods=["POST"])
+@jwt_required()
+def create_sales_batch():
+    current_user = get_jwt_identity()
+    if current_user["role"] != "seller":
+        return jsonify({"message": "Unauthorized"}), 403
+    
+    data = request.get_json(silent=True) or {}
+    sales_data = data.get("sales")
+    if not isinstance(sales_data, list) or not all(isinstance(sale_data, dict) for sale_data in sales_data):
+        return jsonify({"message": "Invalid sales batch"}), 400
+    if not sales_data:
+        return jsonify({"message": "No sales in batch"}), 400
+    if len(sales_data) > MAX_BATCH_SALES:
+        return jsonify({"message": f"A batch can have at most {MAX_BATCH_SALES} sales"}), 400
+    
+    results = SaleService.create_sales_batch(current_user["id"], current_user["boss_id"], sales_data)
+    created = sum(1 for result in results if result["status"] == "success")
+    
+    return jsonify({
+        "message": f"{created} of {len(results)} sales created",
+        "results": results
+    }), 201 if created else 400
+
 @sale_bp.route("/sales", methods=["GET"])
 @jwt_required()
 def get_sales():
     current_user = get_jwt_identity()
     
-    sales = SaleService.get_sales(current_user["role"], current_user["id"], current_user.get("boss_id"))
+    # Paginação opcional por cursor (?limit=&cursor=) e filtro por datas (?from=&to=)
+    try:
+        page = parse_page_args(request.args)
+        sales = SaleService.get_sales(current_user["role"], current_user["id"], current_user.get("boss_id"), **page)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
     
-    return jsonify([sale.to_dict() for sale in sales]), 200
+    response = jsonify([sale.to_dict() for sale in sales])
+    return set_next_cursor(response, sales, page["limit"], "sale_date"), 200
 
 @sale_bp.route("/sales/<int:sale_id>", methods=["GET"])
 @jwt_required()
@@ -1,7 +1,9 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.models import db, SyncQueue, SyncLog, Sale, SaleItem, Credit, CreditPayment, SalesGuide, GuideItem, Product, Customer
 from src.services.sync_service import SyncService
+from src.utils.sync_format import make_sync_response, decode_sync_request
+from werkzeug.exceptions import RequestEntityTooLarge
 from datetime import datetime
 
 sync_bp = Blueprint("sync", __name__)
@@ -15,18 +17,51 @@ def upload_sync_data():
     
     seller_id = current_user["id"]
     boss_id = current_user["boss_id"]
-    data = request.get_json()
+    try:
+        data = decode_sync_request(request)
+    except RequestEntityTooLarge:
+        return jsonify({"message": "Sync payload too large"}), 413
+    except (ValueError, OSError, EOFError):
+        return jsonify({"message": "Invalid sync payload"}), 400
+    if not isinstance(data, dict) or not isinstance(data.get("operations", []), list):
+        return jsonify({"message": "Invalid sync payload"}), 400
     sync_operations = data.get("operations", [])
     
     if not sync_operations:
         return jsonify({"message": "No operations to sync"}), 200
     
-    results, error = SyncService.process_upload_operations(seller_id, sync_operations, boss_id)
+    # ?mode=sync mantém o processamento imediato dentro do pedido
+    if request.args.get("mode") == "sync":
+        results, error = SyncService.process_upload_operations(seller_id, sync_operations, boss_id)
+        
+        if error:
+            return jsonify({"message": error}), 500
+        
+        return make_sync_response(request, {"message": "Sync upload completed", "results": results})
+    
+    results, error = SyncService.enqueue_upload_operations(seller_id, sync_operations)
+    
+    if error:
+        return jsonify({"message": error}), 500
+    
+    return make_sync_response(request, {"message": "Sync upload queued", "results": results}, 202)
+
+@sync_bp.route("/sync/status", methods=["GET"])
+@jwt_required()
+def sync_status():
+    current_user = get_jwt_identity()
+    if current_user["role"] != "seller":
+        return jsonify({"message": "Unauthorized"}), 403
+    
+    local_ids = request.args.get("local_ids")
+    local_ids = [local_id for local_id in local_ids.split(",") if local_id] if local_ids else None
+    
+    status, error = SyncService.get_queue_status(current_user["id"], local_ids)
     
     if error:
         return jsonify({"message": error}), 500
     
-    return jsonify({"message": "Sync upload completed", "results": results}), 200
+    return jsonify(status), 200
 
 @sync_bp.route("/sync/download", methods=["GET"])
 @jwt_required()
@@ -38,11 +73,26 @@ def download_sync_data():
     seller_id = current_user["id"]
     boss_id = current_user["boss_id"]
     
-    data, error = SyncService.get_download_data(seller_id, boss_id)
+    since = request.args.get("since")
+    if since:
+        try:
+            since = SyncService.parse_cursor(since)
+        except ValueError:
+            return jsonify({"message": "Invalid since cursor"}), 400
+    else:
+        since = None
+    
+    # Modo streaming (NDJSON), pedido via Accept ou ?format=ndjson
+    wants_ndjson = request.accept_mimetypes.best_match(["application/json", "application/x-ndjson"]) == "application/x-ndjson"
+    if wants_ndjson or request.args.get("format") == "ndjson":
+        records = SyncService.iter_download_records(seller_id, boss_id, since)
+        return Response(stream_with_context(records), mimetype="application/x-ndjson")
+    
+    data, error = SyncService.get_download_data(seller_id, boss_id, since)
     
     if error:
         return jsonify({"message": error}), 500
     
-    return jsonify(data), 200
+    return make_sync_response(request, data)
 
 
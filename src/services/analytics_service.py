@@ -0,0 +1,168 @@
+from src.models import db, SalesGuide, GuideItem, Seller, Product
+from src.utils.pagination import apply_date_range
+
+try:
+    import numpy as np
+except ImportError:  # A análise vetorizada só está disponível se o NumPy estiver instalado
+    np = None
+
+# Janela, em dias, das médias móveis de desperdício e de taxa de venda
+ROLLING_WINDOW_DAYS = 7
+
+# Colunas do histórico de guias fechadas, pela ordem da query
+HISTORY_COLUMNS = ("product_id", "seller_id", "day", "taken", "remaining", "price")
+
+
+class AnalyticsService:
+    @staticmethod
+    def available():
+        return np is not None
+
+    @staticmethod
+    def load_guide_history(boss_id, date_from=None, date_to=None, seller_id=None):
+        """Lê os itens das guias fechadas como arrays NumPy, um por coluna.
+
+        A query devolve apenas as seis colunas necessárias (sem objetos ORM); as
+        linhas são transpostas diretamente para arrays do tipo adequado.
+        """
+        query = (db.select(GuideItem.product_id, SalesGuide.seller_id, SalesGuide.guide_date,
+                           GuideItem.quantity_taken, GuideItem.quantity_remaining, GuideItem.unit_price)
+                 .join(SalesGuide, SalesGuide.id == GuideItem.guide_id)
+                 .join(Seller, Seller.id == SalesGuide.seller_id)
+                 .filter(Seller.boss_id == boss_id, SalesGuide.status == "CLOSED", GuideItem.quantity_remaining.isnot(None)))
+        if seller_id is not None:
+            query = query.filter(SalesGuide.seller_id == seller_id)
+        query = apply_date_range(query, SalesGuide.guide_date, date_from, date_to)
+
+        rows = db.session.execute(query).all()
+        columns = list(zip(*rows)) if rows else [()] * len(HISTORY_COLUMNS)
+        return {
+            "product_id": np.array(columns[0], dtype=np.int64),
+            "seller_id": np.array(columns[1], dtype=np.int64),
+            "day": np.array(columns[2], dtype="datetime64[D]"),
+            "taken": np.array(columns[3], dtype=np.float64),
+            "remaining": np.array(columns[4], dtype=np.float64),
+            "price": np.array(columns[5], dtype=np.float64)
+        }
+
+    @staticmethod
+    def compute_guide_analytics(history, window=ROLLING_WINDOW_DAYS):
+        """Desperdício, taxa de venda, médias móveis e rankings, calculados em forma vetorizada.
+
+        history é um dicionário de arrays com as colunas de HISTORY_COLUMNS. Os
+        agregados por produto e por vendedor usam np.unique + np.bincount; a série
+        diária usa somas acumuladas para a média móvel de `window` dias.
+        """
+        taken = history["taken"]
+        remaining = history["remaining"]
+        sold = taken - remaining
+        price = history["price"]
+
+        totals = AnalyticsService._summary(taken.sum(), sold.sum(), remaining.sum(), (sold * price).sum(), (remaining * price).sum())
+        totals["items_count"] = int(taken.size)
+
+        return {
+            "totals": totals,
+            "products": AnalyticsService._ranking(history["product_id"], taken, sold, remaining, price),
+            "sellers": AnalyticsService._ranking(history["seller_id"], taken, sold, remaining, price),
+            "daily": AnalyticsService._daily_series(history["day"], taken, sold, remaining, window)
+        }
+
+    @staticmethod
+    def _ranking(keys, taken, sold, remaining, price):
+        """Agrega por chave e ordena por desperdício (maior primeiro), com a posição em cada ranking"""
+        if keys.size == 0:
+            return []
+        ids, inverse = np.unique(keys, return_inverse=True)
+        taken_sum = np.bincount(inverse, weights=taken)
+        sold_sum = np.bincount(inverse, weights=sold)
+        remaining_sum = np.bincount(inverse, weights=remaining)
+        sold_value = np.bincount(inverse, weights=sold * price)
+        waste_value = np.bincount(inverse, weights=remaining * price)
+
+        safe_taken = np.where(taken_sum > 0, taken_sum, 1)
+        waste_percentage = np.where(taken_sum > 0, remaining_sum / safe_taken * 100, 0)
+        sell_through = np.where(taken_sum > 0, sold_sum / safe_taken * 100, 0)
+
+        # Posição 1 = maior desperdício / maior taxa de venda
+        waste_rank = np.empty(ids.size, dtype=np.int64)
+        waste_rank[np.argsort(-waste_percentage, kind="stable")] = np.arange(1, ids.size + 1)
+        sell_through_rank = np.empty(ids.size, dtype=np.int64)
+        sell_through_rank[np.argsort(-sell_through, kind="stable")] = np.arange(1, ids.size + 1)
+
+        rows = []
+        for index in np.argsort(waste_rank):
+            row = AnalyticsService._summary(taken_sum[index], sold_sum[index], remaining_sum[index], sold_value[index], waste_value[index])
+            row.update({
+                "id": int(ids[index]),
+                "waste_rank": int(waste_rank[index]),
+                "sell_through_rank": int(sell_through_rank[index])
+            })
+            rows.append(row)
+        return rows
+
+    @staticmethod
+    def _daily_series(days, taken, sold, remaining, window):
+        """Totais por dia (todos os dias do intervalo) e médias móveis da taxa de venda e do desperdício"""
+        if days.size == 0:
+            return []
+        first_day = days.min()
+        offsets = (days - first_day).astype(np.int64)
+        length = int(offsets.max()) + 1
+        taken_by_day = np.bincount(offsets, weights=taken, minlength=length)
+        sold_by_day = np.bincount(offsets, weights=sold, minlength=length)
+        remaining_by_day = np.bincount(offsets, weights=remaining, minlength=length)
+
+        def rolling(values):
+            cumulative = np.concatenate(([0.0], np.cumsum(values)))
+            starts = np.maximum(np.arange(1, length + 1) - window, 0)
+            return cumulative[1:] - cumulative[starts]
+
+        rolling_taken = rolling(taken_by_day)
+        safe_rolling_taken = np.where(rolling_taken > 0, rolling_taken, 1)
+        rolling_sell_through = np.where(rolling_taken > 0, rolling(sold_by_day) / safe_rolling_taken * 100, 0)
+        rolling_waste = np.where(rolling_taken > 0, rolling(remaining_by_day) / safe_rolling_taken * 100, 0)
+
+        calendar = first_day + np.arange(length)
+        return [{
+            "day": str(calendar[index]),
+            "taken": int(taken_by_day[index]),
+            "sold": int(sold_by_day[index]),
+            "remaining": int(remaining_by_day[index]),
+            "rolling_sell_through": round(float(rolling_sell_through[index]), 2),
+            "rolling_waste_percentage": round(float(rolling_waste[index]), 2)
+        } for index in range(length)]
+
+    @staticmethod
+    def _summary(taken, sold, remaining, sold_value, waste_value):
+        return {
+            "taken": int(taken),
+            "sold": int(sold),
+            "remaining": int(remaining),
+            "sold_value": round(float(sold_value), 2),
+            "waste_value": round(float(waste_value), 2),
+            "waste_percentage": round(float(remaining / taken * 100), 2) if taken > 0 else 0,
+            "sell_through": round(float(sold / taken * 100), 2) if taken > 0 else 0
+        }
+
+    @staticmethod
+    def get_waste_report(boss_id, date_from=None, date_to=None, seller_id=None, window=ROLLING_WINDOW_DAYS):
+        """Relatório de desperdício das guias fechadas, com os nomes de produtos e vendedores"""
+        history = AnalyticsService.load_guide_history(boss_id, date_from, date_to, seller_id)
+        report = AnalyticsService.compute_guide_analytics(history, window)
+
+        product_names = dict(db.session.execute(
+            db.select(Product.id, Product.name).filter(Product.id.in_([row["id"] for row in report["products"]]))
+        ).all()) if report["products"] else {}
+        seller_names = dict(db.session.execute(
+            db.select(Seller.id, Seller.name).filter(Seller.id.in_([row["id"] for row in report["sellers"]]))
+        ).all()) if report["sellers"] else {}
+        for row in report["products"]:
+            row["product_id"] = row.pop("id")
+            row["product_name"] = product_names.get(row["product_id"])
+        for row in report["sellers"]:
+            row["seller_id"] = row.pop("id")
+            row["seller_name"] = seller_names.get(row["seller_id"])
+
+        report["window"] = window
+        return report
@@ -0,0 +1,89 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from flask import Response
+from sqlalchemy import update
+from src.models import db, Boss, Product, Customer
+
+# Número máximo de patrões com snapshot em memória (LRU)
+CATALOG_CACHE_SIZE = 256
+
+# Segundos durante os quais um snapshot é servido sem confirmar a versão na base de dados.
+# As escritas neste processo invalidam logo; as de outros processos são vistas após este intervalo.
+CATALOG_REVALIDATE_SECONDS = 5
+
+
+class CatalogSnapshot:
+    """Catálogo (produtos e clientes) de um patrão, serializado uma única vez"""
+
+    def __init__(self, boss_id, version, products, customers):
+        self.boss_id = boss_id
+        self.version = version
+        self.checked_at = time.monotonic()
+        self.records = {
+            'products': products,
+            'active_products': [product for product in products if product['is_active']],
+            'customers': customers
+        }
+        self.bodies = {view: json.dumps(records, separators=(',', ':')).encode('utf-8') for view, records in self.records.items()}
+
+    def etag(self, view):
+        return f'catalog-{self.boss_id}-{self.version}-{view}'
+
+    def make_response(self, request, view):
+        """Resposta JSON com ETag; 304 se o cliente já tem esta versão"""
+        etag = self.etag(view)
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(self.bodies[view], mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class CatalogCache:
+    _snapshots = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get(boss_id):
+        """Devolve o snapshot do catálogo do patrão, reconstruindo-o se a versão mudou"""
+        with CatalogCache._lock:
+            snapshot = CatalogCache._snapshots.get(boss_id)
+            if snapshot is not None:
+                CatalogCache._snapshots.move_to_end(boss_id)
+                if time.monotonic() - snapshot.checked_at < CATALOG_REVALIDATE_SECONDS:
+                    return snapshot
+        
+        version = db.session.scalar(db.select(Boss.catalog_version).filter(Boss.id == boss_id))
+        if snapshot is not None and snapshot.version == version:
+            snapshot.checked_at = time.monotonic()
+            return snapshot
+        
+        products = [product.to_dict() for product in Product.query.filter_by(boss_id=boss_id).order_by(Product.id)]
+        customers = [customer.to_dict() for customer in Customer.query.filter_by(boss_id=boss_id).order_by(Customer.id)]
+        snapshot = CatalogSnapshot(boss_id, version, products, customers)
+        
+        with CatalogCache._lock:
+            CatalogCache._snapshots[boss_id] = snapshot
+            CatalogCache._snapshots.move_to_end(boss_id)
+            while len(CatalogCache._snapshots) > CATALOG_CACHE_SIZE:
+                CatalogCache._snapshots.popitem(last=False)
+        return snapshot
+
+    @staticmethod
+    def commit_changes(boss_id):
+        """Confirma a transação atual, incrementando a versão do catálogo do patrão"""
+        db.session.execute(
+            update(Boss).where(Boss.id == boss_id).values(catalog_version=Boss.catalog_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        CatalogCache.evict(boss_id)
+
+    @staticmethod
+    def evict(boss_id):
+        with CatalogCache._lock:
+            CatalogCache._snapshots.pop(boss_id, None)
@@ -1,14 +1,97 @@
-from src.models import db, Credit, CreditPayment, Customer
-from datetime import date, datetime
+from src.models import db, Credit, CreditPayment, Customer, Sale, Seller
+from src.services.customer_service import CustomerService
+from src.services.query_profiles import credit_profile
+from src.utils.pagination import apply_date_range, apply_keyset
+from sqlalchemy import update, select, insert, func, case
+from sqlalchemy.exc import IntegrityError
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+CENT = Decimal("0.01")
+
+# Escalões de antiguidade da dívida, em dias desde o vencimento (ou a criação, sem vencimento);
+# "current" é a dívida ainda não vencida
+AGING_BUCKETS = ("current", "0-30", "31-60", "61-90", "90+")
 
 class CreditService:
     @staticmethod
-    def get_credits(user_role, user_id, boss_id):
+    def get_credits(user_role, user_id, boss_id, date_from=None, date_to=None, after=None, limit=None):
+        if user_role == "boss":
+            query = Credit.query.join(Customer).filter(Customer.boss_id == user_id)
+        elif user_role == "seller":
+            query = Credit.query.join(Customer).filter(Customer.boss_id == boss_id)
+        else:
+            return []
+        # O intervalo de datas filtra pelo vencimento; a paginação segue a ordem de criação
+        query = apply_date_range(query, Credit.due_date, date_from, date_to)
+        return apply_keyset(query, Credit.created_at, Credit.id, after, limit).options(*credit_profile()).all()
+
+    @staticmethod
+    def get_aging_report(user_role, user_id, as_of=None):
+        """Antiguidade da dívida por cliente e por vendedor, numa única query agregada.
+
+        A query agrupa os créditos por pagar por (cliente, vendedor), com uma soma
+        por escalão; os totais por cliente e por vendedor são somados em Python
+        sobre essas linhas. Os créditos com vencimento depois de as_of ficam em
+        "current"; os restantes contam a partir do vencimento (0-30 inclui o
+        próprio dia).
+        """
+        as_of = as_of or date.today()
+        
+        outstanding = Credit.amount - Credit.amount_paid
+        reference_date = func.coalesce(Credit.due_date, func.date(Credit.created_at))
+        bounds = [as_of - timedelta(days=days) for days in (30, 60, 90)]
+        bucket_columns = [
+            func.sum(case((reference_date > as_of, outstanding), else_=0)),
+            func.sum(case(((reference_date <= as_of) & (reference_date >= bounds[0]), outstanding), else_=0)),
+            func.sum(case(((reference_date < bounds[0]) & (reference_date >= bounds[1]), outstanding), else_=0)),
+            func.sum(case(((reference_date < bounds[1]) & (reference_date >= bounds[2]), outstanding), else_=0)),
+            func.sum(case((reference_date < bounds[2], outstanding), else_=0))
+        ]
+        query = (db.select(Customer.id, Customer.name, Seller.id, Seller.name, func.count(Credit.id), *bucket_columns)
+                 .select_from(Credit)
+                 .join(Customer, Customer.id == Credit.customer_id)
+                 .join(Sale, Sale.id == Credit.sale_id)
+                 .join(Seller, Seller.id == Sale.seller_id)
+                 .filter(Credit.is_paid.is_(False))
+                 .group_by(Customer.id, Customer.name, Seller.id, Seller.name))
         if user_role == "boss":
-            return Credit.query.join(Customer).filter(Customer.boss_id == user_id).all()
+            query = query.filter(Customer.boss_id == user_id)
         elif user_role == "seller":
-            return Credit.query.join(Customer).filter(Customer.boss_id == boss_id).all()
-        return []
+            query = query.filter(Sale.seller_id == user_id)
+        else:
+            return None
+        
+        customers, sellers = {}, {}
+        totals = CreditService._aging_row({})
+        for customer_id, customer_name, seller_id, seller_name, credits_count, *amounts in db.session.execute(query):
+            amounts = [Decimal(str(amount or 0)) for amount in amounts]
+            customer = customers.setdefault(customer_id, CreditService._aging_row({"customer_id": customer_id, "customer_name": customer_name}))
+            seller = sellers.setdefault(seller_id, CreditService._aging_row({"seller_id": seller_id, "seller_name": seller_name}))
+            for row in (customer, seller, totals):
+                row["credits_count"] += credits_count
+                for bucket, amount in zip(AGING_BUCKETS, amounts):
+                    row[bucket] += amount
+                    row["total"] += amount
+        
+        def serialize(rows):
+            rows = sorted(rows, key=lambda row: row["total"], reverse=True)
+            return [{key: float(value) if isinstance(value, Decimal) else value for key, value in row.items()} for row in rows]
+        
+        report = {
+            "as_of": as_of.isoformat(),
+            "buckets": list(AGING_BUCKETS),
+            "customers": serialize(customers.values()),
+            "sellers": serialize(sellers.values()),
+            "totals": serialize([totals])[0]
+        }
+        return report
+
+    @staticmethod
+    def _aging_row(row):
+        row.update({"credits_count": 0, "total": Decimal(0)})
+        row.update({bucket: Decimal(0) for bucket in AGING_BUCKETS})
+        return row
 
     @staticmethod
     def get_credit_by_id(credit_id, user_role, user_id, boss_id):
@@ -19,12 +102,12 @@ class CreditService:
         return None
 
     @staticmethod
-    def pay_credit(credit, amount, payment_date_str, local_id):
+    def pay_credit(credit, amount, payment_date_str, local_id, seller_id=None):
         try:
-            amount = float(amount)
+            amount = Decimal(str(amount)).quantize(CENT)
             if amount <= 0:
                 return None, "Amount must be positive"
-        except ValueError:
+        except (InvalidOperation, ValueError):
             return None, "Invalid amount format"
         
         try:
@@ -32,25 +115,189 @@ class CreditService:
         except ValueError:
             return None, "Invalid date format for payment_date"
         
-        if amount > credit.get_remaining_amount():
-            amount = credit.get_remaining_amount()
+        # Reenvio de um pagamento já registado pelo vendedor: devolver o existente
+        existing_payment = CreditService._find_payment(seller_id, local_id)
+        if existing_payment:
+            return existing_payment, None
+        
+        amount = CreditService.apply_payment(credit.id, amount)
+        if amount <= 0:
+            db.session.rollback()
+            return None, "Credit already fully paid"
         
         new_payment = CreditPayment(
             credit_id=credit.id,
+            seller_id=seller_id,
             amount=amount,
             payment_date=payment_date,
             local_id=local_id,
             sync_status="PENDING" if local_id else "SYNCED"
         )
-        db.session.add(new_payment)
+        try:
+            db.session.add(new_payment)
+            db.session.commit()
+        except IntegrityError:
+            # Um reenvio concorrente registou o mesmo pagamento: o rollback desfaz também este apply_payment
+            db.session.rollback()
+            existing_payment = CreditService._find_payment(seller_id, local_id)
+            if not existing_payment:
+                raise
+            return existing_payment, None
+        return new_payment, None
+
+    @staticmethod
+    def _find_payment(seller_id, local_id):
+        """Pagamento já registado pelo vendedor com este local_id"""
+        if not (local_id and seller_id):
+            return None
+        return CreditPayment.query.filter_by(seller_id=seller_id, local_id=local_id).first()
+
+    @staticmethod
+    def _find_allocation(seller_id, local_id):
+        """Pagamentos de uma distribuição já registada pelo vendedor ('<local_id>#<n>')"""
+        if not (local_id and seller_id):
+            return []
+        return CreditPayment.query.filter(
+            CreditPayment.seller_id == seller_id, CreditPayment.local_id.startswith(f"{local_id}#", autoescape=True)
+        ).order_by(CreditPayment.id).all()
+
+    @staticmethod
+    def apply_payment(credit_id, amount):
+        """Soma o pagamento ao crédito com um UPDATE atómico; devolve o valor efetivamente aplicado.
+
+        O UPDATE só é aplicado se o pagamento não ultrapassar o valor em dívida
+        (amount_paid + x <= amount), pelo que pagamentos concorrentes nunca se
+        perdem nem pagam a mais. Se ultrapassar, o pagamento é limitado ao valor
+        em dívida lido nesse momento e o UPDATE é repetido. Devolve 0 se o crédito
+        já estiver pago. O saldo em dívida do cliente é atualizado na mesma
+        transação e o objeto Credit na sessão é expirado.
+        """
+        amount = Decimal(amount).quantize(CENT)
+        while amount > 0:
+            customer_id = db.session.execute(
+                update(Credit)
+                .where(Credit.id == credit_id, Credit.amount_paid + amount <= Credit.amount)
+                .values(amount_paid=Credit.amount_paid + amount, is_paid=Credit.amount_paid + amount >= Credit.amount)
+                .returning(Credit.customer_id)
+                .execution_options(synchronize_session=False)
+            ).scalar()
+            if customer_id is not None:
+                CustomerService.adjust_balances({customer_id: -amount})
+                break
+            remaining = db.session.scalar(select(Credit.amount - Credit.amount_paid).where(Credit.id == credit_id))
+            if remaining is None:
+                raise ValueError("Credit not found")
+            amount = min(amount, Decimal(str(remaining)).quantize(CENT))
         
-        credit.amount_paid += amount
-        if credit.amount_paid >= credit.amount:
-            credit.is_paid = True
-            credit.amount_paid = credit.amount
+        credit = db.session.identity_map.get(db.session.identity_key(Credit, credit_id))
+        if credit is not None:
+            db.session.expire(credit)
+        return max(amount, Decimal(0))
+
+    @staticmethod
+    def pay_customer_credits(customer_id, amount, payment_date_str, local_id, seller_id=None):
+        """Distribui um pagamento pelos créditos em aberto do cliente, do mais antigo para o mais recente.
+
+        Os créditos são lidos (e bloqueados, em PostgreSQL) numa única query,
+        ordenados por due_date (sem data no fim) e created_at. A distribuição é
+        calculada em Python e aplicada com um UPDATE em bloco dos créditos e um
+        INSERT em bloco dos pagamentos, numa única transação. Cada pagamento
+        recebe o local_id '<local_id>#<n>', para que um reenvio não pague duas vezes.
+        """
+        try:
+            amount = Decimal(str(amount)).quantize(CENT)
+            if amount <= 0:
+                return None, "Amount must be positive"
+        except (InvalidOperation, ValueError):
+            return None, "Invalid amount format"
         
-        db.session.commit()
-        return new_payment, None
+        try:
+            payment_date = date.fromisoformat(payment_date_str) if payment_date_str else date.today()
+        except ValueError:
+            return None, "Invalid date format for payment_date"
+        
+        # Reenvio de uma distribuição já registada pelo vendedor: devolver os pagamentos existentes
+        existing_payments = CreditService._find_allocation(seller_id, local_id)
+        if existing_payments:
+            return CreditService._allocation_result(customer_id, existing_payments, Decimal(0)), None
+        
+        open_credits = db.session.execute(
+            select(Credit.id, Credit.amount, Credit.amount_paid)
+            .filter(Credit.customer_id == customer_id, Credit.is_paid.is_(False))
+            .order_by(Credit.due_date.asc().nulls_last(), Credit.created_at, Credit.id)
+            .with_for_update()
+        ).all()
+        if not open_credits:
+            return None, "Customer has no open credits"
+        
+        remaining = amount
+        credit_updates = []
+        payments = []
+        for credit_id, credit_amount, amount_paid in open_credits:
+            if remaining <= 0:
+                break
+            amount_paid = Decimal(str(amount_paid or 0))
+            allocated = min(remaining, Decimal(str(credit_amount)) - amount_paid)
+            if allocated <= 0:
+                continue
+            remaining -= allocated
+            credit_updates.append({
+                "id": credit_id,
+                "amount_paid": amount_paid + allocated,
+                "is_paid": amount_paid + allocated >= credit_amount
+            })
+            payments.append({
+                "credit_id": credit_id,
+                "seller_id": seller_id,
+                "amount": allocated,
+                "payment_date": payment_date,
+                "local_id": f"{local_id}#{len(payments) + 1}" if local_id else None,
+                "sync_status": "PENDING" if local_id else "SYNCED"
+            })
+        
+        try:
+            db.session.execute(update(Credit), credit_updates)
+            CustomerService.adjust_balances({customer_id: -(amount - remaining)})
+            payment_ids = db.session.scalars(
+                insert(CreditPayment).returning(CreditPayment.id, sort_by_parameter_order=True),
+                payments
+            ).all()
+            db.session.commit()
+        except IntegrityError:
+            # Um reenvio concorrente registou a mesma distribuição: devolver a gravada
+            db.session.rollback()
+            existing_payments = CreditService._find_allocation(seller_id, local_id)
+            if not existing_payments:
+                raise
+            return CreditService._allocation_result(customer_id, existing_payments, Decimal(0)), None
+        
+        new_payments = CreditPayment.query.filter(CreditPayment.id.in_(payment_ids)).order_by(CreditPayment.id).all()
+        return CreditService._allocation_result(customer_id, new_payments, remaining), None
+
+    @staticmethod
+    def _allocation_result(customer_id, payments, unallocated):
+        """Pagamentos da distribuição, estado atualizado dos créditos abrangidos e saldo do cliente"""
+        credit_ids = [payment.credit_id for payment in payments]
+        credits = {credit.id: credit for credit in Credit.query.filter(Credit.id.in_(credit_ids))}
+        outstanding = db.session.scalar(
+            select(func.coalesce(func.sum(Credit.amount - Credit.amount_paid), 0))
+            .filter(Credit.customer_id == customer_id, Credit.is_paid.is_(False))
+        )
+        return {
+            "customer_id": customer_id,
+            "allocations": [{
+                "payment_id": payment.id,
+                "credit_id": payment.credit_id,
+                "amount": float(payment.amount),
+                "credit_amount": float(credits[payment.credit_id].amount),
+                "credit_amount_paid": float(credits[payment.credit_id].amount_paid),
+                "credit_amount_remaining": float(credits[payment.credit_id].amount - credits[payment.credit_id].amount_paid),
+                "credit_is_paid": credits[payment.credit_id].is_paid
+            } for payment in payments],
+            "total_allocated": float(sum(payment.amount for payment in payments)),
+            "unallocated": float(unallocated),
+            "outstanding_balance": float(outstanding)
+        }
 
     @staticmethod
     def get_credit_payments(credit_id, user_role, user_id, boss_id):
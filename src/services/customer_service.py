@@ -1,17 +1,78 @@
-from src.models import db, Customer
+from src.models import db, Customer, Credit
+from src.services.catalog_cache import CatalogCache
+from sqlalchemy import bindparam, func, select
 
 class CustomerService:
     @staticmethod
     def create_customer(boss_id, name, address=None, phone=None):
         new_customer = Customer(boss_id=boss_id, name=name, address=address, phone=phone)
         db.session.add(new_customer)
-        db.session.commit()
+        CatalogCache.commit_changes(boss_id)
         return new_customer
     
     @staticmethod
     def get_customers_by_boss(boss_id):
         return Customer.query.filter_by(boss_id=boss_id).all()
     
+    @staticmethod
+    def get_customers_by_balance(boss_id, sort="-balance", min_balance=None, max_balance=None, limit=None):
+        """Clientes do patrão com o saldo em dívida, ordenados e filtrados pelo saldo na base de dados"""
+        orderings = {
+            "balance": (Customer.outstanding_balance, Customer.id),
+            "-balance": (Customer.outstanding_balance.desc(), Customer.id),
+            "name": (Customer.name, Customer.id),
+            "id": (Customer.id,)
+        }
+        if sort not in orderings:
+            raise ValueError(f"sort must be one of: {', '.join(orderings)}")
+        
+        query = Customer.query.filter_by(boss_id=boss_id)
+        if min_balance is not None:
+            query = query.filter(Customer.outstanding_balance >= min_balance)
+        if max_balance is not None:
+            query = query.filter(Customer.outstanding_balance <= max_balance)
+        query = query.order_by(*orderings[sort])
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+    
+    @staticmethod
+    def adjust_balances(deltas):
+        """Soma a cada cliente a variação do seu saldo em dívida, na transação atual.
+
+        deltas mapeia o ID do cliente para a variação (positiva numa venda a
+        crédito, negativa num pagamento). O incremento é feito na base de dados
+        (SET saldo = saldo + delta), num único UPDATE executemany. O updated_at
+        não é alterado, para o cliente não voltar ao download incremental.
+        """
+        params = [{"c_id": customer_id, "delta": delta} for customer_id, delta in deltas.items() if delta]
+        if not params:
+            return
+        table = Customer.__table__
+        db.session.execute(
+            table.update()
+            .where(table.c.id == bindparam("c_id"))
+            .values(outstanding_balance=table.c.outstanding_balance + bindparam("delta"), updated_at=table.c.updated_at),
+            params
+        )
+    
+    @staticmethod
+    def rebuild_balances(boss_id=None):
+        """Recalcula o saldo em dívida de todos os clientes a partir dos créditos por pagar.
+
+        Um único UPDATE com uma subquery correlacionada; devolve o número de clientes atualizados.
+        """
+        table = Customer.__table__
+        owed = (select(func.coalesce(func.sum(Credit.amount - Credit.amount_paid), 0))
+                .where(Credit.customer_id == table.c.id, Credit.is_paid.is_(False))
+                .scalar_subquery())
+        statement = table.update().values(outstanding_balance=owed, updated_at=table.c.updated_at)
+        if boss_id is not None:
+            statement = statement.where(table.c.boss_id == boss_id)
+        result = db.session.execute(statement)
+        db.session.commit()
+        return result.rowcount
+    
     @staticmethod
     def get_customer_by_id(customer_id, boss_id=None):
         if boss_id:
@@ -26,13 +87,13 @@ class CustomerService:
             customer.address = address
         if phone is not None:
             customer.phone = phone
-        db.session.commit()
+        CatalogCache.commit_changes(customer.boss_id)
         return customer
     
     @staticmethod
     def delete_customer(customer):
         db.session.delete(customer)
-        db.session.commit()
+        CatalogCache.commit_changes(customer.boss_id)
         return True
 
 
@@ -0,0 +1,124 @@
+from src.models import db, Sale, SaleItem, Credit, SalesGuide, GuideItem, Seller, Customer, Product
+from src.utils.pagination import apply_date_range
+from datetime import datetime, time, timedelta
+
+# Linhas lidas do cursor do lado do servidor de cada vez (e por lote/row group no ficheiro)
+EXPORT_BATCH_SIZE = 5000
+
+# Conjuntos exportáveis
+EXPORT_DATASETS = ("sales", "credits", "guides")
+
+
+class ExportService:
+    @staticmethod
+    def export_columns(dataset):
+        """Colunas do conjunto como pares (nome, tipo) e as expressões SQL correspondentes"""
+        if dataset == "sales":
+            # Uma linha por item vendido
+            return [
+                ("sale_id", "int", Sale.id),
+                ("sale_date", "date", Sale.sale_date),
+                ("seller_id", "int", Sale.seller_id),
+                ("seller_name", "str", Seller.name),
+                ("customer_id", "int", Sale.customer_id),
+                ("customer_name", "str", Customer.name),
+                ("guide_id", "int", Sale.guide_id),
+                ("payment_type", "str", Sale.payment_type),
+                ("product_id", "int", SaleItem.product_id),
+                ("product_name", "str", Product.name),
+                ("quantity", "int", SaleItem.quantity),
+                ("unit_price", "decimal", SaleItem.unit_price),
+                ("subtotal", "decimal", SaleItem.subtotal),
+                ("sale_total", "decimal", Sale.total_amount)
+            ]
+        if dataset == "credits":
+            return [
+                ("credit_id", "int", Credit.id),
+                ("created_at", "datetime", Credit.created_at),
+                ("due_date", "date", Credit.due_date),
+                ("customer_id", "int", Credit.customer_id),
+                ("customer_name", "str", Customer.name),
+                ("sale_id", "int", Credit.sale_id),
+                ("sale_date", "date", Sale.sale_date),
+                ("seller_id", "int", Sale.seller_id),
+                ("seller_name", "str", Seller.name),
+                ("amount", "decimal", Credit.amount),
+                ("amount_paid", "decimal", Credit.amount_paid),
+                ("is_paid", "bool", Credit.is_paid)
+            ]
+        if dataset == "guides":
+            # Uma linha por item de guia
+            return [
+                ("guide_id", "int", SalesGuide.id),
+                ("guide_date", "date", SalesGuide.guide_date),
+                ("seller_id", "int", SalesGuide.seller_id),
+                ("seller_name", "str", Seller.name),
+                ("status", "str", SalesGuide.status),
+                ("product_id", "int", GuideItem.product_id),
+                ("product_name", "str", Product.name),
+                ("quantity_taken", "int", GuideItem.quantity_taken),
+                ("quantity_remaining", "int", GuideItem.quantity_remaining),
+                ("quantity_sold_registered", "int", GuideItem.quantity_sold_registered),
+                ("unit_price", "decimal", GuideItem.unit_price),
+                ("total_taken_value", "decimal", GuideItem.total_taken_value),
+                ("total_sold_value", "decimal", GuideItem.total_sold_value),
+                ("total_remaining_value", "decimal", GuideItem.total_remaining_value)
+            ]
+        raise ValueError(f"dataset must be one of: {', '.join(EXPORT_DATASETS)}")
+
+    @staticmethod
+    def build_query(dataset, boss_id, seller_id=None, date_from=None, date_to=None):
+        """Query do conjunto com apenas as colunas exportadas, filtrada por patrão, vendedor e datas.
+
+        Vendas e guias filtram pela data da venda/guia; créditos pela data de
+        criação. A ordem segue os índices (data, id), para que o cursor percorra
+        as linhas sem ordenar o resultado inteiro.
+        """
+        columns = ExportService.export_columns(dataset)
+        query = db.select(*(expression for _, _, expression in columns))
+
+        if dataset == "sales":
+            query = (query.select_from(SaleItem)
+                     .join(Sale, Sale.id == SaleItem.sale_id)
+                     .join(Seller, Seller.id == Sale.seller_id)
+                     .outerjoin(Customer, Customer.id == Sale.customer_id)
+                     .join(Product, Product.id == SaleItem.product_id))
+            query = apply_date_range(query, Sale.sale_date, date_from, date_to)
+            seller_column, order = Sale.seller_id, (Sale.sale_date, Sale.id, SaleItem.id)
+        elif dataset == "credits":
+            query = (query.select_from(Credit)
+                     .join(Customer, Customer.id == Credit.customer_id)
+                     .join(Sale, Sale.id == Credit.sale_id)
+                     .join(Seller, Seller.id == Sale.seller_id))
+            # created_at é um instante: o intervalo inclui o dia date_to inteiro
+            if date_from is not None:
+                query = query.filter(Credit.created_at >= datetime.combine(date_from, time.min))
+            if date_to is not None:
+                query = query.filter(Credit.created_at < datetime.combine(date_to + timedelta(days=1), time.min))
+            seller_column, order = Sale.seller_id, (Credit.created_at, Credit.id)
+        else:
+            query = (query.select_from(GuideItem)
+                     .join(SalesGuide, SalesGuide.id == GuideItem.guide_id)
+                     .join(Seller, Seller.id == SalesGuide.seller_id)
+                     .join(Product, Product.id == GuideItem.product_id))
+            query = apply_date_range(query, SalesGuide.guide_date, date_from, date_to)
+            seller_column, order = SalesGuide.seller_id, (SalesGuide.guide_date, SalesGuide.id, GuideItem.id)
+
+        query = query.filter(Seller.boss_id == boss_id)
+        if seller_id is not None:
+            query = query.filter(seller_column == seller_id)
+        return [(name, kind) for name, kind, _ in columns], query.order_by(*order)
+
+    @staticmethod
+    def iter_batches(query, batch_size=EXPORT_BATCH_SIZE):
+        """Lê a query com um cursor do lado do servidor, gerando listas de até batch_size tuplos.
+
+        A query corre diretamente na ligação da sessão (sem a camada ORM), já que
+        só tem colunas.
+        """
+        result = db.session.connection().execution_options(stream_results=True, max_row_buffer=batch_size).execute(query)
+        try:
+            for partition in result.partitions(batch_size):
+                yield [tuple(row) for row in partition]
+        finally:
+            result.close()
@@ -0,0 +1,217 @@
+from src.models import db, Boss, Seller, Product, GuideSuggestion
+from src.services.analytics_service import AnalyticsService, np
+from src.services.report_service import ReportService
+from sqlalchemy import delete, insert
+from sqlalchemy.orm import contains_eager
+from datetime import date, datetime, timedelta
+import time
+
+# Peso da observação mais recente na suavização exponencial
+SMOOTHING_ALPHA = 0.3
+
+# Margem de segurança da sugestão, em múltiplos do erro absoluto médio
+SAFETY_FACTOR = 0.5
+
+# Quando nada sobrou, a procura foi pelo menos o que foi levado: acrescenta-se esta fração
+STOCKOUT_UPLIFT = 0.1
+
+# Dias de histórico usados no cálculo noturno das sugestões
+FORECAST_HISTORY_DAYS = 182
+
+
+class ForecastService:
+    @staticmethod
+    def fit(history, alpha=SMOOTHING_ALPHA):
+        """Ajusta uma suavização exponencial por (vendedor, produto, dia da semana).
+
+        history tem as colunas de AnalyticsService.load_guide_history. As
+        observações de cada série são dispostas numa matriz (séries x datas,
+        preenchida com NaN) e a suavização avança coluna a coluna, atualizando
+        todas as séries de uma vez. Devolve um dicionário de arrays: seller_id,
+        product_id, weekday, level (procura esperada), error (erro absoluto médio
+        suavizado) e observations.
+        """
+        if history["taken"].size == 0:
+            empty = np.array([], dtype=np.int64)
+            return {"seller_id": empty, "product_id": empty, "weekday": empty,
+                    "level": np.array([]), "error": np.array([]), "observations": empty}
+
+        taken, remaining = history["taken"], history["remaining"]
+        demand = np.where(remaining == 0, taken * (1 + STOCKOUT_UPLIFT), taken - remaining)
+
+        # Uma observação por (vendedor, produto, dia), por ordem cronológica dentro de cada par
+        sellers, products, weekdays, day_demand = ForecastService._daily_totals(history, demand)
+
+        series_keys, series_inverse = ForecastService._unique_rows(np.column_stack([sellers, products, weekdays]))
+        order = np.argsort(series_inverse, kind="stable")
+        counts = np.bincount(series_inverse)
+        starts = np.cumsum(counts) - counts
+        positions = np.arange(order.size) - starts[series_inverse[order]]
+
+        matrix = np.full((series_keys.shape[0], counts.max()), np.nan)
+        matrix[series_inverse[order], positions] = day_demand[order]
+
+        level = matrix[:, 0].copy()
+        error = np.zeros_like(level)
+        for column in range(1, matrix.shape[1]):
+            observed = matrix[:, column]
+            valid = ~np.isnan(observed)
+            error = np.where(valid, alpha * np.abs(observed - level) + (1 - alpha) * error, error)
+            level = np.where(valid, alpha * observed + (1 - alpha) * level, level)
+
+        return {
+            "seller_id": series_keys[:, 0],
+            "product_id": series_keys[:, 1],
+            "weekday": series_keys[:, 2],
+            "level": level,
+            "error": error,
+            "observations": counts
+        }
+
+    @staticmethod
+    def suggested_quantities(model, safety_factor=SAFETY_FACTOR):
+        return np.ceil(np.maximum(model["level"] + safety_factor * model["error"], 0)).astype(np.int64)
+
+    @staticmethod
+    def precompute_suggestions(boss_id=None, today=None):
+        """Recalcula a tabela guide_suggestion (pensado para correr todas as noites).
+
+        Por patrão: lê o histórico das guias fechadas dos últimos
+        FORECAST_HISTORY_DAYS dias, ajusta os modelos e substitui as sugestões dos
+        seus vendedores com um DELETE e um INSERT em bloco. Devolve o número de
+        sugestões gravadas.
+        """
+        today = today or date.today()
+        boss_ids = [boss_id] if boss_id is not None else db.session.scalars(db.select(Boss.id)).all()
+        saved = 0
+        for current_boss_id in boss_ids:
+            history = AnalyticsService.load_guide_history(current_boss_id, date_from=today - timedelta(days=FORECAST_HISTORY_DAYS))
+            model = ForecastService.fit(history)
+            suggested = ForecastService.suggested_quantities(model)
+            computed_at = datetime.utcnow()
+            rows = [{
+                "seller_id": int(model["seller_id"][index]),
+                "product_id": int(model["product_id"][index]),
+                "weekday": int(model["weekday"][index]),
+                "expected_demand": round(float(model["level"][index]), 2),
+                "demand_error": round(float(model["error"][index]), 2),
+                "suggested_quantity": int(suggested[index]),
+                "observations": int(model["observations"][index]),
+                "computed_at": computed_at
+            } for index in range(model["level"].size)]
+
+            seller_ids = db.select(Seller.id).filter(Seller.boss_id == current_boss_id).scalar_subquery()
+            db.session.execute(delete(GuideSuggestion).where(GuideSuggestion.seller_id.in_(seller_ids)))
+            if rows:
+                db.session.execute(insert(GuideSuggestion), rows)
+            ReportService.bump_production_version(current_boss_id)
+            db.session.commit()
+            saved += len(rows)
+        return saved
+
+    @staticmethod
+    def get_suggestions(seller_id, boss_id, target_date):
+        """Sugestões pré-calculadas do vendedor para o dia da semana da data pedida (uma leitura pelo índice)"""
+        return (GuideSuggestion.query
+                .join(Product, Product.id == GuideSuggestion.product_id)
+                .filter(GuideSuggestion.seller_id == seller_id,
+                        GuideSuggestion.weekday == target_date.weekday(),
+                        Product.boss_id == boss_id,
+                        Product.is_active.is_(True))
+                .options(contains_eager(GuideSuggestion.product))
+                .order_by(Product.name)
+                .all())
+
+    @staticmethod
+    def backtest(history, holdout_days=28, alpha=SMOOTHING_ALPHA, safety_factor=SAFETY_FACTOR):
+        """Avalia o modelo nos últimos holdout_days do histórico, ajustando-o apenas nos dias anteriores.
+
+        Compara a procura esperada com a vendida em cada (vendedor, produto, dia)
+        do período de teste, e com uma referência ingénua (média simples de cada
+        série no treino). Devolve as métricas de precisão e o tempo de ajuste.
+        """
+        day_number = history["day"].astype(np.int64)
+        cutoff = day_number.max() - holdout_days + 1
+        train = {column: values[day_number < cutoff] for column, values in history.items()}
+        test = {column: values[day_number >= cutoff] for column, values in history.items()}
+
+        started = time.perf_counter()
+        model = ForecastService.fit(train, alpha)
+        fit_seconds = time.perf_counter() - started
+
+        model_keys = np.column_stack([model["seller_id"], model["product_id"], model["weekday"]])
+        test_keys, actual = ForecastService._daily_sold(test)
+        train_keys, train_sold = ForecastService._daily_sold(train)
+
+        forecast = ForecastService._lookup(model_keys, model["level"], test_keys)
+        suggested = ForecastService._lookup(model_keys, ForecastService.suggested_quantities(model, safety_factor), test_keys)
+        series_keys, series_inverse = ForecastService._unique_rows(train_keys)
+        series_mean = np.bincount(series_inverse, weights=train_sold) / np.bincount(series_inverse)
+        baseline = ForecastService._lookup(series_keys, series_mean, test_keys)
+
+        covered = ~np.isnan(forecast)
+        actual = actual[covered]
+        return {
+            "train_observations": int(train_sold.size),
+            "test_observations": int(covered.size),
+            "coverage": round(float(covered.mean()) * 100, 2) if covered.size else 0,
+            "series": int(model["level"].size),
+            "fit_seconds": round(fit_seconds, 4),
+            "model": ForecastService._accuracy(actual, forecast[covered]),
+            "baseline_mean": ForecastService._accuracy(actual, baseline[covered]),
+            "suggested_leftover": float(np.maximum(suggested[covered] - actual, 0).sum()),
+            "suggested_shortfall": float(np.maximum(actual - suggested[covered], 0).sum())
+        }
+
+    @staticmethod
+    def _daily_totals(history, values):
+        """Soma values por (vendedor, produto, dia), por ordem de (vendedor, produto, dia).
+
+        Devolve (vendedores, produtos, dias da semana, somas), um array por coluna.
+        """
+        first_day = history["day"].min().astype(np.int64)
+        days = history["day"].astype(np.int64) - first_day
+        keys, inverse = ForecastService._unique_rows(np.column_stack([history["seller_id"], history["product_id"], days]))
+        totals = np.bincount(inverse, weights=values)
+        weekdays = (keys[:, 2] + first_day + 3) % 7  # 1970-01-01 foi uma quinta-feira
+        return keys[:, 0], keys[:, 1], weekdays, totals
+
+    @staticmethod
+    def _unique_rows(rows):
+        """np.unique(rows, axis=0, return_inverse=True) sobre inteiros não negativos.
+
+        As colunas são codificadas numa única chave inteira, porque np.unique a
+        uma dimensão é bastante mais rápido do que por linhas.
+        """
+        dims = tuple(int(value) + 1 for value in rows.max(axis=0))
+        keys, inverse = np.unique(np.ravel_multi_index(tuple(rows.T), dims), return_inverse=True)
+        return np.column_stack(np.unravel_index(keys, dims)), inverse.reshape(-1)
+
+    @staticmethod
+    def _daily_sold(history):
+        """Quantidade vendida por (vendedor, produto, dia); as chaves vêm como (vendedor, produto, dia da semana)"""
+        if history["taken"].size == 0:
+            return np.empty((0, 3), dtype=np.int64), np.array([])
+        sellers, products, weekdays, sold = ForecastService._daily_totals(history, history["taken"] - history["remaining"])
+        return np.column_stack([sellers, products, weekdays]), sold
+
+    @staticmethod
+    def _lookup(keys, values, query_keys):
+        """Valor de cada linha de query_keys na tabela (keys -> values); NaN quando a chave não existe"""
+        all_keys, inverse = ForecastService._unique_rows(np.vstack([keys, query_keys]).astype(np.int64))
+        table = np.full(all_keys.shape[0], np.nan)
+        table[inverse[:len(keys)]] = values
+        return table[inverse[len(keys):]]
+
+    @staticmethod
+    def _accuracy(actual, forecast):
+        """MAE, WAPE (% do erro absoluto sobre o total vendido) e viés (% de previsão a mais ou a menos)"""
+        if actual.size == 0:
+            return {"mae": None, "wape": None, "bias": None}
+        errors = forecast - actual
+        total = actual.sum()
+        return {
+            "mae": round(float(np.abs(errors).mean()), 3),
+            "wape": round(float(np.abs(errors).sum() / total * 100), 2) if total > 0 else None,
+            "bias": round(float(errors.sum() / total * 100), 2) if total > 0 else None
+        }
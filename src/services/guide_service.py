@@ -1,5 +1,12 @@
-from src.models import db, SalesGuide, GuideItem, Product, Seller
+from src.models import db, SalesGuide, GuideItem, Product, Seller, Sale, SaleItem
+from src.services.product_service import ProductService
+from src.services.query_profiles import guide_profile
+from src.services.report_service import ReportService
+from src.utils.pagination import apply_date_range, apply_keyset
+from sqlalchemy import update, case, func, bindparam
+from sqlalchemy.exc import IntegrityError
 from datetime import date, datetime
+from decimal import Decimal
 
 class GuideService:
     @staticmethod
@@ -9,53 +16,150 @@ class GuideService:
         except ValueError:
             return None, "Invalid date format for guide_date"
         
-        new_guide = SalesGuide(
-            seller_id=seller_id,
-            guide_date=guide_date,
-            notes=notes,
-            local_id=local_id,
-            sync_status="PENDING" if local_id else "SYNCED"
-        )
-        db.session.add(new_guide)
-        db.session.flush() # Para ter acesso ao ID da guia antes do commit
+        # Reenvio de uma guia já registada: devolver a existente em vez de duplicar
+        existing_guide = GuideService._find_by_local_id(seller_id, local_id)
+        if existing_guide:
+            return existing_guide, None
         
+        # Todos os produtos da guia são resolvidos numa única query e validados antes de escrever
+        products = ProductService.get_active_products_map(boss_id, [item_data.get("product_id") for item_data in items_data])
+        guide_items = []
         for item_data in items_data:
             product_id = item_data.get("product_id")
             quantity_taken = item_data.get("quantity_taken")
             
-            product = Product.query.filter_by(id=product_id, boss_id=boss_id, is_active=True).first()
+            product = products.get(ProductService.normalize_id(product_id))
             if not product:
-                db.session.rollback()
                 return None, f"Product with ID {product_id} not found or inactive"
             
             try:
                 quantity_taken = int(quantity_taken)
                 if quantity_taken <= 0:
                     raise ValueError("Quantity taken must be positive")
-            except ValueError:
-                db.session.rollback()
+            except (TypeError, ValueError):
                 return None, "Invalid quantity_taken format"
             
             new_guide_item = GuideItem(
-                guide_id=new_guide.id,
-                product_id=product_id,
+                product_id=product.id,
                 quantity_taken=quantity_taken,
                 unit_price=product.price
             )
             new_guide_item.calculate_values()
-            db.session.add(new_guide_item)
+            guide_items.append(new_guide_item)
         
+        new_guide = SalesGuide(
+            seller_id=seller_id,
+            guide_date=guide_date,
+            notes=notes,
+            local_id=local_id,
+            sync_status="PENDING" if local_id else "SYNCED",
+            guide_items=guide_items
+        )
         new_guide.calculate_totals()
-        db.session.commit()
-        return new_guide, None
+        try:
+            db.session.add(new_guide)
+            ReportService.bump_production_version(boss_id)
+            db.session.commit()
+        except IntegrityError:
+            # Um reenvio concorrente registou a mesma guia entre a verificação e o commit: devolver a gravada
+            db.session.rollback()
+            existing_guide = GuideService._find_by_local_id(seller_id, local_id)
+            if not existing_guide:
+                raise
+            return existing_guide, None
+        return GuideService._reload(new_guide.id), None
+
+    @staticmethod
+    def _find_by_local_id(seller_id, local_id):
+        """Guia já registada pelo vendedor com este local_id (índice único (seller_id, local_id))"""
+        if not local_id:
+            return None
+        return SalesGuide.query.filter_by(seller_id=seller_id, local_id=local_id).first()
 
     @staticmethod
-    def get_guides(user_role, user_id, boss_id):
+    def _reload(guide_id):
+        """Recarrega a guia com o perfil completo (evita uma query por item no to_dict)"""
+        return SalesGuide.query.options(*guide_profile()).execution_options(populate_existing=True).filter_by(id=guide_id).one()
+
+    @staticmethod
+    def get_guides(user_role, user_id, boss_id, date_from=None, date_to=None, after=None, limit=None):
         if user_role == "boss":
-            return SalesGuide.query.join(Seller).filter(Seller.boss_id == user_id).all()
+            query = SalesGuide.query.join(Seller).filter(Seller.boss_id == user_id)
         elif user_role == "seller":
-            return SalesGuide.query.filter_by(seller_id=user_id).all()
-        return []
+            query = SalesGuide.query.filter_by(seller_id=user_id)
+        else:
+            return []
+        query = apply_date_range(query, SalesGuide.guide_date, date_from, date_to)
+        return apply_keyset(query, SalesGuide.guide_date, SalesGuide.id, after, limit).options(*guide_profile()).all()
+
+    @staticmethod
+    def get_reconciliation(user_role, user_id, date_from=None, date_to=None, seller_id=None):
+        """Compara o valor vendido esperado de cada guia com as vendas registadas.
+
+        Uma única query agrupada por guia soma as vendas associadas no intervalo
+        de datas (por omissão, o dia de hoje). Devolve (linhas, totais).
+        """
+        if date_from is None and date_to is None:
+            date_from = date_to = date.today()
+        
+        registered = func.coalesce(func.sum(Sale.total_amount), 0)
+        query = (db.select(
+                    SalesGuide.id,
+                    SalesGuide.guide_date,
+                    SalesGuide.seller_id,
+                    Seller.name,
+                    SalesGuide.status,
+                    SalesGuide.total_sold_value,
+                    registered.label("total_sales_registered"),
+                    func.count(Sale.id).label("sales_count"))
+                 .join(Seller, Seller.id == SalesGuide.seller_id)
+                 .outerjoin(Sale, Sale.guide_id == SalesGuide.id)
+                 .group_by(SalesGuide.id, SalesGuide.guide_date, SalesGuide.seller_id, Seller.name, SalesGuide.status, SalesGuide.total_sold_value)
+                 .order_by(SalesGuide.guide_date, Seller.name, SalesGuide.id))
+        if user_role == "boss":
+            query = query.filter(Seller.boss_id == user_id)
+            if seller_id is not None:
+                query = query.filter(SalesGuide.seller_id == seller_id)
+        elif user_role == "seller":
+            query = query.filter(SalesGuide.seller_id == user_id)
+        else:
+            return [], {}
+        query = apply_date_range(query, SalesGuide.guide_date, date_from, date_to)
+        
+        rows = []
+        total_expected = total_registered = Decimal(0)
+        for guide_id, guide_date, row_seller_id, seller_name, status, expected, registered_value, sales_count in db.session.execute(query):
+            expected = Decimal(str(expected or 0))
+            registered_value = Decimal(str(registered_value))
+            total_expected += expected
+            total_registered += registered_value
+            rows.append(GuideService._reconciliation_row({
+                "guide_id": guide_id,
+                "guide_date": guide_date.isoformat(),
+                "seller_id": row_seller_id,
+                "seller_name": seller_name,
+                "status": status,
+                "sales_count": sales_count
+            }, expected, registered_value))
+        
+        totals = GuideService._reconciliation_row({
+            "date_from": date_from.isoformat() if date_from else None,
+            "date_to": date_to.isoformat() if date_to else None,
+            "guides_count": len(rows)
+        }, total_expected, total_registered)
+        return rows, totals
+
+    @staticmethod
+    def _reconciliation_row(row, expected, registered):
+        """Acrescenta os valores e a diferença, com o mesmo cálculo de SalesGuide.get_sales_summary"""
+        difference = registered - expected
+        row.update({
+            "expected_sales_value": float(expected),
+            "total_sales_registered": float(registered),
+            "difference": float(difference),
+            "difference_percentage": round(float(difference / expected * 100), 2) if expected > 0 else 0
+        })
+        return row
 
     @staticmethod
     def get_guide_by_id(guide_id, user_role, user_id, boss_id):
@@ -70,29 +174,86 @@ class GuideService:
         if guide.status == "CLOSED":
             return None, "Sales Guide is already closed"
         
+        remaining = {}
         for item_data in items_data:
-            item_id = item_data.get("id")
-            quantity_remaining = item_data.get("quantity_remaining")
-            
-            guide_item = GuideItem.query.filter_by(id=item_id, guide_id=guide.id).first()
-            if not guide_item:
-                db.session.rollback()
-                return None, f"Guide Item with ID {item_id} not found in this guide"
-            
             try:
-                quantity_remaining = int(quantity_remaining)
-                guide_item.set_remaining_quantity(quantity_remaining)
-            except ValueError as e:
-                db.session.rollback()
-                return None, str(e)
+                remaining[int(item_data.get("id"))] = int(item_data.get("quantity_remaining"))
+            except (TypeError, ValueError):
+                return None, "Invalid quantity_remaining format"
         
-        if not guide.can_close():
+        try:
+            GuideService.close_guides([guide], {guide.id: remaining})
+        except ValueError as e:
             db.session.rollback()
-            return None, "Cannot close guide: some items do not have remaining quantities registered"
+            return None, str(e)
         
-        guide.close_guide()
         db.session.commit()
-        return guide, None
+        return GuideService._reload(guide.id), None
+
+    @staticmethod
+    def close_guides(guides, remaining_by_guide, strict=True):
+        """Fecha várias guias com uma leitura e uma escrita em bloco dos seus itens.
+
+        remaining_by_guide mapeia o ID de cada guia para {ID do item: quantidade
+        restante}. Os itens são lidos numa única query, os valores de cada item e
+        os totais da guia são calculados na mesma passagem, e todos os itens são
+        atualizados num único UPDATE (executemany). Em modo strict, itens
+        desconhecidos ou sem quantidade restante levantam ValueError; caso
+        contrário são ignorados, como no fecho vindo da sincronização.
+        """
+        guide_ids = [guide.id for guide in guides]
+        rows = db.session.execute(
+            db.select(GuideItem.id, GuideItem.guide_id, GuideItem.quantity_taken, GuideItem.quantity_remaining, GuideItem.unit_price)
+            .filter(GuideItem.guide_id.in_(guide_ids))
+            .order_by(GuideItem.id)
+        ).all()
+        items_by_guide = {guide_id: [] for guide_id in guide_ids}
+        for row in rows:
+            items_by_guide[row.guide_id].append(row)
+        
+        updates = []
+        for guide in guides:
+            remaining = remaining_by_guide.get(guide.id, {})
+            if strict:
+                known_ids = {row.id for row in items_by_guide[guide.id]}
+                for item_id in remaining:
+                    if item_id not in known_ids:
+                        raise ValueError(f"Guide Item with ID {item_id} not found in this guide")
+            
+            total_taken_value = total_sold_value = total_remaining_value = Decimal(0)
+            for row in items_by_guide[guide.id]:
+                quantity_remaining = remaining.get(row.id, row.quantity_remaining)
+                if quantity_remaining is None:
+                    if strict:
+                        raise ValueError("Cannot close guide: some items do not have remaining quantities registered")
+                    item_sold_value = item_remaining_value = Decimal(0)
+                else:
+                    if quantity_remaining > row.quantity_taken:
+                        raise ValueError("Quantidade restante não pode ser maior que a quantidade levada")
+                    item_sold_value = (row.quantity_taken - quantity_remaining) * row.unit_price
+                    item_remaining_value = quantity_remaining * row.unit_price
+                
+                total_taken_value += row.quantity_taken * row.unit_price
+                total_sold_value += item_sold_value
+                total_remaining_value += item_remaining_value
+                updates.append({
+                    "id": row.id,
+                    "quantity_remaining": quantity_remaining,
+                    "total_sold_value": item_sold_value,
+                    "total_remaining_value": item_remaining_value
+                })
+            
+            guide.status = "CLOSED"
+            guide.closed_at = datetime.utcnow()
+            guide.total_taken_value = total_taken_value
+            guide.total_sold_value = total_sold_value
+            guide.total_remaining_value = total_remaining_value
+        
+        if updates:
+            db.session.execute(update(GuideItem), updates)
+        for guide in guides:
+            db.session.expire(guide, ["guide_items"])
+        db.session.flush()
 
     @staticmethod
     def update_guide_item(guide, item_id, quantity_remaining):
@@ -103,19 +264,165 @@ class GuideService:
         if not guide_item:
             return None, "Guide Item not found in this guide"
         
+        previous_sold_value = guide_item.total_sold_value or 0
+        previous_remaining_value = guide_item.total_remaining_value or 0
         try:
             quantity_remaining = int(quantity_remaining)
             guide_item.set_remaining_quantity(quantity_remaining)
-            db.session.commit()
-            guide.calculate_totals()
-            db.session.commit()
         except ValueError as e:
             return None, str(e)
         
+        # Os totais da guia são ajustados pela diferença do item, sem percorrer os restantes itens
+        GuideService.apply_totals_delta(
+            guide,
+            sold_delta=guide_item.total_sold_value - previous_sold_value,
+            remaining_delta=guide_item.total_remaining_value - previous_remaining_value
+        )
+        db.session.commit()
         return guide_item, None
 
+    @staticmethod
+    def apply_totals_delta(guide, taken_delta=0, sold_delta=0, remaining_delta=0):
+        """Soma as diferenças aos totais da guia do lado da base de dados (SET total = total + delta).
+
+        A atualização é atómica e não exige que os itens estejam carregados.
+        """
+        if taken_delta:
+            guide.total_taken_value = SalesGuide.total_taken_value + taken_delta
+        if sold_delta:
+            guide.total_sold_value = SalesGuide.total_sold_value + sold_delta
+        if remaining_delta:
+            guide.total_remaining_value = SalesGuide.total_remaining_value + remaining_delta
+
+    @staticmethod
+    def register_sold_quantities(quantities, sign=1):
+        """Soma (ou subtrai, com sign=-1) quantidades vendidas ao contador dos itens da guia.
+
+        quantities mapeia (ID da guia, ID do produto) para a quantidade. O
+        incremento é feito na base de dados (SET contador = contador + n), num
+        único UPDATE executemany, pelo que vendas concorrentes não se sobrepõem.
+        Se o produto aparece em vários itens da guia, conta no primeiro. As guias
+        afetadas ficam com last_modified atualizado na mesma transação, para que o
+        download delta leve os contadores novos.
+        """
+        params = [{"g_id": guide_id, "p_id": product_id, "quantity": sign * quantity}
+                  for (guide_id, product_id), quantity in quantities.items() if quantity]
+        if not params:
+            return
+        table = GuideItem.__table__
+        first_item = table.alias("first_item")
+        first_item_id = (db.select(func.min(first_item.c.id))
+                         .where(first_item.c.guide_id == bindparam("g_id"), first_item.c.product_id == bindparam("p_id"))
+                         .scalar_subquery())
+        db.session.execute(
+            table.update()
+            .where(table.c.id == first_item_id)
+            .values(quantity_sold_registered=table.c.quantity_sold_registered + bindparam("quantity")),
+            params
+        )
+        GuideService._touch_guides({row["g_id"] for row in params})
+
+    @staticmethod
+    def _touch_guides(guide_ids):
+        """Marca as guias como alteradas (o UPDATE direto aos itens não dispara o onupdate)"""
+        db.session.execute(
+            update(SalesGuide)
+            .where(SalesGuide.id.in_(guide_ids))
+            .values(last_modified=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def rebuild_sold_counters(guide_ids=None):
+        """Reconstrói quantity_sold_registered a partir das vendas, com uma única agregação.
+
+        Devolve o número de itens cujo contador foi corrigido.
+        """
+        registered = (db.select(Sale.guide_id, SaleItem.product_id, func.sum(SaleItem.quantity))
+                      .join(SaleItem, SaleItem.sale_id == Sale.id)
+                      .filter(Sale.guide_id.isnot(None))
+                      .group_by(Sale.guide_id, SaleItem.product_id))
+        items = db.select(GuideItem.id, GuideItem.guide_id, GuideItem.product_id, GuideItem.quantity_sold_registered)
+        if guide_ids is not None:
+            registered = registered.filter(Sale.guide_id.in_(guide_ids))
+            items = items.filter(GuideItem.guide_id.in_(guide_ids))
+        
+        expected = {(guide_id, product_id): int(quantity) for guide_id, product_id, quantity in db.session.execute(registered)}
+        updates = []
+        touched = set()
+        seen = set()
+        for item_id, guide_id, product_id, current in db.session.execute(items.order_by(GuideItem.id)):
+            # Produtos repetidos na mesma guia: a contagem fica no primeiro item
+            key = (guide_id, product_id)
+            quantity = 0 if key in seen else expected.get(key, 0)
+            seen.add(key)
+            if (current or 0) != quantity:
+                updates.append({"id": item_id, "quantity_sold_registered": quantity})
+                touched.add(guide_id)
+        
+        if updates:
+            db.session.execute(update(GuideItem), updates)
+            GuideService._touch_guides(touched)
+        db.session.commit()
+        return len(updates)
+
+    @staticmethod
+    def check_guide_totals(guide_ids=None, repair=False):
+        """Compara os totais guardados de cada guia com os recalculados a partir das quantidades.
+
+        Uma única query agregada calcula os totais esperados. Devolve a lista de
+        guias inconsistentes; com repair=True reconstrói os valores dos itens e os
+        totais dessas guias.
+        """
+        taken_value = GuideItem.quantity_taken * GuideItem.unit_price
+        sold_value = case((GuideItem.quantity_remaining.is_(None), 0), else_=(GuideItem.quantity_taken - GuideItem.quantity_remaining) * GuideItem.unit_price)
+        remaining_value = case((GuideItem.quantity_remaining.is_(None), 0), else_=GuideItem.quantity_remaining * GuideItem.unit_price)
+        
+        query = (db.select(
+                    SalesGuide.id,
+                    SalesGuide.total_taken_value,
+                    SalesGuide.total_sold_value,
+                    SalesGuide.total_remaining_value,
+                    func.coalesce(func.sum(taken_value), 0),
+                    func.coalesce(func.sum(sold_value), 0),
+                    func.coalesce(func.sum(remaining_value), 0))
+                 .outerjoin(GuideItem, GuideItem.guide_id == SalesGuide.id)
+                 .group_by(SalesGuide.id, SalesGuide.total_taken_value, SalesGuide.total_sold_value, SalesGuide.total_remaining_value))
+        if guide_ids is not None:
+            query = query.filter(SalesGuide.id.in_(guide_ids))
+        
+        mismatches = []
+        for guide_id, stored_taken, stored_sold, stored_remaining, taken, sold, remaining in db.session.execute(query):
+            stored = [round(Decimal(str(value or 0)), 2) for value in (stored_taken, stored_sold, stored_remaining)]
+            expected = [round(Decimal(str(value)), 2) for value in (taken, sold, remaining)]
+            if stored != expected:
+                mismatches.append({
+                    "guide_id": guide_id,
+                    "stored": {"total_taken_value": float(stored[0]), "total_sold_value": float(stored[1]), "total_remaining_value": float(stored[2])},
+                    "expected": {"total_taken_value": float(expected[0]), "total_sold_value": float(expected[1]), "total_remaining_value": float(expected[2])}
+                })
+        
+        if repair and mismatches:
+            mismatched_ids = [mismatch["guide_id"] for mismatch in mismatches]
+            db.session.execute(
+                update(GuideItem)
+                .where(GuideItem.guide_id.in_(mismatched_ids))
+                .values(total_taken_value=taken_value, total_sold_value=sold_value, total_remaining_value=remaining_value)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.execute(update(SalesGuide), [{
+                "id": mismatch["guide_id"],
+                "total_taken_value": mismatch["expected"]["total_taken_value"],
+                "total_sold_value": mismatch["expected"]["total_sold_value"],
+                "total_remaining_value": mismatch["expected"]["total_remaining_value"]
+            } for mismatch in mismatches])
+            db.session.commit()
+        
+        return mismatches
+
     @staticmethod
     def delete_guide(guide):
+        ReportService.bump_production_version(guide.seller.boss_id)
         db.session.delete(guide)
         db.session.commit()
         return True
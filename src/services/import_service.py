@@ -0,0 +1,149 @@
+from src.models import db, Product, Customer
+from src.services.catalog_cache import CatalogCache
+from sqlalchemy import insert
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+import csv
+import io
+
+# Linhas válidas inseridas de cada vez (um executemany ou um COPY por lote)
+IMPORT_BATCH_SIZE = 5000
+
+# Número máximo de linhas com erros descritas no relatório
+MAX_REPORTED_ERRORS = 1000
+
+CENT = Decimal("0.01")
+TRUE_VALUES = ("1", "true", "yes", "sim", "s", "y")
+FALSE_VALUES = ("0", "false", "no", "nao", "não", "n")
+
+# Conjunto -> (modelo, colunas obrigatórias, colunas opcionais)
+IMPORT_DATASETS = {
+    "products": (Product, ("name", "price"), ("is_active",)),
+    "customers": (Customer, ("name",), ("address", "phone"))
+}
+
+
+class ImportService:
+    @staticmethod
+    def import_csv(dataset, boss_id, stream):
+        """Importa um CSV de produtos ou clientes do patrão numa única transação.
+
+        O ficheiro é lido linha a linha (stream é um ficheiro binário) e cada
+        linha é validada uma única vez; as válidas são inseridas em lotes de
+        IMPORT_BATCH_SIZE, com COPY em PostgreSQL e executemany nas outras bases
+        de dados. A importação é tudo ou nada: se alguma linha tiver erros, nada
+        é gravado e o relatório indica o número da linha e os erros de cada
+        campo. Devolve (relatório, erro); erro só é preenchido se o ficheiro não
+        puder ser lido (codificação ou cabeçalho inválidos).
+        """
+        model, required, optional = IMPORT_DATASETS[dataset]
+        validate = ImportService._validate_product if dataset == "products" else ImportService._validate_customer
+        now = datetime.utcnow()
+        report = {"dataset": dataset, "rows": 0, "imported": 0, "errors": [], "errors_count": 0}
+        batch = []
+        try:
+            reader = csv.reader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+            header = [column.strip().lower() for column in next(reader, [])]
+            missing = [column for column in required if column not in header]
+            if missing:
+                return None, f"Missing CSV column(s): {', '.join(missing)}"
+            positions = {column: header.index(column) for column in required + optional if column in header}
+
+            for values in reader:
+                if not any(value.strip() for value in values):
+                    continue
+                report["rows"] += 1
+                row = {column: values[index].strip() if index < len(values) else "" for column, index in positions.items()}
+                record, errors = validate(row)
+                if errors:
+                    report["errors_count"] += 1
+                    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                        report["errors"].append({"line": reader.line_num, "errors": errors})
+                    continue
+                # Depois do primeiro erro o ficheiro só é validado, já que nada vai ser gravado
+                if report["errors_count"]:
+                    continue
+                batch.append(dict(record, boss_id=boss_id, created_at=now, updated_at=now))
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    report["imported"] += ImportService._insert_batch(model, batch)
+                    batch = []
+        except (UnicodeDecodeError, csv.Error) as e:
+            db.session.rollback()
+            return None, f"Invalid CSV file: {e}"
+
+        if report["errors_count"]:
+            db.session.rollback()
+            report["imported"] = 0
+            return report, None
+        if batch:
+            report["imported"] += ImportService._insert_batch(model, batch)
+        CatalogCache.commit_changes(boss_id)
+        return report, None
+
+    @staticmethod
+    def _validate_product(row):
+        errors = {}
+        name = row["name"]
+        if not name:
+            errors["name"] = "Missing product name"
+        elif len(name) > 100:
+            errors["name"] = "Product name is longer than 100 characters"
+
+        price = row["price"]
+        if "," in price and "." not in price:
+            price = price.replace(",", ".")
+        try:
+            price = Decimal(price)
+            if not price.is_finite() or price <= 0 or price != price.quantize(CENT) or price >= Decimal("1e8"):
+                raise ValueError
+        except (InvalidOperation, ValueError):
+            errors["price"] = "Invalid price format"
+
+        is_active = row.get("is_active", "").lower()
+        if is_active and is_active not in TRUE_VALUES + FALSE_VALUES:
+            errors["is_active"] = "Invalid is_active value"
+
+        if errors:
+            return None, errors
+        return {"name": name, "price": price, "is_active": is_active not in FALSE_VALUES}, None
+
+    @staticmethod
+    def _validate_customer(row):
+        errors = {}
+        name = row["name"]
+        if not name:
+            errors["name"] = "Missing customer name"
+        elif len(name) > 100:
+            errors["name"] = "Customer name is longer than 100 characters"
+        phone = row.get("phone") or None
+        if phone and len(phone) > 20:
+            errors["phone"] = "Phone is longer than 20 characters"
+
+        if errors:
+            return None, errors
+        return {"name": name, "address": row.get("address") or None, "phone": phone}, None
+
+    @staticmethod
+    def _insert_batch(model, rows):
+        """Insere um lote de linhas já validadas na transação da sessão"""
+        connection = db.session.connection()
+        if connection.dialect.name != "postgresql":
+            db.session.execute(insert(model.__table__), rows)
+            return len(rows)
+
+        # COPY ... FROM STDIN pela mesma ligação (e transação) da sessão
+        columns = list(rows[0])
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(["" if row[column] is None else row[column] for column in columns])
+        buffer.seek(0)
+        cursor = connection.connection.dbapi_connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {model.__tablename__} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+        finally:
+            cursor.close()
+        return len(rows)
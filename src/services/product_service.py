@@ -1,11 +1,12 @@
 from src.models import db, Product
+from src.services.catalog_cache import CatalogCache
 
 class ProductService:
     @staticmethod
     def create_product(boss_id, name, price):
         new_product = Product(boss_id=boss_id, name=name, price=price)
         db.session.add(new_product)
-        db.session.commit()
+        CatalogCache.commit_changes(boss_id)
         return new_product
     
     @staticmethod
@@ -15,6 +16,24 @@ class ProductService:
             query = query.filter_by(is_active=is_active)
         return query.all()
     
+    @staticmethod
+    def get_active_products_map(boss_id, product_ids):
+        """Resolve vários produtos ativos do patrão numa só query; devolve {id: produto}"""
+        ids = {ProductService.normalize_id(product_id) for product_id in product_ids}
+        ids.discard(None)
+        if not ids:
+            return {}
+        products = Product.query.filter(Product.id.in_(ids), Product.boss_id == boss_id, Product.is_active == True).all()
+        return {product.id: product for product in products}
+    
+    @staticmethod
+    def normalize_id(product_id):
+        """Converte o ID recebido no pedido para inteiro (None se for inválido)"""
+        try:
+            return int(product_id)
+        except (TypeError, ValueError):
+            return None
+    
     @staticmethod
     def get_product_by_id(product_id, boss_id=None, is_active=None):
         query = Product.query.filter_by(id=product_id)
@@ -32,13 +51,13 @@ class ProductService:
             product.price = price
         if is_active is not None:
             product.is_active = is_active
-        db.session.commit()
+        CatalogCache.commit_changes(product.boss_id)
         return product
     
     @staticmethod
     def delete_product(product):
         db.session.delete(product)
-        db.session.commit()
+        CatalogCache.commit_changes(product.boss_id)
         return True
 
 
@@ -0,0 +1,31 @@
+from sqlalchemy.orm import joinedload, selectinload
+from src.models import Sale, SaleItem, Credit, SalesGuide, GuideItem
+
+# Perfis de carregamento: carregam de antemão tudo o que o to_dict() de cada
+# modelo percorre, para que uma lista custe um número fixo de queries em vez de
+# uma por relação e por linha. As relações many-to-one usam joinedload e as
+# coleções selectinload (compatível com yield_per no download em streaming).
+
+
+def sale_profile():
+    """Venda com itens, produto de cada item e cliente"""
+    return (
+        selectinload(Sale.sale_items).joinedload(SaleItem.product),
+        joinedload(Sale.customer)
+    )
+
+
+def guide_profile():
+    """Guia com itens, produto de cada item e vendedor"""
+    return (
+        selectinload(SalesGuide.guide_items).joinedload(GuideItem.product),
+        joinedload(SalesGuide.seller)
+    )
+
+
+def credit_profile():
+    """Crédito com cliente e pagamentos"""
+    return (
+        joinedload(Credit.customer),
+        selectinload(Credit.payments)
+    )
@@ -0,0 +1,257 @@
+from flask import current_app
+from src.models import db, Boss, DailySalesRollup, Sale, SaleItem, Seller, Product, SalesGuide, GuideItem, GuideSuggestion
+from src.utils.pagination import apply_date_range
+from sqlalchemy import case, delete, func, insert, literal, update
+from sqlalchemy.dialects import postgresql, sqlite
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import threading
+import time
+
+# Chave e colunas somadas do agregado diário de vendas
+ROLLUP_KEY = ("boss_id", "seller_id", "product_id", "day")
+ROLLUP_MEASURES = ("quantity", "revenue", "cash_revenue", "credit_revenue", "sales_count")
+
+# Dimensões aceites em ?group_by= no relatório de vendas
+REPORT_GROUPS = ("day", "seller", "product")
+
+# Número máximo de dias de uma folha de produção
+MAX_PRODUCTION_DAYS = 31
+
+# Número máximo de folhas de produção em cache (LRU), somando todos os patrões e intervalos
+PRODUCTION_CACHE_SIZE = 256
+
+# Folhas de produção em cache: (patrão, de, até) -> (versão, instante, folha).
+# A versão (Boss.production_version e Boss.catalog_version) é lida da base de dados
+# em cada pedido, pelo que as escritas de qualquer processo (incluindo o worker da
+# sincronização) invalidam logo a folha; PRODUCTION_SHEET_CACHE_SECONDS limita a
+# idade do que não tem versão (ex.: a mudança de dia).
+_production_cache = OrderedDict()
+_production_cache_lock = threading.Lock()
+
+
+class ReportService:
+    @staticmethod
+    def record_sales(sales, sign=1):
+        """Soma (ou subtrai, com sign=-1) vendas ao agregado diário, na transação atual.
+
+        Cada venda é um tuplo (boss_id, seller_id, sale_date, payment_type, itens),
+        com os itens como pares (product_id, quantity, subtotal). As vendas são
+        agregadas por chave em Python e aplicadas com um único INSERT ... ON
+        CONFLICT DO UPDATE que soma às linhas existentes.
+        """
+        rows = {}
+        for boss_id, seller_id, sale_date, payment_type, items in sales:
+            products_in_sale = set()
+            for product_id, quantity, subtotal in items:
+                key = (boss_id, seller_id, product_id, sale_date)
+                row = rows.setdefault(key, dict(zip(ROLLUP_KEY, key), quantity=0, revenue=Decimal(0), cash_revenue=Decimal(0), credit_revenue=Decimal(0), sales_count=0))
+                subtotal = Decimal(str(subtotal))
+                row["quantity"] += sign * quantity
+                row["revenue"] += sign * subtotal
+                row["cash_revenue" if payment_type == "cash" else "credit_revenue"] += sign * subtotal
+                if product_id not in products_in_sale:
+                    products_in_sale.add(product_id)
+                    row["sales_count"] += sign
+        if rows:
+            ReportService._upsert(list(rows.values()))
+
+    @staticmethod
+    def _upsert(rows):
+        table = DailySalesRollup.__table__
+        now = datetime.utcnow()
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            statement = (postgresql if dialect == "postgresql" else sqlite).insert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=list(ROLLUP_KEY),
+                set_=dict({measure: table.c[measure] + statement.excluded[measure] for measure in ROLLUP_MEASURES}, updated_at=now)
+            )
+            db.session.execute(statement, [dict(row, updated_at=now) for row in rows])
+            return
+
+        # Outras bases de dados: UPDATE da linha existente e INSERT das que faltam
+        for row in rows:
+            result = db.session.execute(
+                update(table)
+                .where(*(table.c[column] == row[column] for column in ROLLUP_KEY))
+                .values({measure: table.c[measure] + row[measure] for measure in ROLLUP_MEASURES}, updated_at=now)
+            )
+            if result.rowcount == 0:
+                db.session.execute(insert(table).values(row, updated_at=now))
+
+    @staticmethod
+    def rebuild_sales_rollup(boss_id=None):
+        """Reconstrói o agregado diário a partir das vendas com um único INSERT ... SELECT.
+
+        Devolve o número de linhas criadas.
+        """
+        subtotal_by_type = lambda payment_type: func.sum(case((Sale.payment_type == payment_type, SaleItem.subtotal), else_=0))
+        source = (db.select(
+                      Seller.boss_id,
+                      Sale.seller_id,
+                      SaleItem.product_id,
+                      Sale.sale_date,
+                      func.sum(SaleItem.quantity),
+                      func.sum(SaleItem.subtotal),
+                      subtotal_by_type("cash"),
+                      subtotal_by_type("credit"),
+                      func.count(func.distinct(Sale.id)),
+                      literal(datetime.utcnow()))
+                  .select_from(SaleItem)
+                  .join(Sale, Sale.id == SaleItem.sale_id)
+                  .join(Seller, Seller.id == Sale.seller_id)
+                  .group_by(Seller.boss_id, Sale.seller_id, SaleItem.product_id, Sale.sale_date))
+        clear = delete(DailySalesRollup)
+        if boss_id is not None:
+            source = source.filter(Seller.boss_id == boss_id)
+            clear = clear.where(DailySalesRollup.boss_id == boss_id)
+
+        db.session.execute(clear)
+        result = db.session.execute(
+            insert(DailySalesRollup.__table__).from_select(list(ROLLUP_KEY) + list(ROLLUP_MEASURES) + ["updated_at"], source)
+        )
+        db.session.commit()
+        return result.rowcount
+
+    @staticmethod
+    def get_sales_report(boss_id, seller_id=None, date_from=None, date_to=None, group_by=("day",)):
+        """Relatório de vendas lido apenas do agregado diário, agrupado pelas dimensões pedidas"""
+        for dimension in group_by:
+            if dimension not in REPORT_GROUPS:
+                raise ValueError(f"group_by must be a combination of: {', '.join(REPORT_GROUPS)}")
+
+        columns, groups, orderings = [], [], []
+        if "day" in group_by:
+            columns.append(DailySalesRollup.day)
+            groups.append(DailySalesRollup.day)
+            orderings.append(DailySalesRollup.day)
+        if "seller" in group_by:
+            columns.extend([DailySalesRollup.seller_id, Seller.name.label("seller_name")])
+            groups.extend([DailySalesRollup.seller_id, Seller.name])
+            orderings.append(Seller.name)
+        if "product" in group_by:
+            columns.extend([DailySalesRollup.product_id, Product.name.label("product_name")])
+            groups.extend([DailySalesRollup.product_id, Product.name])
+            orderings.append(Product.name)
+
+        measures = [func.coalesce(func.sum(getattr(DailySalesRollup, measure)), 0).label(measure) for measure in ROLLUP_MEASURES]
+        query = db.select(*columns, *measures).filter(DailySalesRollup.boss_id == boss_id)
+        if "seller" in group_by:
+            query = query.join(Seller, Seller.id == DailySalesRollup.seller_id)
+        if "product" in group_by:
+            query = query.join(Product, Product.id == DailySalesRollup.product_id)
+        if seller_id is not None:
+            query = query.filter(DailySalesRollup.seller_id == seller_id)
+        query = apply_date_range(query, DailySalesRollup.day, date_from, date_to)
+        if groups:
+            query = query.group_by(*groups).order_by(*orderings)
+
+        rows = []
+        for row in db.session.execute(query).mappings():
+            row = dict(row)
+            if "day" in row:
+                row["day"] = row["day"].isoformat()
+            for measure in ("revenue", "cash_revenue", "credit_revenue"):
+                row[measure] = float(row[measure])
+            rows.append(row)
+        return rows
+
+    @staticmethod
+    def get_production_sheet(boss_id, date_from, date_to):
+        """Quantidades a produzir por dia e produto, somadas sobre todos os vendedores do patrão.
+
+        Uma query agrupada soma GuideItem.quantity_taken por (dia, vendedor,
+        produto). Para os dias de hoje em diante, os vendedores ativos que ainda
+        não têm guia nesse dia contam com as sugestões pré-calculadas
+        (GuideSuggestion) para o respetivo dia da semana. O resultado fica em
+        cache enquanto a versão do patrão não mudar (ver bump_production_version).
+        """
+        ttl = current_app.config.get("PRODUCTION_SHEET_CACHE_SECONDS", 0)
+        cache_key = (boss_id, date_from, date_to)
+        if ttl > 0:
+            version = tuple(db.session.execute(
+                db.select(Boss.production_version, Boss.catalog_version).filter(Boss.id == boss_id)
+            ).one_or_none() or ())
+            with _production_cache_lock:
+                cached = _production_cache.get(cache_key)
+                if cached is not None:
+                    _production_cache.move_to_end(cache_key)
+            if cached is not None and cached[0] == version and time.monotonic() - cached[1] < ttl:
+                return cached[2]
+
+        taken_query = (db.select(SalesGuide.guide_date, SalesGuide.seller_id, GuideItem.product_id, func.sum(GuideItem.quantity_taken))
+                       .select_from(GuideItem)
+                       .join(SalesGuide, SalesGuide.id == GuideItem.guide_id)
+                       .join(Seller, Seller.id == SalesGuide.seller_id)
+                       .filter(Seller.boss_id == boss_id)
+                       .group_by(SalesGuide.guide_date, SalesGuide.seller_id, GuideItem.product_id))
+        taken_query = apply_date_range(taken_query, SalesGuide.guide_date, date_from, date_to)
+
+        rows, sellers_with_guide = {}, {}
+        for guide_date, seller_id, product_id, quantity in db.session.execute(taken_query):
+            sellers_with_guide.setdefault(guide_date, set()).add(seller_id)
+            row = rows.setdefault((guide_date, product_id), ReportService._production_row(guide_date, product_id))
+            row["quantity_taken"] += int(quantity or 0)
+            row["sellers_count"] += 1
+
+        # Sugestões só para o planeamento (hoje em diante) e para vendedores sem guia nesse dia
+        planned_days = [date_from + timedelta(days=offset) for offset in range((date_to - date_from).days + 1)]
+        planned_days = [day for day in planned_days if day >= date.today()]
+        if planned_days:
+            suggestions = (db.select(GuideSuggestion.weekday, GuideSuggestion.seller_id, GuideSuggestion.product_id, GuideSuggestion.suggested_quantity)
+                           .join(Seller, Seller.id == GuideSuggestion.seller_id)
+                           .join(Product, Product.id == GuideSuggestion.product_id)
+                           .filter(Seller.boss_id == boss_id, Seller.is_active.is_(True), Product.is_active.is_(True),
+                                   GuideSuggestion.weekday.in_({day.weekday() for day in planned_days})))
+            by_weekday = {}
+            for weekday, seller_id, product_id, quantity in db.session.execute(suggestions):
+                by_weekday.setdefault(weekday, []).append((seller_id, product_id, quantity))
+            for day in planned_days:
+                with_guide = sellers_with_guide.get(day, set())
+                for seller_id, product_id, quantity in by_weekday.get(day.weekday(), []):
+                    if seller_id not in with_guide:
+                        row = rows.setdefault((day, product_id), ReportService._production_row(day, product_id))
+                        row["suggested_quantity"] += quantity
+                        row["suggested_sellers_count"] += 1
+
+        product_names = dict(db.session.execute(
+            db.select(Product.id, Product.name).filter(Product.id.in_({product_id for _, product_id in rows}))
+        ).all()) if rows else {}
+
+        products = {}
+        for row in rows.values():
+            row["product_name"] = product_names.get(row["product_id"])
+            row["production_quantity"] = row["quantity_taken"] + row["suggested_quantity"]
+            total = products.setdefault(row["product_id"], {"product_id": row["product_id"], "product_name": row["product_name"],
+                                                             "quantity_taken": 0, "suggested_quantity": 0, "production_quantity": 0})
+            for measure in ("quantity_taken", "suggested_quantity", "production_quantity"):
+                total[measure] += row[measure]
+
+        sheet = {
+            "date_from": date_from.isoformat(),
+            "date_to": date_to.isoformat(),
+            "rows": sorted(rows.values(), key=lambda row: (row["date"], row["product_name"] or "")),
+            "products": sorted(products.values(), key=lambda row: row["product_name"] or "")
+        }
+        if ttl > 0:
+            with _production_cache_lock:
+                _production_cache[cache_key] = (version, time.monotonic(), sheet)
+                _production_cache.move_to_end(cache_key)
+                while len(_production_cache) > PRODUCTION_CACHE_SIZE:
+                    _production_cache.popitem(last=False)
+        return sheet
+
+    @staticmethod
+    def _production_row(day, product_id):
+        return {"date": day.isoformat(), "product_id": product_id, "quantity_taken": 0, "sellers_count": 0,
+                "suggested_quantity": 0, "suggested_sellers_count": 0}
+
+    @staticmethod
+    def bump_production_version(boss_id):
+        """Marca a folha de produção do patrão como alterada, na transação atual (chamar antes do commit)"""
+        db.session.execute(
+            update(Boss).where(Boss.id == boss_id).values(production_version=Boss.production_version + 1)
+            .execution_options(synchronize_session=False)
+        )
@@ -1,5 +1,17 @@
-from src.models import db, Sale, SaleItem, Product, Customer, Credit, SalesGuide
+from src.models import db, Sale, SaleItem, Product, Customer, Credit, SalesGuide, Seller
+from src.services.product_service import ProductService
+from src.services.guide_service import GuideService
+from src.services.customer_service import CustomerService
+from src.services.report_service import ReportService
+from src.services.query_profiles import sale_profile
+from src.utils.pagination import apply_date_range, apply_keyset
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
 from datetime import date, datetime
+from decimal import Decimal
+
+# Número máximo de vendas num pedido POST /sales/batch
+MAX_BATCH_SALES = 500
 
 class SaleService:
     @staticmethod
@@ -9,6 +21,11 @@ class SaleService:
         except ValueError:
             return None, "Invalid date format for sale_date"
 
+        # Reenvio de uma venda já registada: devolver a existente em vez de duplicar
+        existing_sale = SaleService._find_by_local_id(seller_id, local_id)
+        if existing_sale:
+            return existing_sale, None
+
         if customer_id:
             customer = Customer.query.filter_by(id=customer_id, boss_id=boss_id).first()
             if not customer:
@@ -21,71 +38,288 @@ class SaleService:
             if not sales_guide:
                 return None, "Sales Guide not found or does not belong to this seller"
 
+        if payment_type == "credit" and not customer_id:
+            return None, "Customer is required for credit sales"
+
+        # Todos os produtos da venda são resolvidos numa única query
+        products = ProductService.get_active_products_map(boss_id, [item_data.get("product_id") for item_data in items_data])
+        sale_items, total_amount, error = SaleService.build_sale_items(items_data, products)
+        if error:
+            return None, error
+
         new_sale = Sale(
             seller_id=seller_id,
             customer_id=customer_id,
             payment_type=payment_type,
             sale_date=sale_date,
+            total_amount=total_amount,
             local_id=local_id,
             sync_status="PENDING" if local_id else "SYNCED",
-            guide_id=guide_id
+            guide_id=guide_id,
+            sale_items=sale_items
         )
-        db.session.add(new_sale)
-        db.session.flush() # Para ter acesso ao ID da venda antes do commit
-        
+        # Um reenvio concorrente pode gravar a mesma venda entre a verificação e estas escritas:
+        # o índice único (seller_id, local_id) falha (no autoflush ou no commit) e devolve-se a gravada
+        try:
+            db.session.add(new_sale)
+            
+            if payment_type == "credit":
+                new_credit = Credit(
+                    sale=new_sale,
+                    customer_id=customer_id,
+                    amount=total_amount,
+                    local_id=local_id, # Usar o mesmo local_id da venda para o crédito
+                    sync_status="PENDING" if local_id else "SYNCED"
+                )
+                db.session.add(new_credit)
+                CustomerService.adjust_balances({customer_id: total_amount})
+            
+            if guide_id:
+                GuideService.register_sold_quantities(SaleService.guide_quantities(guide_id, sale_items))
+            ReportService.record_sales([SaleService.rollup_entry(boss_id, new_sale)])
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            existing_sale = SaleService._find_by_local_id(seller_id, local_id)
+            if not existing_sale:
+                raise
+            return existing_sale, None
+        return SaleService._reload(new_sale.id), None
+
+    @staticmethod
+    def _find_by_local_id(seller_id, local_id):
+        """Venda já registada pelo vendedor com este local_id (índice único (seller_id, local_id))"""
+        if not local_id:
+            return None
+        return Sale.query.filter_by(seller_id=seller_id, local_id=local_id).first()
+
+    @staticmethod
+    def check_sale_data(payment_type, items_data):
+        """Validação do pedido comum à venda individual e às vendas em lote; devolve a mensagem de erro ou None"""
+        if not all([payment_type, items_data]):
+            return "Missing payment type or items data"
+        if payment_type not in ["cash", "credit"]:
+            return "Invalid payment type"
+        return None
+
+    @staticmethod
+    def create_sales_batch(seller_id, boss_id, sales_data):
+        """Cria várias vendas do vendedor numa única transação.
+
+        Clientes, guias, produtos e vendas já registadas (pelo local_id) são
+        resolvidos com uma query cada; cada venda é validada com as mesmas regras
+        de create_sale e as válidas são inseridas em bloco (vendas, itens e
+        créditos), atualizando saldos dos clientes, contadores das guias e o
+        agregado diário. Devolve um resultado por venda, pela ordem recebida.
+        """
+        results = [None] * len(sales_data)
+        parsed = {}
+        first_by_local_id = {}
+        for index, data in enumerate(sales_data):
+            local_id = data.get("local_id")
+            error = SaleService.check_sale_data(data.get("payment_type"), data.get("items"))
+            if error is None and data.get("payment_type") == "credit" and not data.get("customer_id"):
+                error = "Customer is required for credit sales"
+            if error is None:
+                try:
+                    sale_date = date.fromisoformat(data["sale_date"]) if data.get("sale_date") else date.today()
+                except (TypeError, ValueError):
+                    error = "Invalid date format for sale_date"
+            if error is not None:
+                results[index] = {"index": index, "local_id": local_id, "status": "failed", "error": error}
+            elif local_id and local_id in first_by_local_id:
+                # Repetida dentro do próprio lote: guarda o índice da primeira ocorrência, resolvido no fim
+                results[index] = first_by_local_id[local_id]
+            else:
+                if local_id:
+                    first_by_local_id[local_id] = index
+                parsed[index] = dict(data, sale_date=sale_date)
+
+        # Reenvios de vendas já registadas devolvem a existente em vez de duplicar
+        existing = SaleService._existing_local_ids(seller_id, {data["local_id"] for data in parsed.values() if data.get("local_id")})
+
+        customer_ids = {ProductService.normalize_id(data.get("customer_id")) for data in parsed.values() if data.get("customer_id")}
+        customer_ids = set(db.session.scalars(
+            db.select(Customer.id).filter(Customer.id.in_(customer_ids - {None}), Customer.boss_id == boss_id)
+        ).all()) if customer_ids - {None} else set()
+        guide_ids = {ProductService.normalize_id(data.get("guide_id")) for data in parsed.values() if data.get("guide_id")}
+        guide_ids = set(db.session.scalars(
+            db.select(SalesGuide.id).filter(SalesGuide.id.in_(guide_ids - {None}), SalesGuide.seller_id == seller_id)
+        ).all()) if guide_ids - {None} else set()
+        products = ProductService.get_active_products_map(
+            boss_id, [item_data.get("product_id") for data in parsed.values() for item_data in data["items"]]
+        )
+
+        valid = []
+        for index, data in parsed.items():
+            local_id = data.get("local_id")
+            if local_id in existing:
+                results[index] = {"index": index, "local_id": local_id, "status": "success", "sale_id": existing[local_id], "duplicate": True}
+                continue
+            customer_id = ProductService.normalize_id(data.get("customer_id")) if data.get("customer_id") else None
+            guide_id = ProductService.normalize_id(data.get("guide_id")) if data.get("guide_id") else None
+            if data.get("customer_id") and customer_id not in customer_ids:
+                error = "Customer not found"
+            elif data.get("guide_id") and guide_id not in guide_ids:
+                error = "Sales Guide not found or does not belong to this seller"
+            else:
+                sale_items, total_amount, error = SaleService.build_sale_items(data["items"], products)
+            if error:
+                results[index] = {"index": index, "local_id": local_id, "status": "failed", "error": error}
+                continue
+            valid.append((index, {
+                "seller_id": seller_id,
+                "customer_id": customer_id,
+                "payment_type": data["payment_type"],
+                "sale_date": data["sale_date"],
+                "total_amount": total_amount,
+                "local_id": local_id,
+                "sync_status": "PENDING" if local_id else "SYNCED",
+                "guide_id": guide_id
+            }, sale_items))
+
+        if valid:
+            try:
+                sale_ids = SaleService._insert_sales_batch(boss_id, valid)
+                db.session.commit()
+            except IntegrityError:
+                # Um reenvio concorrente registou uma das vendas: cada venda segue então o caminho individual
+                db.session.rollback()
+                sale_ids = []
+                for _, row, sale_items in valid:
+                    sale, error = SaleService.create_sale(
+                        seller_id, row["customer_id"], row["payment_type"], row["sale_date"].isoformat(),
+                        [{"product_id": item.product_id, "quantity": item.quantity} for item in sale_items],
+                        row["local_id"], row["guide_id"], boss_id
+                    )
+                    sale_ids.append(sale.id if sale else error)
+            for (index, row, _), sale_id in zip(valid, sale_ids):
+                if isinstance(sale_id, int):
+                    results[index] = {"index": index, "local_id": row["local_id"], "status": "success", "sale_id": sale_id}
+                else:
+                    results[index] = {"index": index, "local_id": row["local_id"], "status": "failed", "error": sale_id}
+
+        # As vendas repetidas no lote recebem o resultado (e o índice próprio) da primeira
+        for index, result in enumerate(results):
+            if isinstance(result, int):
+                results[index] = dict(results[result], index=index)
+                if results[index]["status"] == "success":
+                    results[index]["duplicate"] = True
+        return results
+
+    @staticmethod
+    def _existing_local_ids(seller_id, local_ids):
+        """local_id -> ID das vendas já registadas pelo vendedor, com uma única query"""
+        if not local_ids:
+            return {}
+        return dict(db.session.execute(
+            db.select(Sale.local_id, Sale.id).filter(Sale.seller_id == seller_id, Sale.local_id.in_(local_ids))
+        ).all())
+
+    @staticmethod
+    def _insert_sales_batch(boss_id, valid):
+        """Insere as vendas validadas, os itens e os créditos com um INSERT em bloco cada; devolve os IDs"""
+        # render_nulls: vendas sem cliente/guia/local_id ficam no mesmo INSERT que as restantes
+        sale_ids = db.session.scalars(
+            insert(Sale).returning(Sale.id, sort_by_parameter_order=True).execution_options(render_nulls=True),
+            [row for _, row, _ in valid]
+        ).all()
+
+        sale_items, credits, balances, guide_quantities, rollup = [], [], {}, {}, []
+        for sale_id, (_, row, items) in zip(sale_ids, valid):
+            sale_items.extend({
+                "sale_id": sale_id,
+                "product_id": item.product_id,
+                "quantity": item.quantity,
+                "unit_price": item.unit_price,
+                "subtotal": item.subtotal
+            } for item in items)
+            if row["payment_type"] == "credit":
+                credits.append({
+                    "sale_id": sale_id,
+                    "customer_id": row["customer_id"],
+                    "amount": row["total_amount"],
+                    "amount_paid": Decimal(0),
+                    "is_paid": False,
+                    "local_id": row["local_id"],  # Mesmo local_id da venda, como em create_sale
+                    "sync_status": row["sync_status"]
+                })
+                balances[row["customer_id"]] = balances.get(row["customer_id"], 0) + row["total_amount"]
+            if row["guide_id"]:
+                for key, quantity in SaleService.guide_quantities(row["guide_id"], items).items():
+                    guide_quantities[key] = guide_quantities.get(key, 0) + quantity
+            rollup.append((boss_id, row["seller_id"], row["sale_date"], row["payment_type"],
+                           [(item.product_id, item.quantity, item.subtotal) for item in items]))
+
+        db.session.execute(insert(SaleItem), sale_items)
+        if credits:
+            db.session.execute(insert(Credit).execution_options(render_nulls=True), credits)
+            CustomerService.adjust_balances(balances)
+        GuideService.register_sold_quantities(guide_quantities)
+        ReportService.record_sales(rollup)
+        return sale_ids
+
+    @staticmethod
+    def _reload(sale_id):
+        """Recarrega a venda com o perfil completo (evita uma query por item no to_dict)"""
+        return Sale.query.options(*sale_profile()).execution_options(populate_existing=True).filter_by(id=sale_id).one()
+
+    @staticmethod
+    def guide_quantities(guide_id, sale_items):
+        """Quantidades vendidas por (guia, produto) para o contador dos itens da guia"""
+        quantities = {}
+        for item in sale_items:
+            key = (guide_id, item.product_id)
+            quantities[key] = quantities.get(key, 0) + item.quantity
+        return quantities
+
+    @staticmethod
+    def rollup_entry(boss_id, sale):
+        """Venda no formato de ReportService.record_sales"""
+        return (boss_id, sale.seller_id, sale.sale_date, sale.payment_type,
+                [(item.product_id, item.quantity, item.subtotal) for item in sale.sale_items])
+
+    @staticmethod
+    def build_sale_items(items_data, products):
+        """Valida a lista de itens contra os produtos já carregados; devolve (itens, total, erro)"""
+        sale_items = []
         total_amount = 0
         for item_data in items_data:
             product_id = item_data.get("product_id")
             quantity = item_data.get("quantity")
             
-            product = Product.query.filter_by(id=product_id, boss_id=boss_id, is_active=True).first()
+            product = products.get(ProductService.normalize_id(product_id))
             if not product:
-                db.session.rollback()
-                return None, f"Product with ID {product_id} not found or inactive"
+                return None, None, f"Product with ID {product_id} not found or inactive"
             
             try:
                 quantity = int(quantity)
                 if quantity <= 0:
                     raise ValueError("Quantity must be positive")
-            except ValueError:
-                db.session.rollback()
-                return None, "Invalid quantity format"
+            except (TypeError, ValueError):
+                return None, None, "Invalid quantity format"
             
             new_sale_item = SaleItem(
-                sale_id=new_sale.id,
-                product_id=product_id,
+                product_id=product.id,
                 quantity=quantity,
                 unit_price=product.price
             )
             new_sale_item.calculate_subtotal()
-            db.session.add(new_sale_item)
+            sale_items.append(new_sale_item)
             total_amount += new_sale_item.subtotal
         
-        new_sale.total_amount = total_amount
-        
-        if payment_type == "credit":
-            if not customer_id:
-                db.session.rollback()
-                return None, "Customer is required for credit sales"
-            new_credit = Credit(
-                sale_id=new_sale.id,
-                customer_id=customer_id,
-                amount=total_amount,
-                local_id=local_id, # Usar o mesmo local_id da venda para o crédito
-                sync_status="PENDING" if local_id else "SYNCED"
-            )
-            db.session.add(new_credit)
-        
-        db.session.commit()
-        return new_sale, None
+        return sale_items, total_amount, None
 
     @staticmethod
-    def get_sales(user_role, user_id, boss_id):
+    def get_sales(user_role, user_id, boss_id, date_from=None, date_to=None, after=None, limit=None):
         if user_role == "boss":
-            return Sale.query.join(Seller).filter(Seller.boss_id == user_id).all()
+            query = Sale.query.join(Seller).filter(Seller.boss_id == user_id)
         elif user_role == "seller":
-            return Sale.query.filter_by(seller_id=user_id).all()
-        return []
+            query = Sale.query.filter_by(seller_id=user_id)
+        else:
+            return []
+        query = apply_date_range(query, Sale.sale_date, date_from, date_to)
+        return apply_keyset(query, Sale.sale_date, Sale.id, after, limit).options(*sale_profile()).all()
 
     @staticmethod
     def get_sale_by_id(sale_id, user_role, user_id, boss_id):
@@ -97,6 +331,12 @@ class SaleService:
 
     @staticmethod
     def delete_sale(sale):
+        # O crédito é apagado com a venda: o que estava em dívida sai do saldo do cliente
+        if sale.credit and not sale.credit.is_paid:
+            CustomerService.adjust_balances({sale.credit.customer_id: -(sale.credit.amount - sale.credit.amount_paid)})
+        ReportService.record_sales([SaleService.rollup_entry(sale.seller.boss_id, sale)], sign=-1)
+        if sale.guide_id:
+            GuideService.register_sold_quantities(SaleService.guide_quantities(sale.guide_id, sale.sale_items), sign=-1)
         db.session.delete(sale)
         db.session.commit()
         return True
@@ -1,4 +1,5 @@
 from src.models import db, Seller
+from src.services.report_service import ReportService
 
 class SellerService:
     @staticmethod
@@ -22,8 +23,9 @@ class SellerService:
     def update_seller(seller, name=None, is_active=None):
         if name is not None:
             seller.name = name
-        if is_active is not None:
+        if is_active is not None and is_active != seller.is_active:
             seller.is_active = is_active
+            ReportService.bump_production_version(seller.boss_id)  # As sugestões só contam vendedores ativos
         db.session.commit()
         return seller
     
@@ -35,6 +37,7 @@ class SellerService:
     
     @staticmethod
     def delete_seller(seller):
+        ReportService.bump_production_version(seller.boss_id)
         db.session.delete(seller)
         db.session.commit()
         return True
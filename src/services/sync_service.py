@@ -1,5 +1,63 @@
 from src.models import db, SyncQueue, SyncLog, Sale, SaleItem, Credit, CreditPayment, SalesGuide, GuideItem, Product, Customer
-from datetime import datetime, date
+from src.services.catalog_cache import CatalogCache
+from src.services.credit_service import CreditService
+from src.services.customer_service import CustomerService
+from src.services.report_service import ReportService
+from src.services.guide_service import GuideService
+from src.services.query_profiles import sale_profile, guide_profile, credit_profile
+from sqlalchemy import insert, select, literal, union_all
+from sqlalchemy.exc import IntegrityError, OperationalError, TimeoutError as PoolTimeoutError
+from datetime import datetime, date, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+import json
+
+# Número de registos lidos de cada vez no download em streaming
+STREAM_BATCH_SIZE = 500
+
+# Margem subtraída ao cursor devolvido no download. O last_modified é fixado no
+# flush, pelo que uma transação que fez flush antes do cursor mas só confirmou
+# depois da leitura ficaria de fora; com a margem esses registos voltam a ser
+# enviados no download seguinte (o dispositivo substitui-os pelo id).
+SYNC_CURSOR_OVERLAP = timedelta(minutes=5)
+
+# Número máximo de operações detalhadas no endpoint de estado da fila
+QUEUE_STATUS_LIMIT = 200
+
+# Ordem de aplicação dos grupos: as guias são criadas antes das vendas que as possam referir
+OPERATION_TYPES = ("CREATE_GUIDE", "CREATE_SALE", "CREATE_CREDIT_PAYMENT", "CLOSE_GUIDE")
+
+# Operações idempotentes: o par (seller_id, local_id) é único na tabela correspondente
+IDEMPOTENT_MODELS = {
+    "CREATE_SALE": Sale,
+    "CREATE_GUIDE": SalesGuide,
+    "CREATE_CREDIT_PAYMENT": CreditPayment
+}
+
+
+def _parse_date(value, field):
+    try:
+        return datetime.fromisoformat(value).date()
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid date format for {field}")
+
+
+def _parse_decimal(value, field, default=None):
+    if value is None and default is not None:
+        return default
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"Invalid {field} format")
+
+
+def _parse_int(value, field, allow_none=False):
+    if value is None and allow_none:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {field} format")
+
 
 class SyncService:
     @staticmethod
@@ -16,167 +74,621 @@ class SyncService:
         db.session.add(sync_log)
         db.session.flush()
         
-        results = []
-        for op in operations:
+        results = [None] * len(operations)
+        duplicates = SyncService._resolve_applied_operations(seller_id, operations, results)
+        groups = SyncService._validate_operations(seller_id, operations, boss_id, results, duplicates)
+        
+        handlers = {
+            "CREATE_GUIDE": SyncService._insert_guides,
+            "CREATE_SALE": SyncService._insert_sales,
+            "CREATE_CREDIT_PAYMENT": SyncService._insert_credit_payments,
+            "CLOSE_GUIDE": SyncService._close_guides
+        }
+        for operation_type in OPERATION_TYPES:
+            SyncService._apply_group(seller_id, operation_type, handlers[operation_type], groups[operation_type], results)
+        
+        # Operações repetidas dentro do próprio lote herdam o resultado da primeira ocorrência
+        for index, first_index in duplicates.items():
+            results[index] = dict(results[first_index], local_id=operations[index].get("local_id"))
+            if results[index]["status"] == "success":
+                results[index]["duplicate"] = True
+        
+        sync_log.records_success = sum(1 for result in results if result["status"] == "success")
+        sync_log.records_failed = len(results) - sync_log.records_success
+        sync_log.complete_sync()
+        
+        # Guias novas mudam a folha de produção do patrão
+        if any(results[index]["status"] == "success" and not results[index].get("duplicate") for index, _, _ in groups["CREATE_GUIDE"]):
+            ReportService.bump_production_version(boss_id)
+        db.session.commit()
+        
+        return results, None
+
+    @staticmethod
+    def enqueue_upload_operations(seller_id, operations):
+        """Coloca as operações na SyncQueue para processamento em segundo plano.
+
+        As operações cujo local_id já está na fila não são duplicadas: as concluídas
+        devolvem logo o server_id e as restantes o seu estado atual. Um reenvio de
+        uma operação FAILED volta a pô-la na fila, com os dados recebidos.
+        """
+        results = [None] * len(operations)
+        local_ids = {op.get("local_id") for op in operations if op.get("local_id")}
+        queued = {}
+        if local_ids:
+            for entry in SyncQueue.query.filter(SyncQueue.seller_id == seller_id, SyncQueue.local_id.in_(local_ids)).order_by(SyncQueue.id):
+                queued[(entry.operation_type, entry.local_id)] = entry
+        
+        new_entries = []
+        repeats = {}
+        requeued = False
+        for index, op in enumerate(operations):
             operation_type = op.get("operation_type")
-            payload = op.get("payload")
             local_id = op.get("local_id")
+            if operation_type not in OPERATION_TYPES:
+                results[index] = {"local_id": local_id, "status": "failed", "error": f"Unknown operation type: {operation_type}"}
+                continue
+            
+            key = (operation_type, local_id)
+            if local_id and key in queued:
+                if isinstance(queued[key], int):
+                    repeats[index] = queued[key]  # Repetida dentro do próprio lote
+                else:
+                    if queued[key].status == "FAILED":
+                        queued[key].requeue(op.get("payload") or {})
+                        requeued = True
+                    results[index] = SyncService._queue_result(queued[key])
+                continue
             
+            if local_id:
+                queued[key] = index
+            new_entries.append((index, {
+                "seller_id": seller_id,
+                "operation_type": operation_type,
+                "data": op.get("payload") or {},
+                "local_id": local_id,
+                "status": "PENDING",
+                "attempts": 0
+            }))
+        
+        if new_entries:
+            queue_ids = db.session.scalars(
+                insert(SyncQueue).returning(SyncQueue.id, sort_by_parameter_order=True),
+                [row for _, row in new_entries]
+            ).all()
+            for (index, row), queue_id in zip(new_entries, queue_ids):
+                results[index] = {"local_id": row["local_id"], "status": "queued", "queue_id": queue_id}
+        if new_entries or requeued:
+            db.session.commit()
+        
+        for index, first_index in repeats.items():
+            results[index] = results[first_index]
+        
+        return results, None
+
+    @staticmethod
+    def _queue_result(entry):
+        if entry.status == "COMPLETED":
+            return {"local_id": entry.local_id, "status": "success", "server_id": entry.server_id}
+        if entry.status == "FAILED":
+            return {"local_id": entry.local_id, "status": "failed", "error": entry.error_message, "queue_id": entry.id}
+        return {"local_id": entry.local_id, "status": "queued", "queue_id": entry.id}
+
+    @staticmethod
+    def get_queue_status(seller_id, local_ids=None):
+        """Resume o estado da fila de sincronização do vendedor"""
+        counts = {status: 0 for status in ("PENDING", "PROCESSING", "COMPLETED", "FAILED")}
+        rows = db.session.execute(
+            db.select(SyncQueue.status, db.func.count(SyncQueue.id))
+            .filter(SyncQueue.seller_id == seller_id)
+            .group_by(SyncQueue.status)
+        )
+        for status, count in rows:
+            counts[status] = count
+        
+        query = SyncQueue.query.filter(SyncQueue.seller_id == seller_id)
+        if local_ids:
+            query = query.filter(SyncQueue.local_id.in_(local_ids))
+        else:
+            query = query.filter(SyncQueue.status != "COMPLETED")
+        entries = query.order_by(SyncQueue.id).limit(QUEUE_STATUS_LIMIT).all()
+        
+        return {
+            "counts": counts,
+            "operations": [SyncService._queue_result(entry) for entry in entries]
+        }, None
+
+    @staticmethod
+    def _resolve_applied_operations(seller_id, operations, results):
+        """Responde de imediato às operações cujo local_id já foi aplicado.
+
+        Uma única query (UNION ALL sobre as tabelas idempotentes) encontra os
+        local_ids do lote que já existem no servidor; essas operações recebem o
+        server_id existente sem serem reprocessadas. Devolve as operações repetidas
+        dentro do próprio lote, mapeadas para o índice da primeira ocorrência.
+        """
+        local_ids = {operation_type: set() for operation_type in IDEMPOTENT_MODELS}
+        first_seen = {}
+        duplicates = {}
+        for index, op in enumerate(operations):
+            operation_type = op.get("operation_type")
+            local_id = op.get("local_id")
+            if operation_type not in IDEMPOTENT_MODELS or not local_id:
+                continue
+            key = (operation_type, local_id)
+            if key in first_seen:
+                duplicates[index] = first_seen[key]
+            else:
+                first_seen[key] = index
+                local_ids[operation_type].add(local_id)
+        
+        lookups = [
+            select(literal(operation_type).label("operation_type"), model.local_id, model.id)
+            .filter(model.seller_id == seller_id, model.local_id.in_(local_ids[operation_type]))
+            for operation_type, model in IDEMPOTENT_MODELS.items()
+            if local_ids[operation_type]
+        ]
+        if not lookups:
+            return duplicates
+        
+        applied = {(operation_type, local_id): server_id for operation_type, local_id, server_id in db.session.execute(union_all(*lookups))}
+        for index, op in enumerate(operations):
+            if index in duplicates:
+                continue
+            server_id = applied.get((op.get("operation_type"), op.get("local_id")))
+            if server_id is not None:
+                results[index] = {"local_id": op.get("local_id"), "status": "success", "server_id": server_id, "duplicate": True}
+        
+        return duplicates
+
+    @staticmethod
+    def _validate_operations(seller_id, operations, boss_id, results, duplicates):
+        """Valida o lote inteiro numa só passagem e agrupa as operações válidas por tipo.
+
+        As referências (produtos, clientes, créditos e guias) são resolvidas com uma
+        query por entidade para todo o lote. As operações inválidas ficam registadas
+        em results com o respetivo erro; as já aplicadas e as repetidas são ignoradas.
+        """
+        groups = {operation_type: [] for operation_type in OPERATION_TYPES}
+        parsed_operations = []
+        
+        for index, op in enumerate(operations):
+            if results[index] is not None or index in duplicates:
+                continue
+            operation_type = op.get("operation_type")
+            local_id = op.get("local_id")
             try:
+                payload = op.get("payload") or {}
                 if operation_type == "CREATE_SALE":
-                    new_sale = Sale(
-                        seller_id=seller_id,
-                        customer_id=payload.get("customer_id"),
-                        payment_type=payload.get("payment_type"),
-                        sale_date=datetime.fromisoformat(payload.get("sale_date")).date(),
-                        total_amount=payload.get("total_amount"),
-                        local_id=local_id,
-                        sync_status="SYNCED"
-                    )
-                    db.session.add(new_sale)
-                    db.session.flush()
-                    
-                    for item_data in payload.get("items", []):
-                        new_sale_item = SaleItem(
-                            sale_id=new_sale.id,
-                            product_id=item_data.get("product_id"),
-                            quantity=item_data.get("quantity"),
-                            unit_price=item_data.get("unit_price"),
-                            subtotal=item_data.get("subtotal")
-                        )
-                        db.session.add(new_sale_item)
-                    
-                    if new_sale.payment_type == "credit":
-                        new_credit = Credit(
-                            sale_id=new_sale.id,
-                            customer_id=new_sale.customer_id,
-                            amount=new_sale.total_amount,
-                            local_id=local_id,
-                            sync_status="SYNCED"
-                        )
-                        db.session.add(new_credit)
-                    
-                    db.session.commit()
-                    results.append({"local_id": local_id, "status": "success", "server_id": new_sale.id})
-                    sync_log.records_success += 1
-                
+                    parsed = SyncService._parse_sale(seller_id, payload, local_id)
+                    parsed["boss_id"] = boss_id
                 elif operation_type == "CREATE_CREDIT_PAYMENT":
-                    credit = Credit.query.filter_by(id=payload.get("credit_id")).first()
-                    if not credit:
-                        raise ValueError("Credit not found for payment")
-                    
-                    new_payment = CreditPayment(
-                        credit_id=credit.id,
-                        amount=payload.get("amount"),
-                        payment_date=datetime.fromisoformat(payload.get("payment_date")).date(),
-                        local_id=local_id,
-                        sync_status="SYNCED"
-                    )
-                    db.session.add(new_payment)
-                    
-                    credit.amount_paid += new_payment.amount
-                    if credit.amount_paid >= credit.amount:
-                        credit.is_paid = True
-                        credit.amount_paid = credit.amount
-                    
-                    db.session.commit()
-                    results.append({"local_id": local_id, "status": "success", "server_id": new_payment.id})
-                    sync_log.records_success += 1
-                
+                    parsed = SyncService._parse_credit_payment(seller_id, payload, local_id)
                 elif operation_type == "CREATE_GUIDE":
-                    new_guide = SalesGuide(
-                        seller_id=seller_id,
-                        guide_date=datetime.fromisoformat(payload.get("guide_date")).date(),
-                        notes=payload.get("notes"),
-                        total_taken_value=payload.get("total_taken_value"),
-                        local_id=local_id,
-                        sync_status="SYNCED"
-                    )
-                    db.session.add(new_guide)
-                    db.session.flush()
-
-                    for item_data in payload.get("items", []):
-                        new_guide_item = GuideItem(
-                            guide_id=new_guide.id,
-                            product_id=item_data.get("product_id"),
-                            quantity_taken=item_data.get("quantity_taken"),
-                            quantity_remaining=item_data.get("quantity_remaining"),
-                            unit_price=item_data.get("unit_price"),
-                            total_taken_value=item_data.get("total_taken_value"),
-                            total_sold_value=item_data.get("total_sold_value"),
-                            total_remaining_value=item_data.get("total_remaining_value"),
-                        )
-                        db.session.add(new_guide_item)
-                    db.session.commit()
-                    results.append({"local_id": local_id, "status": "success", "server_id": new_guide.id})
-                    sync_log.records_success += 1
-
+                    parsed = SyncService._parse_guide(seller_id, payload, local_id)
                 elif operation_type == "CLOSE_GUIDE":
-                    guide = SalesGuide.query.filter_by(id=payload.get("server_id"), seller_id=seller_id).first()
-                    if not guide:
-                        raise ValueError("Sales Guide not found")
-                    
-                    guide.status = "CLOSED"
-                    guide.closed_at = datetime.utcnow()
-                    guide.total_sold_value = payload.get("total_sold_value")
-                    guide.total_remaining_value = payload.get("total_remaining_value")
-                    guide.sync_status = "SYNCED"
-
-                    for item_data in payload.get("items", []):
-                        guide_item = GuideItem.query.filter_by(id=item_data.get("server_id"), guide_id=guide.id).first()
-                        if guide_item:
-                            guide_item.quantity_remaining = item_data.get("quantity_remaining")
-                            guide_item.total_sold_value = item_data.get("total_sold_value")
-                            guide_item.total_remaining_value = item_data.get("total_remaining_value")
-                    db.session.commit()
-                    results.append({"local_id": local_id, "status": "success", "server_id": guide.id})
-                    sync_log.records_success += 1
-
+                    parsed = SyncService._parse_close_guide(payload)
                 else:
                     raise ValueError(f"Unknown operation type: {operation_type}")
+            except (ValueError, TypeError, AttributeError) as e:
+                results[index] = {"local_id": local_id, "status": "failed", "error": str(e)}
+                continue
+            parsed_operations.append((index, operation_type, local_id, parsed))
+        
+        # Resolver todas as referências do lote com uma query por entidade
+        product_ids, customer_ids, credit_ids, guide_ids = set(), set(), set(), set()
+        for _, operation_type, _, parsed in parsed_operations:
+            if operation_type in ("CREATE_SALE", "CREATE_GUIDE"):
+                product_ids.update(item["product_id"] for item in parsed["items"])
+            if operation_type == "CREATE_SALE":
+                if parsed["sale"]["customer_id"] is not None:
+                    customer_ids.add(parsed["sale"]["customer_id"])
+                if parsed["sale"]["guide_id"] is not None:
+                    guide_ids.add(parsed["sale"]["guide_id"])
+            elif operation_type == "CREATE_CREDIT_PAYMENT":
+                credit_ids.add(parsed["credit_id"])
+            elif operation_type == "CLOSE_GUIDE":
+                guide_ids.add(parsed["guide_id"])
+        
+        known_products = set()
+        if product_ids:
+            known_products = set(db.session.scalars(
+                db.select(Product.id).filter(Product.id.in_(product_ids), Product.boss_id == boss_id)
+            ))
+        known_customers = set()
+        if customer_ids:
+            known_customers = set(db.session.scalars(
+                db.select(Customer.id).filter(Customer.id.in_(customer_ids), Customer.boss_id == boss_id)
+            ))
+        known_credits = set()
+        if credit_ids:
+            known_credits = set(db.session.scalars(
+                db.select(Credit.id).join(Customer).filter(Credit.id.in_(credit_ids), Customer.boss_id == boss_id)
+            ))
+        guides = {}
+        if guide_ids:
+            guides = {guide.id: guide for guide in SalesGuide.query.filter(SalesGuide.id.in_(guide_ids), SalesGuide.seller_id == seller_id)}
+        
+        for index, operation_type, local_id, parsed in parsed_operations:
+            error = None
+            if operation_type in ("CREATE_SALE", "CREATE_GUIDE"):
+                for item in parsed["items"]:
+                    if item["product_id"] not in known_products:
+                        error = f"Product with ID {item['product_id']} not found"
+                        break
+            if operation_type == "CREATE_SALE":
+                customer_id = parsed["sale"]["customer_id"]
+                if customer_id is not None and customer_id not in known_customers:
+                    error = "Customer not found"
+                guide_id = parsed["sale"]["guide_id"]
+                if guide_id is not None and guide_id not in guides:
+                    error = "Sales Guide not found or does not belong to this seller"
+            elif operation_type == "CREATE_CREDIT_PAYMENT":
+                if parsed["credit_id"] not in known_credits:
+                    error = "Credit not found for payment"
+            elif operation_type == "CLOSE_GUIDE":
+                parsed["guide"] = guides.get(parsed["guide_id"])
+                if parsed["guide"] is None:
+                    error = "Sales Guide not found"
+            
+            if error:
+                results[index] = {"local_id": local_id, "status": "failed", "error": error}
+            else:
+                groups[operation_type].append((index, local_id, parsed))
+        
+        return groups
 
-            except Exception as e:
-                db.session.rollback()
-                results.append({"local_id": local_id, "status": "failed", "error": str(e)})
-                sync_log.records_failed += 1
+    @staticmethod
+    def _parse_sale(seller_id, payload, local_id):
+        payment_type = payload.get("payment_type")
+        if payment_type not in ("cash", "credit"):
+            raise ValueError("Invalid payment type")
         
-        sync_log.complete_sync()
-        db.session.commit()
+        customer_id = _parse_int(payload.get("customer_id"), "customer_id", allow_none=True)
+        if payment_type == "credit" and customer_id is None:
+            raise ValueError("Customer is required for credit sales")
         
-        return results, None
+        items = []
+        for item_data in payload.get("items", []):
+            items.append({
+                "product_id": _parse_int(item_data.get("product_id"), "product_id"),
+                "quantity": _parse_int(item_data.get("quantity"), "quantity"),
+                "unit_price": _parse_decimal(item_data.get("unit_price"), "unit_price"),
+                "subtotal": _parse_decimal(item_data.get("subtotal"), "subtotal")
+            })
+        
+        return {
+            "sale": {
+                "seller_id": seller_id,
+                "customer_id": customer_id,
+                "payment_type": payment_type,
+                "sale_date": _parse_date(payload.get("sale_date"), "sale_date"),
+                "total_amount": _parse_decimal(payload.get("total_amount"), "total_amount"),
+                "guide_id": _parse_int(payload.get("guide_id"), "guide_id", allow_none=True),
+                "local_id": local_id,
+                "sync_status": "SYNCED"
+            },
+            "items": items
+        }
+
+    @staticmethod
+    def _parse_credit_payment(seller_id, payload, local_id):
+        amount = _parse_decimal(payload.get("amount"), "amount")
+        if amount <= 0:
+            raise ValueError("Amount must be positive")
+        
+        return {
+            "credit_id": _parse_int(payload.get("credit_id"), "credit_id"),
+            "seller_id": seller_id,
+            "amount": amount,
+            "payment_date": _parse_date(payload.get("payment_date"), "payment_date"),
+            "local_id": local_id
+        }
+
+    @staticmethod
+    def _parse_guide(seller_id, payload, local_id):
+        # Os valores dos itens e os totais da guia são calculados no servidor a partir das
+        # quantidades e preços (como em GuideItem.calculate_values), sem confiar no dispositivo
+        items = []
+        for item_data in payload.get("items", []):
+            quantity_taken = _parse_int(item_data.get("quantity_taken"), "quantity_taken")
+            quantity_remaining = _parse_int(item_data.get("quantity_remaining"), "quantity_remaining", allow_none=True)
+            unit_price = _parse_decimal(item_data.get("unit_price"), "unit_price")
+            items.append({
+                "product_id": _parse_int(item_data.get("product_id"), "product_id"),
+                "quantity_taken": quantity_taken,
+                "quantity_remaining": quantity_remaining,
+                "unit_price": unit_price,
+                "total_taken_value": quantity_taken * unit_price,
+                "total_sold_value": Decimal(0) if quantity_remaining is None else (quantity_taken - quantity_remaining) * unit_price,
+                "total_remaining_value": Decimal(0) if quantity_remaining is None else quantity_remaining * unit_price
+            })
+        
+        return {
+            "guide": {
+                "seller_id": seller_id,
+                "guide_date": _parse_date(payload.get("guide_date"), "guide_date"),
+                "notes": payload.get("notes"),
+                "total_taken_value": sum((item["total_taken_value"] for item in items), Decimal(0)),
+                "total_sold_value": sum((item["total_sold_value"] for item in items), Decimal(0)),
+                "total_remaining_value": sum((item["total_remaining_value"] for item in items), Decimal(0)),
+                "local_id": local_id,
+                "sync_status": "SYNCED"
+            },
+            "items": items
+        }
 
     @staticmethod
-    def get_download_data(seller_id, boss_id):
-        products = Product.query.filter_by(boss_id=boss_id, is_active=True).all()
-        customers = Customer.query.filter_by(boss_id=boss_id).all()
-        sales = Sale.query.filter_by(seller_id=seller_id).all()
-        credits = Credit.query.join(Sale).filter(Sale.seller_id == seller_id).all()
-        guides = SalesGuide.query.filter_by(seller_id=seller_id).all()
+    def _parse_close_guide(payload):
+        items = []
+        for item_data in payload.get("items", []):
+            items.append({
+                "id": _parse_int(item_data.get("server_id"), "server_id"),
+                "quantity_remaining": _parse_int(item_data.get("quantity_remaining"), "quantity_remaining", allow_none=True)
+            })
         
-        products_data = [p.to_dict() for p in products]
-        customers_data = [c.to_dict() for c in customers]
-        sales_data = [s.to_dict() for s in sales]
-        credits_data = [c.to_dict() for c in credits]
-        guides_data = [g.to_dict() for g in guides]
+        return {
+            "guide_id": _parse_int(payload.get("server_id"), "server_id"),
+            "items": items
+        }
+
+    @staticmethod
+    def _apply_group(seller_id, operation_type, handler, entries, results):
+        """Aplica um grupo de operações do mesmo tipo dentro da transação do lote.
+
+        O grupo é primeiro inserido de uma só vez num savepoint. Se falhar, cada
+        operação é repetida no seu próprio savepoint, para que uma operação má não
+        anule as restantes. Uma violação do índice único (seller_id, local_id)
+        significa que um reenvio concorrente já aplicou a operação.
+        """
+        if not entries:
+            return
+        
+        try:
+            with db.session.begin_nested():
+                server_ids = handler(entries)
+        except Exception as e:
+            if len(entries) == 1:
+                SyncService._record_failure(seller_id, operation_type, entries[0], e, results)
+                return
+            
+            server_ids = []
+            for entry in entries:
+                try:
+                    with db.session.begin_nested():
+                        server_ids.extend(handler([entry]))
+                except Exception as e:
+                    SyncService._record_failure(seller_id, operation_type, entry, e, results)
+                    server_ids.append(None)
+        
+        for (index, local_id, _), server_id in zip(entries, server_ids):
+            if server_id is not None:
+                results[index] = {"local_id": local_id, "status": "success", "server_id": server_id}
+
+    @staticmethod
+    def _record_failure(seller_id, operation_type, entry, error, results):
+        index, local_id, _ = entry
+        model = IDEMPOTENT_MODELS.get(operation_type)
+        if isinstance(error, IntegrityError) and model is not None and local_id:
+            server_id = db.session.scalar(select(model.id).filter_by(seller_id=seller_id, local_id=local_id))
+            if server_id is not None:
+                results[index] = {"local_id": local_id, "status": "success", "server_id": server_id, "duplicate": True}
+                return
+        results[index] = {"local_id": local_id, "status": "failed", "error": str(error)}
+        if SyncService.is_transient_error(error):
+            results[index]["retryable"] = True
+
+    @staticmethod
+    def is_transient_error(error):
+        """Indica se o erro pode desaparecer numa nova tentativa (bloqueios, deadlocks, ligação ou pool)"""
+        return isinstance(error, (OperationalError, PoolTimeoutError))
+
+    @staticmethod
+    def _insert_sales(entries):
+        sale_ids = db.session.scalars(
+            insert(Sale).returning(Sale.id, sort_by_parameter_order=True),
+            [parsed["sale"] for _, _, parsed in entries]
+        ).all()
+        
+        sale_items = []
+        credits = []
+        guide_quantities = {}
+        for sale_id, (_, local_id, parsed) in zip(sale_ids, entries):
+            sale_items.extend(dict(item, sale_id=sale_id) for item in parsed["items"])
+            guide_id = parsed["sale"]["guide_id"]
+            if guide_id is not None:
+                for item in parsed["items"]:
+                    key = (guide_id, item["product_id"])
+                    guide_quantities[key] = guide_quantities.get(key, 0) + item["quantity"]
+            if parsed["sale"]["payment_type"] == "credit":
+                credits.append({
+                    "sale_id": sale_id,
+                    "customer_id": parsed["sale"]["customer_id"],
+                    "amount": parsed["sale"]["total_amount"],
+                    "amount_paid": Decimal(0),
+                    "is_paid": False,
+                    "local_id": local_id,
+                    "sync_status": "SYNCED"
+                })
+        
+        if sale_items:
+            db.session.execute(insert(SaleItem), sale_items)
+        if credits:
+            db.session.execute(insert(Credit), credits)
+            balances = {}
+            for credit in credits:
+                balances[credit["customer_id"]] = balances.get(credit["customer_id"], 0) + credit["amount"]
+            CustomerService.adjust_balances(balances)
+        GuideService.register_sold_quantities(guide_quantities)
+        ReportService.record_sales([(
+            parsed["boss_id"],
+            parsed["sale"]["seller_id"],
+            parsed["sale"]["sale_date"],
+            parsed["sale"]["payment_type"],
+            [(item["product_id"], item["quantity"], item["subtotal"]) for item in parsed["items"]]
+        ) for _, _, parsed in entries])
+        return sale_ids
+
+    @staticmethod
+    def _insert_credit_payments(entries):
+        # Cada pagamento é somado ao crédito com um UPDATE atómico, limitado ao valor em dívida
+        amounts = []
+        for _, _, parsed in entries:
+            amount = CreditService.apply_payment(parsed["credit_id"], parsed["amount"])
+            if amount <= 0:
+                raise ValueError("Credit already fully paid")
+            amounts.append(amount)
+        
+        payment_ids = db.session.scalars(
+            insert(CreditPayment).returning(CreditPayment.id, sort_by_parameter_order=True),
+            [{
+                "credit_id": parsed["credit_id"],
+                "seller_id": parsed["seller_id"],
+                "amount": amount,
+                "payment_date": parsed["payment_date"],
+                "local_id": local_id,
+                "sync_status": "SYNCED"
+            } for (_, local_id, parsed), amount in zip(entries, amounts)]
+        ).all()
+        return payment_ids
+
+    @staticmethod
+    def _insert_guides(entries):
+        guide_ids = db.session.scalars(
+            insert(SalesGuide).returning(SalesGuide.id, sort_by_parameter_order=True),
+            [parsed["guide"] for _, _, parsed in entries]
+        ).all()
+        
+        guide_items = []
+        for guide_id, (_, _, parsed) in zip(guide_ids, entries):
+            guide_items.extend(dict(item, guide_id=guide_id) for item in parsed["items"])
+        
+        if guide_items:
+            db.session.execute(insert(GuideItem), guide_items)
+        return guide_ids
+
+    @staticmethod
+    def _close_guides(entries):
+        guides = [parsed["guide"] for _, _, parsed in entries]
+        remaining_by_guide = {}
+        for _, _, parsed in entries:
+            remaining = remaining_by_guide.setdefault(parsed["guide_id"], {})
+            for item_data in parsed["items"]:
+                if item_data["quantity_remaining"] is not None:
+                    remaining[item_data["id"]] = item_data["quantity_remaining"]
         
+        # Os valores e totais são recalculados no servidor a partir das quantidades restantes
+        GuideService.close_guides(guides, remaining_by_guide, strict=False)
+        for guide in guides:
+            guide.sync_status = "SYNCED"
+        db.session.flush()
+        return [guide.id for guide in guides]
+
+    @staticmethod
+    def parse_cursor(value):
+        """Converte o cursor de sincronização (ISO 8601) num datetime UTC sem fuso"""
+        cursor = datetime.fromisoformat(value)
+        if cursor.tzinfo is not None:
+            cursor = cursor.astimezone(timezone.utc).replace(tzinfo=None)
+        return cursor
+
+    @staticmethod
+    def _download_queries(seller_id, boss_id, since=None):
+        """Devolve as queries de cada entidade do download, filtradas pelo cursor se existir.
+
+        O modo incremental só envia registos criados ou alterados: as remoções
+        definitivas (produtos, clientes, vendas e guias apagados) não são
+        propagadas. Os produtos desativados seguem com is_active a falso; para
+        refletir remoções o dispositivo tem de fazer um download completo.
+        """
+        if since is None:
+            products = Product.query.filter_by(boss_id=boss_id, is_active=True)
+        else:
+            # Em modo incremental os produtos desativados também seguem, para o dispositivo os remover
+            products = Product.query.filter(Product.boss_id == boss_id, Product.updated_at > since)
+        customers = Customer.query.filter_by(boss_id=boss_id)
+        sales = Sale.query.filter_by(seller_id=seller_id).options(*sale_profile())
+        credits = Credit.query.join(Sale).filter(Sale.seller_id == seller_id).options(*credit_profile())
+        guides = SalesGuide.query.filter_by(seller_id=seller_id).options(*guide_profile())
+
+        if since is not None:
+            customers = customers.filter(Customer.updated_at > since)
+            sales = sales.filter(Sale.last_modified > since)
+            credits = credits.filter(Credit.last_modified > since)
+            guides = guides.filter(SalesGuide.last_modified > since)
+
+        return [
+            ("products", products),
+            ("customers", customers),
+            ("sales", sales),
+            ("credits", credits),
+            ("guides", guides)
+        ]
+
+    @staticmethod
+    def get_download_data(seller_id, boss_id, since=None):
+        # O novo cursor é fixado antes das queries (menos SYNC_CURSOR_OVERLAP) para não perder alterações concorrentes
+        sync_start = datetime.utcnow()
+
+        data = {}
+        catalog = CatalogCache.get(boss_id) if since is None else None
+        for key, query in SyncService._download_queries(seller_id, boss_id, since):
+            if catalog is not None and key == "products":
+                data[key] = catalog.records["active_products"]
+            elif catalog is not None and key == "customers":
+                data[key] = catalog.records["customers"]
+            else:
+                data[key] = [record.to_dict() for record in query.all()]
+
+        total_records = sum(len(records) for records in data.values())
+
         sync_log = SyncLog(
             seller_id=seller_id,
             sync_type="DOWNLOAD",
-            records_processed=len(products_data) + len(customers_data) + len(sales_data) + len(credits_data) + len(guides_data),
-            records_success=len(products_data) + len(customers_data) + len(sales_data) + len(credits_data) + len(guides_data),
+            records_processed=total_records,
+            records_success=total_records,
             records_failed=0,
-            sync_start=datetime.utcnow(),
+            sync_start=sync_start,
             status="COMPLETED"
         )
         db.session.add(sync_log)
         db.session.commit()
-        
-        return {
-            "products": products_data,
-            "customers": customers_data,
-            "sales": sales_data,
-            "credits": credits_data,
-            "guides": guides_data
-        }, None
 
+        data["cursor"] = (sync_start - SYNC_CURSOR_OVERLAP).isoformat()
+        data["is_delta"] = since is not None
+        return data, None
+
+    @staticmethod
+    def iter_download_records(seller_id, boss_id, since=None):
+        """Gera o download em NDJSON, uma linha por registo.
+
+        Cada entidade é lida com um cursor do lado do servidor (yield_per), pelo
+        que só um lote de STREAM_BATCH_SIZE linhas está em memória de cada vez.
+        A primeira linha traz o novo cursor e a última o total de registos.
+        """
+        sync_start = datetime.utcnow()
+        yield SyncService._ndjson_line({"type": "header", "cursor": (sync_start - SYNC_CURSOR_OVERLAP).isoformat(), "is_delta": since is not None})
+        
+        total_records = 0
+        for key, query in SyncService._download_queries(seller_id, boss_id, since):
+            for record in query.yield_per(STREAM_BATCH_SIZE):
+                total_records += 1
+                yield SyncService._ndjson_line({"type": key, "data": record.to_dict()})
+        
+        sync_log = SyncLog(
+            seller_id=seller_id,
+            sync_type="DOWNLOAD",
+            records_processed=total_records,
+            records_success=total_records,
+            records_failed=0,
+            sync_start=sync_start,
+            status="COMPLETED"
+        )
+        db.session.add(sync_log)
+        db.session.commit()
+        
+        yield SyncService._ndjson_line({"type": "end", "records": total_records})
 
+    @staticmethod
+    def _ndjson_line(record):
+        return json.dumps(record, separators=(",", ":")) + "\n"
@@ -0,0 +1,154 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_, update
+from src.models import db, SyncQueue, Seller
+from src.services.sync_service import SyncService
+
+logger = logging.getLogger(__name__)
+
+
+class SyncWorker:
+    """Pool de threads que processa a SyncQueue em segundo plano.
+
+    Cada thread reclama um lote de operações pendentes (SELECT ... FOR UPDATE
+    SKIP LOCKED em PostgreSQL, compare-and-set nas restantes bases de dados),
+    aplica-as por vendedor com SyncService.process_upload_operations. Só as
+    falhas transitórias (ex.: bloqueios ou ligação perdida) voltam a ser
+    agendadas, com backoff exponencial até max_attempts; os erros de validação
+    ficam FAILED logo na primeira tentativa.
+
+    Não arranca com a app: corre num processo próprio (python -m
+    src.services.sync_worker) ou é arrancado explicitamente.
+    """
+
+    def __init__(self, app, threads=2, batch_size=50, poll_interval=1.0, max_attempts=5, backoff_base=2, stale_after=300):
+        self.app = app
+        self.threads = threads
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.stale_after = stale_after  # Segundos até uma operação em PROCESSING ser considerada abandonada
+        self._stop = threading.Event()
+        self._workers = []
+
+    def start(self):
+        for number in range(self.threads):
+            worker = threading.Thread(target=self._run, name=f"sync-worker-{number}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    def _run(self):
+        with self.app.app_context():
+            while not self._stop.is_set():
+                try:
+                    processed = self.process_once()
+                except Exception:
+                    logger.exception("Sync worker iteration failed")
+                    db.session.rollback()
+                    processed = 0
+                finally:
+                    db.session.remove()
+                if not processed:
+                    self._stop.wait(self.poll_interval)
+
+    def process_once(self):
+        """Reclama e processa um lote; devolve o número de operações tratadas"""
+        entries = self.claim_batch()
+        if not entries:
+            return 0
+        
+        by_seller = {}
+        for entry in entries:
+            by_seller.setdefault(entry.seller_id, []).append(entry)
+        bosses = dict(db.session.execute(db.select(Seller.id, Seller.boss_id).filter(Seller.id.in_(by_seller))).all())
+        
+        for seller_id, seller_entries in by_seller.items():
+            operations = [{
+                "operation_type": entry.operation_type,
+                "payload": entry.data,
+                "local_id": entry.local_id
+            } for entry in seller_entries]
+            try:
+                results, error = SyncService.process_upload_operations(seller_id, operations, bosses.get(seller_id))
+            except Exception as e:
+                db.session.rollback()
+                results, error = None, {"status": "failed", "error": str(e), "retryable": SyncService.is_transient_error(e)}
+            
+            for index, entry in enumerate(seller_entries):
+                result = results[index] if results else error
+                if result["status"] == "success":
+                    entry.mark_completed(result["server_id"])
+                elif result.get("retryable") and entry.attempts < self.max_attempts:
+                    entry.schedule_retry(result.get("error"), self.backoff_base ** entry.attempts)
+                else:
+                    entry.mark_failed(result.get("error"))
+            db.session.commit()
+        
+        return len(entries)
+
+    def claim_batch(self):
+        """Marca como PROCESSING e devolve um lote de operações disponíveis"""
+        now = datetime.utcnow()
+        claimable = or_(
+            and_(SyncQueue.status == "PENDING", or_(SyncQueue.next_attempt_at.is_(None), SyncQueue.next_attempt_at <= now)),
+            and_(SyncQueue.status == "PROCESSING", SyncQueue.last_attempt < now - timedelta(seconds=self.stale_after))
+        )
+        
+        if db.session.get_bind().dialect.name == "postgresql":
+            entries = (SyncQueue.query.filter(claimable)
+                       .order_by(SyncQueue.id)
+                       .limit(self.batch_size)
+                       .with_for_update(skip_locked=True)
+                       .all())
+            for entry in entries:
+                entry.mark_processing()
+            db.session.commit()
+            return entries
+        
+        # Sem SKIP LOCKED (ex.: SQLite): cada linha só é reclamada se o estado não mudou entretanto
+        candidates = db.session.execute(
+            db.select(SyncQueue.id, SyncQueue.status).filter(claimable).order_by(SyncQueue.id).limit(self.batch_size)
+        ).all()
+        claimed_ids = []
+        for queue_id, status in candidates:
+            claimed = db.session.execute(
+                update(SyncQueue)
+                .where(SyncQueue.id == queue_id, SyncQueue.status == status, claimable)
+                .values(status="PROCESSING", attempts=SyncQueue.attempts + 1, last_attempt=now)
+                .execution_options(synchronize_session=False)
+            )
+            if claimed.rowcount:
+                claimed_ids.append(queue_id)
+        db.session.commit()
+        
+        if not claimed_ids:
+            return []
+        return SyncQueue.query.filter(SyncQueue.id.in_(claimed_ids)).order_by(SyncQueue.id).all()
+
+
+def run(threads=None):
+    """Executa o pool de workers num processo dedicado (python -m src.services.sync_worker)"""
+    from src.main import app
+    
+    threads = threads or int(os.environ.get("SYNC_WORKER_THREADS", 2))
+    worker = SyncWorker(app, threads=threads)
+    worker.start()
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        worker.stop()
+
+
+if __name__ == "__main__":
+    run()
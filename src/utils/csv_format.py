@@ -0,0 +1,38 @@
+import csv
+import io
+
+from flask import Response
+
+CSV_MIMETYPE = "text/csv"
+
+
+def wants_csv(request):
+    """Indica se o cliente pediu CSV (?format=csv ou Accept: text/csv)"""
+    requested = request.args.get("format")
+    if requested:
+        return requested == "csv"
+    return request.accept_mimetypes.best_match(["application/json", CSV_MIMETYPE], default="application/json") == CSV_MIMETYPE
+
+
+def make_csv_response(rows, columns, filename):
+    """Resposta CSV com uma linha de cabeçalho e uma linha por dicionário de rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([row.get(column) for column in columns])
+    return Response(
+        buffer.getvalue(),
+        mimetype=CSV_MIMETYPE,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+def uploaded_csv(request):
+    """Ficheiro CSV enviado no pedido, como stream binário (multipart 'file' ou o corpo em text/csv)"""
+    upload = request.files.get("file")
+    if upload is not None:
+        return upload.stream
+    if request.mimetype == CSV_MIMETYPE:
+        return request.stream
+    return None
@@ -0,0 +1,100 @@
+import csv
+import io
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet e Arrow só são oferecidos se o pyarrow estiver instalado
+    pa = None
+    pq = None
+
+from src.utils.csv_format import CSV_MIMETYPE
+
+# Formato -> (mimetype, extensão do ficheiro)
+EXPORT_FORMATS = {
+    "csv": (CSV_MIMETYPE, "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows")
+}
+
+
+def available_formats():
+    return [fmt for fmt in EXPORT_FORMATS if fmt == "csv" or pa is not None]
+
+
+def iter_export(fmt, columns, batches):
+    """Serializa os lotes de linhas no formato pedido, um bloco de bytes por lote.
+
+    columns é uma lista de pares (nome, tipo), com o tipo em "int", "str",
+    "decimal", "date", "datetime" ou "bool"; batches gera listas de tuplos pela
+    mesma ordem. Só um lote está em memória de cada vez.
+    """
+    if fmt == "csv":
+        return _iter_csv(columns, batches)
+    return _iter_arrow(fmt, columns, batches)
+
+
+def _iter_csv(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    yield buffer.getvalue().encode("utf-8")
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Ficheiro só de escrita que guarda os bytes escritos até serem recolhidos com drain()"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _arrow_schema(columns):
+    types = {
+        "int": pa.int64(),
+        "str": pa.string(),
+        "decimal": pa.decimal128(12, 2),
+        "date": pa.date32(),
+        "datetime": pa.timestamp("us"),
+        "bool": pa.bool_()
+    }
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+def _iter_arrow(fmt, columns, batches):
+    """Parquet (um row group por lote) ou Arrow IPC em streaming (um record batch por lote)"""
+    schema = _arrow_schema(columns)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema) if fmt == "parquet" else pa.ipc.new_stream(sink, schema)
+    try:
+        for rows in batches:
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,79 @@
+import base64
+import json
+from datetime import date
+from sqlalchemy import tuple_
+
+# Tamanho máximo de página aceite em ?limit=
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(date_value, record_id):
+    """Cursor opaco com a chave (data, id) do último registo da página"""
+    raw = json.dumps([date_value.isoformat() if date_value is not None else None, record_id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Devolve (data em ISO 8601 ou None, id); levanta ValueError se o cursor for inválido"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        date_value, record_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return date_value, int(record_id)
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+
+
+def parse_page_args(args):
+    """Lê from, to, cursor e limit da query string; levanta ValueError se algum for inválido"""
+    try:
+        date_from = date.fromisoformat(args["from"]) if args.get("from") else None
+        date_to = date.fromisoformat(args["to"]) if args.get("to") else None
+    except ValueError:
+        raise ValueError("Invalid date format for from/to")
+    after = decode_cursor(args["cursor"]) if args.get("cursor") else None
+    try:
+        limit = int(args["limit"]) if args.get("limit") else None
+    except ValueError:
+        raise ValueError("Invalid limit format")
+    if limit is not None and not 0 < limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return {"date_from": date_from, "date_to": date_to, "after": after, "limit": limit}
+
+
+def apply_date_range(query, column, date_from=None, date_to=None):
+    """Filtra a coluna de data pelo intervalo [date_from, date_to], ambos inclusivos"""
+    if date_from is not None:
+        query = query.filter(column >= date_from)
+    if date_to is not None:
+        query = query.filter(column <= date_to)
+    return query
+
+
+def apply_keyset(query, date_column, id_column, after=None, limit=None):
+    """Ordena por (data, id) descendente e continua depois do cursor.
+
+    Com um índice em (data, id), cada página custa o mesmo que a primeira,
+    independentemente de quantos registos ficaram para trás.
+    """
+    if after is not None:
+        date_value, record_id = after
+        if date_value is None:
+            raise ValueError("Invalid cursor")
+        try:
+            date_value = date_column.type.python_type.fromisoformat(date_value)
+        except ValueError:
+            raise ValueError("Invalid cursor")
+        query = query.filter(tuple_(date_column, id_column) < tuple_(date_value, record_id))
+    query = query.order_by(date_column.desc(), id_column.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def set_next_cursor(response, items, limit, date_attr):
+    """Indica o cursor da página seguinte no cabeçalho X-Next-Cursor quando a página veio cheia"""
+    if limit is not None and len(items) == limit:
+        last = items[-1]
+        date_value = getattr(last, date_attr) if date_attr else None
+        response.headers["X-Next-Cursor"] = encode_cursor(date_value, last.id)
+    return response
@@ -0,0 +1,168 @@
+import gzip
+import json
+import zlib
+
+try:
+    import msgpack
+except ImportError:  # O formato binário só é oferecido se o msgpack estiver instalado
+    msgpack = None
+
+from flask import Response, jsonify
+from werkzeug.exceptions import RequestEntityTooLarge
+
+JSON_MIMETYPE = "application/json"
+COLUMNAR_MIMETYPE = "application/vnd.padaria.columnar+json"
+MSGPACK_MIMETYPES = ("application/msgpack", "application/x-msgpack")
+
+# Abaixo deste tamanho a compressão não compensa o custo
+GZIP_MIN_SIZE = 1024
+
+# Tamanho máximo de um upload de sincronização, já descomprimido (bytes)
+MAX_UPLOAD_SIZE = 32 * 2 ** 20
+
+
+def to_columnar(records):
+    """Converte uma lista de dicionários num conjunto em colunas.
+
+    O resultado tem a forma {"columns": [...], "data": [[...], ...]}, com uma
+    lista de valores por coluna. Listas de dicionários aninhadas (ex.: os itens
+    de uma venda) são convertidas da mesma forma.
+    """
+    columns = []
+    for record in records:
+        for key in record:
+            if key not in columns:
+                columns.append(key)
+    
+    data = []
+    for column in columns:
+        values = []
+        for record in records:
+            value = record.get(column)
+            if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+                value = to_columnar(value)
+            values.append(value)
+        data.append(values)
+    
+    return {"columns": columns, "data": data}
+
+
+def from_columnar(columnar):
+    """Reconstrói a lista de dicionários a partir de um conjunto em colunas"""
+    columns = columnar["columns"]
+    data = columnar["data"]
+    size = len(data[0]) if data else 0
+    
+    records = []
+    for index in range(size):
+        record = {}
+        for column, values in zip(columns, data):
+            value = values[index]
+            if is_columnar(value):
+                value = from_columnar(value)
+            record[column] = value
+        records.append(record)
+    return records
+
+
+def is_columnar(value):
+    """Conjunto em colunas aninhado num payload já declarado em colunas (ver decode_sync_request)"""
+    return (isinstance(value, dict) and set(value) == {"columns", "data"}
+            and isinstance(value["columns"], list) and isinstance(value["data"], list)
+            and len(value["columns"]) == len(value["data"]))
+
+
+def negotiate_format(request):
+    """Escolhe o formato da resposta: 'msgpack', 'columnar' ou 'json'"""
+    requested = request.args.get("format")
+    if requested in ("msgpack", "columnar", "json"):
+        if requested == "msgpack" and msgpack is None:
+            return "columnar"
+        return requested
+    
+    offered = [JSON_MIMETYPE, COLUMNAR_MIMETYPE]
+    if msgpack is not None:
+        offered.extend(MSGPACK_MIMETYPES)
+    best = request.accept_mimetypes.best_match(offered, default=JSON_MIMETYPE)
+    if best in MSGPACK_MIMETYPES:
+        return "msgpack"
+    if best == COLUMNAR_MIMETYPE:
+        return "columnar"
+    return "json"
+
+
+def encode_payload(data, fmt):
+    """Serializa o payload no formato pedido; devolve (bytes, mimetype)"""
+    if fmt == "json":
+        return json.dumps(data, separators=(",", ":")).encode("utf-8"), JSON_MIMETYPE
+    
+    compact = {key: to_columnar(value) if isinstance(value, list) else value for key, value in data.items()}
+    if fmt == "msgpack":
+        return msgpack.packb(compact, use_bin_type=True), MSGPACK_MIMETYPES[0]
+    return json.dumps(compact, separators=(",", ":")).encode("utf-8"), COLUMNAR_MIMETYPE
+
+
+def make_sync_response(request, data, status=200):
+    """Resposta de sincronização negociada (formato via Accept e compressão via Accept-Encoding)"""
+    fmt = negotiate_format(request)
+    accepts_gzip = "gzip" in request.accept_encodings
+    if fmt == "json" and not accepts_gzip:
+        return jsonify(data), status
+    
+    body, mimetype = encode_payload(data, fmt)
+    response = Response(body, status=status, mimetype=mimetype)
+    if accepts_gzip and len(body) >= GZIP_MIN_SIZE:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept")
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def gunzip_limited(body, max_size):
+    """Descomprime um corpo gzip sem nunca produzir mais de max_size bytes (RequestEntityTooLarge acima disso)"""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        data = decompressor.decompress(body, max_size + 1)
+    except zlib.error as e:
+        raise ValueError(f"Invalid gzip body: {e}")
+    if len(data) > max_size:
+        raise RequestEntityTooLarge()
+    if not decompressor.eof:
+        raise ValueError("Truncated gzip body")
+    return data
+
+
+def decode_sync_request(request, max_size=None):
+    """Lê o corpo de um upload de sincronização (JSON ou MessagePack, opcionalmente gzip).
+
+    O corpo, comprimido ou não, nunca passa de max_size bytes em memória: acima
+    disso é lançado RequestEntityTooLarge (413); por omissão, MAX_UPLOAD_SIZE.
+    As operações só são lidas em colunas se o payload o declarar, com o
+    Content-Type do formato em colunas (JSON) ou com "format": "columnar" no
+    corpo (JSON ou MessagePack).
+    """
+    max_size = max_size or MAX_UPLOAD_SIZE
+    if request.content_length is not None and request.content_length > max_size:
+        raise RequestEntityTooLarge()
+    body = request.stream.read(max_size + 1)
+    if len(body) > max_size:
+        raise RequestEntityTooLarge()
+    if request.headers.get("Content-Encoding", "").lower() == "gzip":
+        body = gunzip_limited(body, max_size)
+    
+    if request.mimetype in MSGPACK_MIMETYPES:
+        if msgpack is None:
+            raise ValueError("MessagePack is not supported by this server")
+        data = msgpack.unpackb(body, raw=False)
+    else:
+        data = json.loads(body) if body else None
+    
+    if not isinstance(data, dict):
+        return data
+    columnar = request.mimetype == COLUMNAR_MIMETYPE or data.pop("format", None) == "columnar"
+    if columnar and data.get("operations") is not None:
+        if not is_columnar(data["operations"]):
+            raise ValueError("Columnar payload without columnar operations")
+        data["operations"] = from_columnar(data["operations"])
+    return data
@@ -0,0 +1,84 @@
+"""Fixtures comuns: a app sobre SQLite em memória, com a base de dados recriada em cada teste.
+
+Uso: python -m pytest tests
+"""
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def flask_app():
+    os.environ["DATABASE_URL"] = "sqlite://"
+    from src.main import app as flask_app
+
+    flask_app.config.update(TESTING=True, JWT_VERIFY_SUB=False)  # As identidades são dicionários
+    return flask_app
+
+
+@pytest.fixture
+def app(flask_app):
+    from src.models import db
+    from src.services import report_service
+    from src.services.catalog_cache import CatalogCache
+
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+        # Os IDs recomeçam no teste seguinte: nenhuma cache do processo pode sobreviver
+        CatalogCache._snapshots.clear()
+        report_service._production_cache.clear()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def seed(app):
+    """Um patrão com um vendedor, três produtos (1.00, 2.00 e 3.00) e dois clientes"""
+    from src.models import db, Boss, Seller, Product, Customer
+
+    boss = Boss(name="Patrão", email="boss@example.com")
+    boss.set_password("secret")
+    db.session.add(boss)
+    db.session.flush()
+    seller = Seller(name="Vendedor", boss_id=boss.id)
+    products = [Product(name=f"Produto {index}", price=1 + index, boss_id=boss.id) for index in range(3)]
+    customers = [Customer(name=f"Cliente {index}", boss_id=boss.id) for index in range(2)]
+    db.session.add_all([seller] + products + customers)
+    db.session.commit()
+    return SimpleNamespace(
+        boss_id=boss.id,
+        seller_id=seller.id,
+        product_ids=[product.id for product in products],
+        customer_ids=[customer.id for customer in customers]
+    )
+
+
+@pytest.fixture
+def auth(app):
+    """Cabeçalhos de autenticação para uma identidade ({"id", "role", "boss_id"})"""
+    from flask_jwt_extended import create_access_token
+
+    def headers(identity):
+        return {"Authorization": "Bearer " + create_access_token(identity=identity)}
+
+    return headers
+
+
+@pytest.fixture
+def seller_headers(seed, auth):
+    return auth({"id": seed.seller_id, "role": "seller", "boss_id": seed.boss_id})
+
+
+@pytest.fixture
+def boss_headers(seed, auth):
+    return auth({"id": seed.boss_id, "role": "boss"})
@@ -0,0 +1,52 @@
+"""Relatório de antiguidade da dívida: escalões (incluindo a dívida não vencida) e leitura sempre atual."""
+from datetime import date, timedelta
+
+import pytest
+
+
+@pytest.fixture
+def credits_by_due_date(client, seed, seller_headers):
+    """Um crédito por vencimento, com valor (1 x Produto 0 por unidade) que o identifica no escalão"""
+    from src.models import db, Credit
+
+    due_dates = {1: 5, 2: 0, 3: -10, 4: -45, 5: -75, 6: -120}  # valor -> dias até ao vencimento
+    for quantity, days in due_dates.items():
+        response = client.post("/api/sales", json={
+            "payment_type": "credit",
+            "customer_id": seed.customer_ids[0],
+            "items": [{"product_id": seed.product_ids[0], "quantity": quantity}]
+        }, headers=seller_headers)
+        credit = Credit.query.filter_by(sale_id=response.get_json()["sale"]["id"]).one()
+        credit.due_date = date.today() + timedelta(days=days)
+    db.session.commit()
+
+
+def test_buckets_separate_debt_not_yet_due(client, boss_headers, credits_by_due_date):
+    report = client.get("/api/credits/aging", headers=boss_headers).get_json()
+
+    assert report["buckets"] == ["current", "0-30", "31-60", "61-90", "90+"]
+    totals = report["totals"]
+    assert {bucket: totals[bucket] for bucket in report["buckets"]} == {
+        "current": 1.0, "0-30": 5.0, "31-60": 4.0, "61-90": 5.0, "90+": 6.0
+    }
+    assert totals["total"] == 21.0 and totals["credits_count"] == 6
+
+
+def test_credit_without_due_date_ages_from_its_creation(client, seed, boss_headers, seller_headers):
+    client.post("/api/sales", json={
+        "payment_type": "credit",
+        "customer_id": seed.customer_ids[1],
+        "items": [{"product_id": seed.product_ids[2], "quantity": 1}]
+    }, headers=seller_headers)
+
+    totals = client.get("/api/credits/aging", headers=boss_headers).get_json()["totals"]
+    assert totals["0-30"] == 3.0 and totals["current"] == 0
+
+
+def test_payment_is_reflected_immediately(client, seed, boss_headers, seller_headers, credits_by_due_date):
+    before = client.get("/api/credits/aging", headers=boss_headers).get_json()["totals"]["total"]
+    client.post(f"/api/customers/{seed.customer_ids[0]}/payments", json={"amount": "6.00"}, headers=seller_headers)
+
+    after = client.get("/api/credits/aging", headers=boss_headers).get_json()["totals"]
+    assert after["total"] == before - 6.0
+    assert after["90+"] == 0
@@ -0,0 +1,67 @@
+"""Pagamentos de créditos individuais: reenvios pelo local_id e limite ao valor em dívida."""
+from decimal import Decimal
+
+import pytest
+
+
+@pytest.fixture
+def credit_id(client, seed, seller_headers):
+    """Uma venda a crédito de 4.00 (2 x Produto 1)"""
+    from src.models import Credit
+
+    response = client.post("/api/sales", json={
+        "payment_type": "credit",
+        "customer_id": seed.customer_ids[0],
+        "items": [{"product_id": seed.product_ids[1], "quantity": 2}]
+    }, headers=seller_headers)
+    assert response.status_code == 201
+    return Credit.query.filter_by(sale_id=response.get_json()["sale"]["id"]).one().id
+
+
+def pay(client, headers, credit_id, **data):
+    return client.post(f"/api/credits/{credit_id}/pay", json=data, headers=headers)
+
+
+def test_replaying_the_final_payment_returns_the_stored_payment(client, seller_headers, credit_id):
+    from src.models import CreditPayment
+
+    first = pay(client, seller_headers, credit_id, amount="4.00", local_id="pay-1")
+    assert first.status_code == 200
+    assert first.get_json()["credit"]["is_paid"] is True
+
+    retry = pay(client, seller_headers, credit_id, amount="4.00", local_id="pay-1")
+    assert retry.status_code == 200
+    assert retry.get_json()["credit"]["amount_paid"] == 4.0
+    assert CreditPayment.query.count() == 1
+
+
+def test_paid_credit_rejects_a_new_payment(client, seller_headers, credit_id):
+    pay(client, seller_headers, credit_id, amount="4.00", local_id="pay-1")
+
+    response = pay(client, seller_headers, credit_id, amount="1.00", local_id="pay-2")
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Credit already fully paid"
+
+
+def test_overpayment_is_capped_to_the_outstanding_amount(client, seed, seller_headers, credit_id):
+    from src.models import db, Credit, CreditPayment, Customer
+
+    pay(client, seller_headers, credit_id, amount="1.50")
+    response = pay(client, seller_headers, credit_id, amount="10.00")
+    assert response.status_code == 200
+
+    credit = db.session.get(Credit, credit_id)
+    assert credit.amount_paid == Decimal("4.00") and credit.is_paid
+    assert [payment.amount for payment in CreditPayment.query.order_by(CreditPayment.id)] == [Decimal("1.50"), Decimal("2.50")]
+    assert db.session.get(Customer, seed.customer_ids[0]).outstanding_balance == 0
+
+
+def test_apply_payment_clamps_and_returns_zero_when_paid(app, credit_id):
+    from src.models import db, Credit
+    from src.services.credit_service import CreditService
+
+    assert CreditService.apply_payment(credit_id, Decimal("3.00")) == Decimal("3.00")
+    assert CreditService.apply_payment(credit_id, Decimal("5.00")) == Decimal("1.00")
+    assert CreditService.apply_payment(credit_id, Decimal("1.00")) == 0
+    db.session.commit()
+    assert db.session.get(Credit, credit_id).is_paid
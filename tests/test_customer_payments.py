@@ -0,0 +1,76 @@
+"""Pagamento distribuído pelos créditos em aberto do cliente (POST /customers/<id>/payments)."""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+
+@pytest.fixture
+def open_credits(client, seed, seller_headers):
+    """Quatro créditos do primeiro cliente (total 10.00); devolve os IDs pela ordem esperada de pagamento"""
+    from src.models import db, Credit
+
+    # valor -> (dias até ao vencimento, minutos desde a criação)
+    credits = {1: (10, 40), 2: (None, 30), 3: (-5, 20), 4: (None, 10)}
+    ids = {}
+    for quantity, (due_in, age) in credits.items():
+        response = client.post("/api/sales", json={
+            "payment_type": "credit",
+            "customer_id": seed.customer_ids[0],
+            "items": [{"product_id": seed.product_ids[0], "quantity": quantity}]
+        }, headers=seller_headers)
+        credit = Credit.query.filter_by(sale_id=response.get_json()["sale"]["id"]).one()
+        credit.due_date = date.today() + timedelta(days=due_in) if due_in is not None else None
+        credit.created_at = datetime.utcnow() - timedelta(minutes=age)
+        ids[quantity] = credit.id
+    db.session.commit()
+    # Vencimento mais antigo primeiro, sem vencimento no fim e, entre esses, o criado primeiro
+    return [ids[3], ids[1], ids[2], ids[4]]
+
+
+def pay(client, seed, headers, **data):
+    return client.post(f"/api/customers/{seed.customer_ids[0]}/payments", json=data, headers=headers)
+
+
+def test_payment_is_allocated_oldest_due_date_first(client, seed, seller_headers, open_credits):
+    from src.models import db, Customer
+
+    response = pay(client, seed, seller_headers, amount="4.50")
+    assert response.status_code == 200
+    result = response.get_json()
+
+    assert [(allocation["credit_id"], allocation["amount"]) for allocation in result["allocations"]] == [
+        (open_credits[0], 3.0), (open_credits[1], 1.0), (open_credits[2], 0.5)
+    ]
+    assert [allocation["credit_is_paid"] for allocation in result["allocations"]] == [True, True, False]
+    assert result["total_allocated"] == 4.5 and result["unallocated"] == 0
+    assert result["outstanding_balance"] == 5.5
+    assert db.session.get(Customer, seed.customer_ids[0]).outstanding_balance == Decimal("5.50")
+
+
+def test_amount_above_all_open_credits_returns_the_remainder(client, seed, seller_headers, open_credits):
+    from src.models import Credit
+
+    result = pay(client, seed, seller_headers, amount="25.00").get_json()
+
+    assert [allocation["credit_id"] for allocation in result["allocations"]] == open_credits
+    assert result["total_allocated"] == 10.0 and result["unallocated"] == 15.0
+    assert result["outstanding_balance"] == 0
+    assert all(credit.is_paid for credit in Credit.query)
+
+    response = pay(client, seed, seller_headers, amount="1.00")
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Customer has no open credits"
+
+
+def test_replay_returns_the_original_allocations_without_paying_twice(client, seed, seller_headers, open_credits):
+    from src.models import db, CreditPayment, Customer
+
+    first = pay(client, seed, seller_headers, amount="4.00", local_id="dist-1").get_json()
+    replay = pay(client, seed, seller_headers, amount="4.00", local_id="dist-1").get_json()
+
+    assert replay["allocations"] == first["allocations"]
+    assert replay["total_allocated"] == 4.0 and replay["outstanding_balance"] == 6.0
+    assert CreditPayment.query.count() == 2
+    assert [payment.local_id for payment in CreditPayment.query.order_by(CreditPayment.id)] == ["dist-1#1", "dist-1#2"]
+    assert db.session.get(Customer, seed.customer_ids[0]).outstanding_balance == Decimal("6.00")
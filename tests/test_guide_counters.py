@@ -0,0 +1,84 @@
+"""Contadores de quantidades vendidas dos itens das guias e a sua propagação no download delta."""
+from datetime import date
+
+
+def counters():
+    from src.models import GuideItem
+
+    return [(item.id, item.quantity_sold_registered) for item in GuideItem.query.order_by(GuideItem.id)]
+
+
+def guide_sale(seed, guide_id, items, local_id=None):
+    data = {"payment_type": "cash", "guide_id": guide_id,
+            "items": [{"product_id": seed.product_ids[index], "quantity": quantity} for index, quantity in items]}
+    if local_id:
+        data["local_id"] = local_id
+    return data
+
+
+def sync_guide_sale(seed, guide_id, local_id, items):
+    return {"operation_type": "CREATE_SALE", "local_id": local_id, "payload": {
+        "payment_type": "cash", "guide_id": guide_id, "sale_date": date.today().isoformat(),
+        "total_amount": str(sum((1 + index) * quantity for index, quantity in items)),
+        "items": [{"product_id": seed.product_ids[index], "quantity": quantity, "unit_price": str(1 + index),
+                   "subtotal": str((1 + index) * quantity)} for index, quantity in items]
+    }}
+
+
+def create_guide(client, seed, headers):
+    """Guia com os produtos 0, 1 e de novo 0 (a contagem do produto repetido fica no primeiro item)"""
+    response = client.post("/api/guides", json={"items": [
+        {"product_id": seed.product_ids[0], "quantity_taken": 10},
+        {"product_id": seed.product_ids[1], "quantity_taken": 10},
+        {"product_id": seed.product_ids[0], "quantity_taken": 5}
+    ]}, headers=headers)
+    return response.get_json()["guide"]["id"]
+
+
+def test_counters_match_rebuild_after_creating_and_deleting_sales(client, seed, seller_headers):
+    from src.services.guide_service import GuideService
+    from src.services.sync_service import SyncService
+
+    guide_id = create_guide(client, seed, seller_headers)
+
+    single = [client.post("/api/sales", json=guide_sale(seed, guide_id, items), headers=seller_headers).get_json()["sale"]["id"]
+              for items in ([(0, 2), (1, 1)], [(0, 1), (0, 1)])]
+    batch = [result["sale_id"] for result in client.post("/api/sales/batch", json={"sales": [
+        guide_sale(seed, guide_id, [(1, 2)], "b1"),
+        guide_sale(seed, guide_id, [(0, 3)], "b2"),
+    ]}, headers=seller_headers).get_json()["results"]]
+    results, _ = SyncService.process_upload_operations(seed.seller_id, [
+        sync_guide_sale(seed, guide_id, "s1", [(0, 1), (1, 1)]),
+        sync_guide_sale(seed, guide_id, "s2", [(1, 4)]),
+    ], seed.boss_id)
+    synced = [result["server_id"] for result in results]
+    assert all(isinstance(sale_id, int) for sale_id in single + batch + synced)
+
+    maintained = counters()
+    assert [quantity for _, quantity in maintained] == [8, 8, 0]
+    assert GuideService.rebuild_sold_counters() == 0
+    assert counters() == maintained
+
+    for sale_id in (single[0], batch[1], synced[1]):
+        assert client.delete(f"/api/sales/{sale_id}", headers=seller_headers).status_code == 204
+
+    maintained = counters()
+    assert [quantity for _, quantity in maintained] == [3, 3, 0]
+    assert GuideService.rebuild_sold_counters() == 0
+    assert counters() == maintained
+
+
+def test_delta_download_after_a_sale_returns_the_guide(client, seed, seller_headers):
+    from src.models import db, SalesGuide
+
+    guide_id = create_guide(client, seed, seller_headers)
+    since = db.session.get(SalesGuide, guide_id).last_modified.isoformat()
+
+    delta = client.get("/api/sync/download", query_string={"since": since}, headers=seller_headers).get_json()
+    assert delta["guides"] == []
+
+    client.post("/api/sales", json=guide_sale(seed, guide_id, [(1, 2)]), headers=seller_headers)
+
+    delta = client.get("/api/sync/download", query_string={"since": since}, headers=seller_headers).get_json()
+    assert [guide["id"] for guide in delta["guides"]] == [guide_id]
+    assert [item["quantity_sold_registered"] for item in delta["guides"][0]["items"]] == [0, 2, 0]
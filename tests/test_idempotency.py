@@ -0,0 +1,112 @@
+"""Reenvios concorrentes com o mesmo (seller_id, local_id) nos pedidos REST.
+
+A corrida é simulada fazendo a verificação prévia falhar uma vez: o reenvio
+passa a verificação como se a primeira gravação ainda não tivesse sido
+confirmada, e tem de resolver a violação do índice único para a linha gravada.
+"""
+from decimal import Decimal
+
+import pytest
+
+
+def miss_once(monkeypatch, cls, name, empty):
+    """Faz a procura cls.name devolver empty na primeira chamada (a gravação concorrente ainda não se vê)"""
+    original = getattr(cls, name)
+    calls = []
+
+    def lookup(*args):
+        calls.append(args)
+        return empty if len(calls) == 1 else original(*args)
+
+    monkeypatch.setattr(cls, name, staticmethod(lookup))
+    return calls
+
+
+def test_concurrent_sale_retry_returns_the_stored_sale(client, seed, seller_headers, monkeypatch):
+    from src.models import db, Sale, Customer
+    from src.services.sale_service import SaleService
+
+    sale = {"payment_type": "credit", "customer_id": seed.customer_ids[0], "local_id": "sale-1",
+            "items": [{"product_id": seed.product_ids[0], "quantity": 2}]}
+    first = client.post("/api/sales", json=sale, headers=seller_headers)
+    miss_once(monkeypatch, SaleService, "_find_by_local_id", None)
+    retry = client.post("/api/sales", json=sale, headers=seller_headers)
+
+    assert retry.status_code == 201
+    assert retry.get_json()["sale"]["id"] == first.get_json()["sale"]["id"]
+    assert Sale.query.count() == 1
+    assert db.session.get(Customer, seed.customer_ids[0]).outstanding_balance == Decimal("2.00")
+
+
+def test_concurrent_batch_retry_resolves_to_the_stored_sales(client, seed, seller_headers, monkeypatch):
+    from src.models import Sale
+    from src.services.sale_service import SaleService
+
+    sales = [{"payment_type": "cash", "local_id": f"batch-{index}",
+              "items": [{"product_id": seed.product_ids[index], "quantity": 1}]} for index in range(2)]
+    first = client.post("/api/sales/batch", json={"sales": sales[:1]}, headers=seller_headers)
+    miss_once(monkeypatch, SaleService, "_existing_local_ids", {})
+    miss_once(monkeypatch, SaleService, "_find_by_local_id", None)
+    retry = client.post("/api/sales/batch", json={"sales": sales}, headers=seller_headers)
+
+    results = retry.get_json()["results"]
+    assert retry.status_code == 201
+    assert [result["status"] for result in results] == ["success", "success"]
+    assert results[0]["sale_id"] == first.get_json()["results"][0]["sale_id"]
+    assert Sale.query.count() == 2
+
+
+def test_concurrent_guide_retry_returns_the_stored_guide(client, seed, seller_headers, monkeypatch):
+    from src.models import SalesGuide
+    from src.services.guide_service import GuideService
+
+    guide = {"local_id": "guide-1", "items": [{"product_id": seed.product_ids[0], "quantity_taken": 5}]}
+    first = client.post("/api/guides", json=guide, headers=seller_headers)
+    miss_once(monkeypatch, GuideService, "_find_by_local_id", None)
+    retry = client.post("/api/guides", json=guide, headers=seller_headers)
+
+    assert retry.status_code == 201
+    assert retry.get_json()["guide"]["id"] == first.get_json()["guide"]["id"]
+    assert SalesGuide.query.count() == 1
+
+
+@pytest.fixture
+def credit_sale(client, seed, seller_headers):
+    """Uma venda a crédito de 6.00 (3 x Produto 1) ao primeiro cliente"""
+    from src.models import Credit
+
+    response = client.post("/api/sales", json={
+        "payment_type": "credit",
+        "customer_id": seed.customer_ids[0],
+        "items": [{"product_id": seed.product_ids[1], "quantity": 3}]
+    }, headers=seller_headers)
+    return Credit.query.filter_by(sale_id=response.get_json()["sale"]["id"]).one().id
+
+
+def test_concurrent_credit_payment_retry_pays_once(client, seed, seller_headers, credit_sale, monkeypatch):
+    from src.models import db, Credit, CreditPayment
+    from src.services.credit_service import CreditService
+
+    payment = {"amount": "2.00", "local_id": "pay-1"}
+    client.post(f"/api/credits/{credit_sale}/pay", json=payment, headers=seller_headers)
+    miss_once(monkeypatch, CreditService, "_find_payment", None)
+    retry = client.post(f"/api/credits/{credit_sale}/pay", json=payment, headers=seller_headers)
+
+    assert retry.status_code == 200
+    assert CreditPayment.query.count() == 1
+    assert db.session.get(Credit, credit_sale).amount_paid == Decimal("2.00")
+
+
+def test_concurrent_customer_payment_retry_pays_once(client, seed, seller_headers, credit_sale, monkeypatch):
+    from src.models import CreditPayment
+    from src.services.credit_service import CreditService
+
+    payment = {"amount": "2.00", "local_id": "dist-1"}
+    first = client.post(f"/api/customers/{seed.customer_ids[0]}/payments", json=payment, headers=seller_headers)
+    miss_once(monkeypatch, CreditService, "_find_allocation", [])
+    retry = client.post(f"/api/customers/{seed.customer_ids[0]}/payments", json=payment, headers=seller_headers)
+
+    assert retry.status_code == 200
+    assert retry.get_json()["allocations"] == first.get_json()["allocations"]
+    assert retry.get_json()["outstanding_balance"] == 4.0
+    assert CreditPayment.query.count() == 1
@@ -0,0 +1,69 @@
+"""Cache da folha de produção: invalidada pela versão na base de dados e limitada em tamanho."""
+from datetime import date, timedelta
+
+import pytest
+
+
+@pytest.fixture
+def sheet_range(app, monkeypatch):
+    monkeypatch.setitem(app.config, "PRODUCTION_SHEET_CACHE_SECONDS", 300)
+    today = date.today()
+    return today, today + timedelta(days=1)
+
+
+def taken(sheet):
+    return {(row["date"], row["product_id"]): row["quantity_taken"] for row in sheet["rows"]}
+
+
+def test_cached_sheet_is_reused_while_the_version_is_unchanged(seed, sheet_range):
+    from src.services.report_service import ReportService
+
+    first = ReportService.get_production_sheet(seed.boss_id, *sheet_range)
+    assert ReportService.get_production_sheet(seed.boss_id, *sheet_range) is first
+
+
+def test_guide_synced_by_the_worker_invalidates_the_cached_sheet(seed, sheet_range):
+    from src.services.report_service import ReportService
+    from src.services.sync_service import SyncService
+
+    day = sheet_range[1]
+    assert taken(ReportService.get_production_sheet(seed.boss_id, *sheet_range)) == {}
+
+    # O worker aplica as operações noutro processo: não há invalidação local, só a versão na base de dados
+    results, _ = SyncService.process_upload_operations(seed.seller_id, [{
+        "operation_type": "CREATE_GUIDE",
+        "local_id": "guide-1",
+        "payload": {"guide_date": day.isoformat(), "items": [{"product_id": seed.product_ids[0], "quantity_taken": 7, "unit_price": "1.00"}]}
+    }], seed.boss_id)
+    assert results[0]["status"] == "success"
+
+    sheet = ReportService.get_production_sheet(seed.boss_id, *sheet_range)
+    assert taken(sheet) == {(day.isoformat(), seed.product_ids[0]): 7}
+
+
+def test_rest_guide_writes_invalidate_the_cached_sheet(client, seed, seller_headers, sheet_range):
+    from src.models import SalesGuide
+    from src.services.guide_service import GuideService
+    from src.services.report_service import ReportService
+
+    day = sheet_range[0]
+    ReportService.get_production_sheet(seed.boss_id, *sheet_range)
+    client.post("/api/guides", json={"guide_date": day.isoformat(), "items": [{"product_id": seed.product_ids[1], "quantity_taken": 4}]},
+                headers=seller_headers)
+    assert taken(ReportService.get_production_sheet(seed.boss_id, *sheet_range)) == {(day.isoformat(), seed.product_ids[1]): 4}
+
+    GuideService.delete_guide(SalesGuide.query.one())
+    assert taken(ReportService.get_production_sheet(seed.boss_id, *sheet_range)) == {}
+
+
+def test_cache_keeps_at_most_production_cache_size_sheets(seed, sheet_range, monkeypatch):
+    from src.services import report_service
+    from src.services.report_service import ReportService
+
+    monkeypatch.setattr(report_service, "PRODUCTION_CACHE_SIZE", 3)
+    for offset in range(6):
+        start = sheet_range[0] + timedelta(days=offset)
+        ReportService.get_production_sheet(seed.boss_id, start, start)
+
+    assert len(report_service._production_cache) == 3
+    assert (seed.boss_id, sheet_range[0] + timedelta(days=5), sheet_range[0] + timedelta(days=5)) in report_service._production_cache
@@ -0,0 +1,110 @@
+"""Garante que as listagens correm um número fixo de queries, qualquer que seja o número de linhas.
+
+Cada listagem é medida com 1 e com N registos (vendas com itens e crédito com
+pagamentos, guias com itens), contando os statements SQL com um listener
+before_cursor_execute, incluindo a serialização com to_dict(). Se a contagem
+crescer com N, há um lazy load (N+1) por carregar em query_profiles.
+
+Uso: python -m pytest tests
+"""
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event
+
+MANY_ROWS = 20
+
+
+@contextmanager
+def count_queries():
+    from src.models import db
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+
+def seed_rows(rows):
+    """Cria um patrão e um vendedor com rows vendas a crédito (2 itens, 1 pagamento) e rows guias (2 itens)"""
+    from src.models import db, Boss, Seller, Customer, Product, Sale, SaleItem, Credit, CreditPayment, SalesGuide, GuideItem
+
+    boss = Boss(name="Patrão", email=f"boss-{rows}-{datetime.utcnow().timestamp()}@example.com")
+    boss.set_password("secret")
+    db.session.add(boss)
+    db.session.flush()
+    seller = Seller(name="Vendedor", boss_id=boss.id)
+    customer = Customer(name="Cliente", boss_id=boss.id)
+    products = [Product(name=f"Produto {index}", price=Decimal("1.50"), boss_id=boss.id) for index in range(2)]
+    db.session.add_all([seller, customer] + products)
+    db.session.flush()
+
+    for index in range(rows):
+        sale = Sale(seller_id=seller.id, customer_id=customer.id, payment_type="credit",
+                    sale_date=date.today() - timedelta(days=index), total_amount=Decimal("3.00"))
+        sale.sale_items = [SaleItem(product_id=product.id, quantity=1, unit_price=product.price, subtotal=product.price)
+                           for product in products]
+        credit = Credit(customer_id=customer.id, amount=Decimal("3.00"), amount_paid=Decimal("1.00"))
+        credit.payments = [CreditPayment(seller_id=seller.id, amount=Decimal("1.00"))]
+        sale.credit = credit
+
+        guide = SalesGuide(seller_id=seller.id, guide_date=date.today() - timedelta(days=index))
+        guide.guide_items = [GuideItem(product_id=product.id, quantity_taken=5, unit_price=product.price,
+                                   total_taken_value=product.price * 5) for product in products]
+        db.session.add_all([sale, guide])
+    db.session.commit()
+    return boss.id, seller.id
+
+
+def list_sales(boss_id, seller_id):
+    from src.services.sale_service import SaleService
+    return [sale.to_dict() for sale in SaleService.get_sales("boss", boss_id, boss_id)]
+
+
+def list_guides(boss_id, seller_id):
+    from src.services.guide_service import GuideService
+    return [guide.to_dict() for guide in GuideService.get_guides("seller", seller_id, boss_id)]
+
+
+def list_credits(boss_id, seller_id):
+    from src.services.credit_service import CreditService
+    return [credit.to_dict() for credit in CreditService.get_credits("boss", boss_id, boss_id)]
+
+
+def sync_download(boss_id, seller_id):
+    from src.services.catalog_cache import CatalogCache
+    from src.services.sync_service import SyncService
+    CatalogCache.evict(boss_id)  # A cache do catálogo não pode mascarar as queries do primeiro download
+    data, _ = SyncService.get_download_data(seller_id, boss_id)
+    return data["sales"]
+
+
+def sync_download_delta(boss_id, seller_id):
+    from src.services.sync_service import SyncService
+    data, _ = SyncService.get_download_data(seller_id, boss_id, since=datetime.utcnow() - timedelta(days=1))
+    return data["sales"]
+
+
+@pytest.mark.parametrize("listing", [list_sales, list_guides, list_credits, sync_download, sync_download_delta],
+                         ids=lambda listing: listing.__name__)
+def test_listing_query_count_does_not_grow_with_rows(app, listing):
+    from src.models import db
+
+    counts = {}
+    for rows in (1, MANY_ROWS):
+        boss_id, seller_id = seed_rows(rows)
+        db.session.remove()  # Sem objetos já carregados na sessão
+        with count_queries() as statements:
+            records = listing(boss_id, seller_id)
+        assert len(records) == rows
+        counts[rows] = len(statements)
+
+    assert counts[1] == counts[MANY_ROWS], f"{counts[1]} queries com 1 linha, {counts[MANY_ROWS]} com {MANY_ROWS}"
@@ -0,0 +1,79 @@
+"""O agregado diário mantido a cada escrita de vendas tem de coincidir com o reconstruído a partir das vendas."""
+from datetime import date, timedelta
+
+from sqlalchemy import or_
+
+
+def rollup_snapshot():
+    """Linhas do agregado com alguma medida diferente de zero (as remoções deixam linhas a zero)"""
+    from src.models import DailySalesRollup
+    from src.services.report_service import ROLLUP_KEY, ROLLUP_MEASURES
+
+    rows = DailySalesRollup.query.filter(or_(*(getattr(DailySalesRollup, measure) != 0 for measure in ROLLUP_MEASURES)))
+    return {tuple(getattr(row, column) for column in ROLLUP_KEY): tuple(getattr(row, measure) for measure in ROLLUP_MEASURES)
+            for row in rows}
+
+
+def assert_rollup_matches_rebuild():
+    from src.services.report_service import ReportService
+
+    maintained = rollup_snapshot()
+    assert maintained
+    ReportService.rebuild_sales_rollup()
+    assert maintained == rollup_snapshot()
+
+
+def sale(seed, payment_type, items, sale_date=None, local_id=None):
+    data = {"payment_type": payment_type, "items": [{"product_id": seed.product_ids[index], "quantity": quantity} for index, quantity in items]}
+    if payment_type == "credit":
+        data["customer_id"] = seed.customer_ids[0]
+    if sale_date:
+        data["sale_date"] = sale_date.isoformat()
+    if local_id:
+        data["local_id"] = local_id
+    return data
+
+
+def sync_sale(seed, local_id, payment_type, items, sale_date):
+    from src.models import db, Product
+
+    prices = {product.id: product.price for product in db.session.scalars(db.select(Product))}
+    return {"operation_type": "CREATE_SALE", "local_id": local_id, "payload": {
+        "payment_type": payment_type,
+        "customer_id": seed.customer_ids[1] if payment_type == "credit" else None,
+        "sale_date": sale_date.isoformat(),
+        "total_amount": str(sum(prices[seed.product_ids[index]] * quantity for index, quantity in items)),
+        "items": [{"product_id": seed.product_ids[index], "quantity": quantity, "unit_price": str(prices[seed.product_ids[index]]),
+                   "subtotal": str(prices[seed.product_ids[index]] * quantity)} for index, quantity in items]
+    }}
+
+
+def test_rollup_matches_rebuild_after_creating_and_deleting_sales(client, seed, seller_headers):
+    from src.services.sync_service import SyncService
+
+    today, yesterday = date.today(), date.today() - timedelta(days=1)
+
+    # Venda individual, com o mesmo produto em dois itens (conta uma vez em sales_count)
+    single = [client.post("/api/sales", json=data, headers=seller_headers).get_json()["sale"]["id"] for data in (
+        sale(seed, "cash", [(0, 2), (0, 1), (1, 1)]),
+        sale(seed, "credit", [(1, 3)], yesterday),
+    )]
+    # Vendas em lote
+    batch = [result["sale_id"] for result in client.post("/api/sales/batch", json={"sales": [
+        sale(seed, "cash", [(0, 1), (2, 2)], local_id="b1"),
+        sale(seed, "credit", [(2, 1)], yesterday, local_id="b2"),
+    ]}, headers=seller_headers).get_json()["results"]]
+    # Vendas da sincronização
+    results, _ = SyncService.process_upload_operations(seed.seller_id, [
+        sync_sale(seed, "s1", "cash", [(1, 2)], today),
+        sync_sale(seed, "s2", "credit", [(0, 4), (2, 1)], yesterday),
+    ], seed.boss_id)
+    synced = [result["server_id"] for result in results]
+    assert all(isinstance(sale_id, int) for sale_id in single + batch + synced)
+
+    assert_rollup_matches_rebuild()
+
+    for sale_id in (single[0], batch[1], synced[1]):
+        assert client.delete(f"/api/sales/{sale_id}", headers=seller_headers).status_code == 204
+
+    assert_rollup_matches_rebuild()
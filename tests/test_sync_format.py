@@ -0,0 +1,80 @@
+"""Uploads de sincronização: limite de tamanho (também depois do gzip) e formato em colunas declarado."""
+import gzip
+import json
+
+import pytest
+
+
+@pytest.fixture
+def small_limit(monkeypatch):
+    from src.utils import sync_format
+
+    monkeypatch.setattr(sync_format, "MAX_UPLOAD_SIZE", 64 * 1024)
+    return 64 * 1024
+
+
+def sale_operation(seed, local_id):
+    return {"operation_type": "CREATE_SALE", "local_id": local_id, "payload": {
+        "payment_type": "cash", "sale_date": "2026-01-05", "total_amount": "1.00",
+        "items": [{"product_id": seed.product_ids[0], "quantity": 1, "unit_price": "1.00", "subtotal": "1.00"}]
+    }}
+
+
+def upload(client, headers, body, content_type="application/json", **extra):
+    return client.post("/api/sync/upload", data=body, headers=dict(headers, **{"Content-Type": content_type}, **extra))
+
+
+def test_gzip_bomb_is_rejected_with_413(client, seller_headers, small_limit):
+    body = gzip.compress(b'{"operations": [' + b" " * (small_limit * 16) + b"]}")
+    assert len(body) < small_limit
+
+    response = upload(client, seller_headers, body, **{"Content-Encoding": "gzip"})
+    assert response.status_code == 413
+
+
+def test_raw_body_above_the_limit_is_rejected_with_413(client, seller_headers, small_limit):
+    response = upload(client, seller_headers, b'{"operations": [' + b" " * small_limit + b"]}")
+    assert response.status_code == 413
+
+
+def test_gzip_body_within_the_limit_is_accepted(client, seed, seller_headers, small_limit):
+    body = gzip.compress(json.dumps({"operations": [sale_operation(seed, "s1")]}).encode())
+
+    response = upload(client, seller_headers, body, **{"Content-Encoding": "gzip"})
+    assert response.status_code == 202
+    assert [result["status"] for result in response.get_json()["results"]] == ["queued"]
+
+
+def test_truncated_gzip_is_rejected_with_400(client, seed, seller_headers):
+    body = gzip.compress(json.dumps({"operations": [sale_operation(seed, "s1")]}).encode())
+
+    response = upload(client, seller_headers, body[:-12], **{"Content-Encoding": "gzip"})
+    assert response.status_code == 400
+
+
+def test_columnar_operations_declared_by_content_type(client, seed, seller_headers):
+    from src.utils.sync_format import COLUMNAR_MIMETYPE, to_columnar
+
+    operations = [sale_operation(seed, f"s{index}") for index in range(3)]
+    response = upload(client, seller_headers, json.dumps({"operations": to_columnar(operations)}), COLUMNAR_MIMETYPE)
+    assert response.status_code == 202
+    assert [result["local_id"] for result in response.get_json()["results"]] == ["s0", "s1", "s2"]
+
+
+def test_columnar_operations_declared_by_format_key(client, seed, seller_headers):
+    msgpack = pytest.importorskip("msgpack")
+    from src.utils.sync_format import to_columnar
+
+    operations = [sale_operation(seed, f"s{index}") for index in range(2)]
+    body = msgpack.packb({"format": "columnar", "operations": to_columnar(operations)}, use_bin_type=True)
+    response = upload(client, seller_headers, body, "application/msgpack")
+    assert response.status_code == 202
+    assert len(response.get_json()["results"]) == 2
+
+
+def test_undeclared_columns_and_data_keys_are_not_guessed(client, seed, seller_headers):
+    from src.utils.sync_format import to_columnar
+
+    body = json.dumps({"operations": to_columnar([sale_operation(seed, "s1")])})
+    response = upload(client, seller_headers, body)
+    assert response.status_code == 400
@@ -0,0 +1,136 @@
+"""Upload de sincronização aplicado em linha: isolamento das falhas, ordem dos resultados e reenvios."""
+import pytest
+
+
+def sale_operation(seed, local_id, product_id=None, quantity=1):
+    product_id = seed.product_ids[0] if product_id is None else product_id
+    return {"operation_type": "CREATE_SALE", "local_id": local_id, "payload": {
+        "payment_type": "cash", "sale_date": "2026-01-05", "total_amount": str(quantity),
+        "items": [{"product_id": product_id, "quantity": quantity, "unit_price": "1.00", "subtotal": str(quantity)}]
+    }}
+
+
+def guide_operation(seed, local_id):
+    return {"operation_type": "CREATE_GUIDE", "local_id": local_id, "payload": {
+        "guide_date": "2026-01-05",
+        "items": [{"product_id": seed.product_ids[1], "quantity_taken": 5, "unit_price": "2.00"}]
+    }}
+
+
+def payment_operation(credit_id, local_id, amount="1.00"):
+    return {"operation_type": "CREATE_CREDIT_PAYMENT", "local_id": local_id, "payload": {
+        "credit_id": credit_id, "amount": amount, "payment_date": "2026-01-06"
+    }}
+
+
+@pytest.fixture
+def credit_id(client, seed, seller_headers):
+    from src.models import Credit
+
+    response = client.post("/api/sales", json={
+        "payment_type": "credit",
+        "customer_id": seed.customer_ids[0],
+        "items": [{"product_id": seed.product_ids[2], "quantity": 2}]
+    }, headers=seller_headers)
+    return Credit.query.filter_by(sale_id=response.get_json()["sale"]["id"]).one().id
+
+
+@pytest.fixture
+def failing_sale(monkeypatch):
+    """Faz falhar na base de dados a inserção de qualquer grupo de vendas que contenha o local_id dado"""
+    from src.services.sync_service import SyncService
+
+    insert_sales = SyncService._insert_sales
+
+    def fail_on(local_id):
+        def handler(entries):
+            if any(entry[1] == local_id for entry in entries):
+                raise ValueError(f"insert failed for {local_id}")
+            return insert_sales(entries)
+        monkeypatch.setattr(SyncService, "_insert_sales", handler)
+    return fail_on
+
+
+def upload(seed, operations):
+    from src.services.sync_service import SyncService
+
+    results, error = SyncService.process_upload_operations(seed.seller_id, operations, seed.boss_id)
+    assert error is None
+    return results
+
+
+def test_bad_operations_fail_only_themselves(seed, credit_id, failing_sale):
+    from src.models import Sale, SalesGuide, CreditPayment
+
+    failing_sale("s3")
+    results = upload(seed, [
+        sale_operation(seed, "s1"),
+        sale_operation(seed, "s2", product_id=999999),
+        payment_operation(credit_id, "p1"),
+        guide_operation(seed, "g1"),
+        sale_operation(seed, "s3"),
+        sale_operation(seed, "s4", quantity=2),
+        payment_operation(credit_id, "p2", amount="-1.00"),
+        {"operation_type": "DELETE_EVERYTHING", "local_id": "x1", "payload": {}},
+    ])
+
+    assert [result["status"] for result in results] == [
+        "success", "failed", "success", "success", "failed", "success", "failed", "failed"
+    ]
+    assert results[1]["error"] == "Product with ID 999999 not found"
+    assert results[4]["error"] == "insert failed for s3"
+    assert results[6]["error"] == "Amount must be positive"
+    assert results[7]["error"] == "Unknown operation type: DELETE_EVERYTHING"
+    assert not any(result.get("retryable") for result in results)
+
+    synced_sales = {sale.local_id for sale in Sale.query.filter(Sale.local_id.isnot(None))}
+    assert synced_sales == {"s1", "s4"}
+    assert [guide.local_id for guide in SalesGuide.query] == ["g1"]
+    assert [payment.local_id for payment in CreditPayment.query] == ["p1"]
+
+
+def test_results_follow_the_input_order(seed, credit_id):
+    from src.models import db, Sale, SalesGuide, CreditPayment
+
+    # Os grupos são aplicados por tipo (guias primeiro), mas os resultados seguem o lote
+    operations = [
+        payment_operation(credit_id, "p1"),
+        sale_operation(seed, "s1"),
+        guide_operation(seed, "g1"),
+        sale_operation(seed, "s2"),
+        guide_operation(seed, "g2"),
+        payment_operation(credit_id, "p2"),
+    ]
+    models = {"CREATE_SALE": Sale, "CREATE_GUIDE": SalesGuide, "CREATE_CREDIT_PAYMENT": CreditPayment}
+    results = upload(seed, operations)
+
+    assert [result["local_id"] for result in results] == ["p1", "s1", "g1", "s2", "g2", "p2"]
+    for operation, result in zip(operations, results):
+        assert result["status"] == "success"
+        assert db.session.get(models[operation["operation_type"]], result["server_id"]).local_id == operation["local_id"]
+
+
+def test_reupload_returns_the_same_server_ids(seed, credit_id):
+    from src.models import Sale, SalesGuide, CreditPayment
+
+    operations = [sale_operation(seed, "s1"), guide_operation(seed, "g1"), payment_operation(credit_id, "p1")]
+    first = upload(seed, operations)
+    counts = (Sale.query.count(), SalesGuide.query.count(), CreditPayment.query.count())
+
+    # Reenvio do lote, com uma operação repetida dentro do próprio lote
+    replay = upload(seed, operations + [sale_operation(seed, "s1")])
+
+    assert [result["server_id"] for result in replay] == [result["server_id"] for result in first] + [first[0]["server_id"]]
+    assert all(result["status"] == "success" and result["duplicate"] for result in replay)
+    assert (Sale.query.count(), SalesGuide.query.count(), CreditPayment.query.count()) == counts
+
+
+def test_operation_repeated_within_a_new_batch_is_applied_once(seed):
+    from src.models import Sale
+
+    results = upload(seed, [sale_operation(seed, "s1"), sale_operation(seed, "s2"), sale_operation(seed, "s1")])
+
+    assert [result["status"] for result in results] == ["success"] * 3
+    assert results[2]["server_id"] == results[0]["server_id"] and results[2]["duplicate"]
+    assert not results[0].get("duplicate")
+    assert Sale.query.filter(Sale.local_id.isnot(None)).count() == 2
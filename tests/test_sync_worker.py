@@ -0,0 +1,134 @@
+"""Worker da SyncQueue: nova tentativa só para erros transitórios e reenvio de operações falhadas."""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+
+def sale_operation(seed, local_id, product_id=None):
+    product_id = seed.product_ids[0] if product_id is None else product_id
+    return {"operation_type": "CREATE_SALE", "local_id": local_id, "payload": {
+        "payment_type": "cash", "sale_date": "2026-01-05", "total_amount": "1.00",
+        "items": [{"product_id": product_id, "quantity": 1, "unit_price": "1.00", "subtotal": "1.00"}]
+    }}
+
+
+@pytest.fixture
+def worker(flask_app, app):
+    from src.services.sync_worker import SyncWorker
+
+    return SyncWorker(flask_app, threads=1, max_attempts=3, backoff_base=2)
+
+
+@pytest.fixture
+def locked_database(monkeypatch):
+    """A inserção de vendas falha com um erro transitório até ser desligado"""
+    from src.services.sync_service import SyncService
+
+    insert_sales = SyncService._insert_sales
+    state = {"locked": True}
+
+    def handler(entries):
+        if state["locked"]:
+            raise OperationalError("INSERT INTO sale ...", {}, Exception("database is locked"))
+        return insert_sales(entries)
+    monkeypatch.setattr(SyncService, "_insert_sales", handler)
+    return state
+
+
+def enqueue(seed, operations):
+    from src.services.sync_service import SyncService
+
+    results, error = SyncService.enqueue_upload_operations(seed.seller_id, operations)
+    assert error is None
+    return results
+
+
+def queued(local_id):
+    from src.models import db, SyncQueue
+
+    db.session.expire_all()
+    return SyncQueue.query.filter_by(local_id=local_id).one()
+
+
+def make_due(local_id):
+    from src.models import db
+
+    queued(local_id).next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+
+def test_transient_error_is_rescheduled_with_backoff(seed, worker, locked_database):
+    enqueue(seed, [sale_operation(seed, "s1")])
+
+    before = datetime.utcnow()
+    assert worker.process_once() == 1
+    entry = queued("s1")
+    assert entry.status == "PENDING" and entry.attempts == 1
+    assert "database is locked" in entry.error_message
+    assert before + timedelta(seconds=2) <= entry.next_attempt_at <= datetime.utcnow() + timedelta(seconds=2)
+
+    # Ainda não chegou a hora da nova tentativa
+    assert worker.process_once() == 0
+
+    make_due("s1")
+    assert worker.process_once() == 1
+    entry = queued("s1")
+    assert entry.status == "PENDING" and entry.attempts == 2
+    assert entry.next_attempt_at >= datetime.utcnow() + timedelta(seconds=3)
+
+    locked_database["locked"] = False
+    make_due("s1")
+    assert worker.process_once() == 1
+    entry = queued("s1")
+    assert entry.status == "COMPLETED" and entry.attempts == 3
+    assert entry.server_id is not None and entry.error_message is None
+
+
+def test_transient_error_fails_after_max_attempts(seed, worker, locked_database):
+    enqueue(seed, [sale_operation(seed, "s1")])
+
+    for _ in range(worker.max_attempts):
+        if queued("s1").next_attempt_at:
+            make_due("s1")
+        assert worker.process_once() == 1
+
+    entry = queued("s1")
+    assert entry.status == "FAILED" and entry.attempts == worker.max_attempts
+    assert entry.next_attempt_at is None
+
+
+def test_validation_error_fails_on_the_first_attempt(seed, worker):
+    enqueue(seed, [sale_operation(seed, "s1", product_id=999999), sale_operation(seed, "s2")])
+
+    assert worker.process_once() == 2
+    failed, completed = queued("s1"), queued("s2")
+    assert failed.status == "FAILED" and failed.attempts == 1
+    assert failed.error_message == "Product with ID 999999 not found"
+    assert failed.next_attempt_at is None
+    assert completed.status == "COMPLETED"
+
+    assert worker.process_once() == 0
+
+
+def test_resending_a_failed_operation_requeues_it(seed, worker):
+    from src.models import Sale
+
+    enqueue(seed, [sale_operation(seed, "s1", product_id=999999)])
+    worker.process_once()
+    assert queued("s1").status == "FAILED"
+
+    # O dispositivo corrige a operação e reenvia-a com o mesmo local_id
+    results = enqueue(seed, [sale_operation(seed, "s1")])
+    entry = queued("s1")
+    assert results == [{"local_id": "s1", "status": "queued", "queue_id": entry.id}]
+    assert entry.status == "PENDING" and entry.attempts == 0 and entry.error_message is None
+    assert entry.data["items"][0]["product_id"] == seed.product_ids[0]
+
+    assert worker.process_once() == 1
+    entry = queued("s1")
+    assert entry.status == "COMPLETED"
+    assert Sale.query.filter_by(local_id="s1").one().id == entry.server_id
+
+    # Um novo reenvio de uma operação concluída devolve logo o resultado
+    assert enqueue(seed, [sale_operation(seed, "s1")]) == [{"local_id": "s1", "status": "success", "server_id": entry.server_id}]